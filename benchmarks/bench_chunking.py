@@ -0,0 +1,125 @@
+"""
+Chunking throughput (MB/s) of `chunk_text` over synthetic and real markdown.
+
+Synthetic corpora mimic large API-reference pages (headers, prose, parameter
+lists, links, fenced and indented code) plus a worst case without blank lines
+or sentence endings. Real corpora are markdown files/directories passed as
+arguments.
+
+    uv run python -m benchmarks.bench_chunking --sizes 1 10 50
+    uv run python -m benchmarks.bench_chunking --sizes 1 docs/ page.md
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+from src.utils.chunking import chunk_text
+
+WORDS = (
+    "the request returns a list of objects for each page of results and the "
+    "client retries failed calls with exponential backoff until the timeout"
+).split()
+
+
+def _sentence(rnd: random.Random) -> str:
+    words = rnd.choices(WORDS, k=rnd.randint(6, 20))
+    return " ".join(words).capitalize() + rnd.choice([".", ".", "?", "!"])
+
+
+def _api_section(rnd: random.Random, n: int) -> str:
+    name = f"client.resource_{n}.method_{rnd.randint(0, 999)}"
+    parts = [
+        f"## `{name}()`\n\n",
+        " ".join(_sentence(rnd) for _ in range(rnd.randint(2, 8))),
+        f" See [{name}](https://example.com/api/{n}#reference) for details.\n\n",
+        "### Parameters\n\n",
+        "".join(
+            f"- **param_{i}** (`str`, optional): {_sentence(rnd)}\n"
+            for i in range(rnd.randint(2, 10))
+        ),
+        "\n```python\n",
+        "".join(
+            f"result_{i} = {name}(param_{i}={i!r})\n" for i in range(rnd.randint(3, 40))
+        ),
+        "```\n\n",
+    ]
+    if rnd.random() < 0.3:
+        parts.append(
+            "".join(f"    print(result_{i})\n" for i in range(rnd.randint(2, 6)))
+        )
+        parts.append("\n")
+    return "".join(parts)
+
+
+def synthetic_api_reference(size: int, seed: int = 0) -> str:
+    """API-reference style markdown of roughly `size` characters."""
+    rnd = random.Random(seed)
+    parts, length, n = ["# API Reference\n\n"], 0, 0
+    while length < size:
+        section = _api_section(rnd, n)
+        parts.append(section)
+        length += len(section)
+        n += 1
+    return "".join(parts)[:size]
+
+
+def synthetic_worst_case(size: int, seed: int = 0) -> str:
+    """One long line: no blank lines, headers or sentence endings to break at."""
+    rnd = random.Random(seed)
+    words = [
+        w + rnd.choice([" ", ", ", " [ref](x) "]) for w in rnd.choices(WORDS, k=2000)
+    ]
+    block = "".join(words)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def load_corpora(paths: list[str]) -> list[tuple[str, str]]:
+    """Real markdown corpora: every file, directories concatenated (*.md)."""
+    corpora = []
+    for path in map(Path, paths):
+        files = sorted(path.rglob("*.md")) if path.is_dir() else [path]
+        text = "\n\n".join(
+            f.read_text(encoding="utf-8", errors="ignore") for f in files
+        )
+        corpora.append((str(path), text))
+    return corpora
+
+
+def bench(text: str, repeat: int) -> tuple[float, int]:
+    """Best MB/s of `repeat` runs and the number of chunks."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = chunk_text(text)
+        best = min(best, time.perf_counter() - started)
+    return len(text.encode()) / 1_000_000 / best, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="*", help="markdown files or directories")
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=[1, 10, 50], help="synthetic MB"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpora = []
+    for mb in args.sizes:
+        size = int(mb * 1_000_000)
+        corpora.append(
+            (f"synthetic api-reference {mb:g} MB", synthetic_api_reference(size))
+        )
+        corpora.append((f"synthetic worst case {mb:g} MB", synthetic_worst_case(size)))
+    corpora += load_corpora(args.paths)
+
+    print(f"{'corpus':<40}{'MB':>8}{'chunks':>10}{'MB/s':>10}")
+    for name, text in corpora:
+        mb_per_s, chunks = bench(text, args.repeat)
+        size_mb = len(text.encode()) / 1_000_000
+        print(f"{name[:39]:<40}{size_mb:>8.1f}{chunks:>10}{mb_per_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
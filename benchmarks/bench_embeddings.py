@@ -0,0 +1,130 @@
+"""
+Embedding throughput: sync client in threads (serial batches) vs. async client
+with concurrent batches through the EmbeddingBatcher.
+
+Runs against a local stub server that mimics the Gemini embedding endpoint
+with a fixed latency - no API key, no quota.
+
+    uv run python -m benchmarks.bench_embeddings --texts 2000 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from google import genai
+from google.genai import types
+from src.utils.embedding_batcher import EmbeddingBatcher
+
+MODEL = "gemini-embedding-001"
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Answer every embed request with dummy vectors after `latency` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests = body.get("requests") or [body]
+            dims = requests[0].get("outputDimensionality", 768)
+            time.sleep(latency)
+
+            payload = json.dumps(
+                {"embeddings": [{"values": [0.1] * dims} for _ in requests]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def bench_serial_threads(client, texts, batch_size) -> float:
+    """Old path: sync client via asyncio.to_thread, one batch after another."""
+    started = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        await asyncio.to_thread(
+            client.models.embed_content,
+            model=MODEL,
+            contents=texts[i : i + batch_size],
+            config={"task_type": "RETRIEVAL_DOCUMENT", "output_dimensionality": 768},
+        )
+    return time.perf_counter() - started
+
+
+async def bench_async_batcher(client, texts, batch_size, concurrency) -> float:
+    """New path: async client, pages submit concurrently to the shared batcher."""
+
+    async def embed_fn(batch, task_type, dimensions):
+        result = await client.aio.models.embed_content(
+            model=MODEL,
+            contents=batch,
+            config={"task_type": task_type, "output_dimensionality": dimensions},
+        )
+        return [emb.values for emb in result.embeddings]
+
+    batcher = EmbeddingBatcher(
+        embed_fn, batch_size=batch_size, max_concurrent_batches=concurrency
+    )
+
+    # simulate pages with 1-5 chunks each
+    pages, i = [], 0
+    while i < len(texts):
+        size = 1 + i % 5
+        pages.append(texts[i : i + size])
+        i += size
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[batcher.embed(page, "RETRIEVAL_DOCUMENT", 768) for page in pages]
+    )
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds/call")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency)
+    client = genai.Client(
+        api_key="bench",
+        http_options=types.HttpOptions(
+            base_url=f"http://127.0.0.1:{server.server_address[1]}"
+        ),
+    )
+    texts = [f"chunk {i} " * 50 for i in range(args.texts)]
+
+    try:
+        serial = await bench_serial_threads(client, texts, args.batch_size)
+        concurrent = await bench_async_batcher(
+            client, texts, args.batch_size, args.concurrency
+        )
+    finally:
+        server.shutdown()
+
+    print(f"{'mode':<32}{'seconds':>10}{'texts/s':>12}")
+    print(
+        f"{'sync + to_thread, serial':<32}{serial:>10.2f}{len(texts) / serial:>12.0f}"
+    )
+    print(
+        f"{f'async, {args.concurrency} batches in flight':<32}"
+        f"{concurrent:>10.2f}{len(texts) / concurrent:>12.0f}"
+    )
+    print(f"speedup: {serial / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Event loop lag while pages are prepared (pruning, cleaning, chunking):
+inline on the event loop vs. in the CPU process pool.
+
+A probe task measures how late the loop wakes up - that delay is added to
+every /agent/ask request served during a crawl.
+
+    uv run python -m benchmarks.bench_loop_lag --pages 40 --workers 2
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from src.utils.cpu_pool import CpuPool, prepare_page
+from src.utils.loop_monitor import EventLoopMonitor
+
+WORDS = "the client sends a request and retries failed calls with backoff".split()
+
+
+def synthetic_page(seed: int, sections: int = 200) -> str:
+    """API-reference style HTML page."""
+    rnd = random.Random(seed)
+    parts = ["<html><body><h1>API Reference</h1>"]
+    for i in range(sections):
+        text = " ".join(rnd.choices(WORDS, k=rnd.randint(40, 120)))
+        code = "\n".join(f"result_{j} = client.call_{i}({j})" for j in range(10))
+        parts.append(
+            f"<h2>method_{i}</h2><p>{text}. See <a href='/api/{i}'>docs</a>.</p>"
+            f"<pre><code>{code}</code></pre>"
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+async def bench(pool: CpuPool, pages: list[str], concurrency: int) -> dict:
+    monitor = EventLoopMonitor(interval=0.01)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prepare(html: str):
+        async with semaphore:
+            return await pool.run(prepare_page, html, "https://example.com/api")
+
+    pool.start()
+    await pool.run(prepare_page, pages[0], "https://example.com/api")  # warm-up
+
+    monitor.start()
+    await asyncio.sleep(monitor.interval)  # probe is sleeping before work starts
+    started = time.perf_counter()
+    await asyncio.gather(*[prepare(html) for html in pages])
+    seconds = time.perf_counter() - started
+    await asyncio.sleep(monitor.interval)  # let the probe record the last wake-up
+    await monitor.stop()
+    pool.shutdown()
+
+    return {"seconds": seconds, **monitor.lag.stats()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    pages = [synthetic_page(i) for i in range(args.pages)]
+
+    print(f"{'mode':<24}{'seconds':>10}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, workers in (("inline", 0), (f"pool ({args.workers})", args.workers)):
+        result = await bench(CpuPool(workers), pages, max(1, args.workers))
+        print(
+            f"{name:<24}{result['seconds']:>10.2f}{result['p50_ms']:>8.1f}ms"
+            f"{result['p99_ms']:>8.1f}ms{result['max_ms']:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+"""
+Quantized vector search vs. match_site_pages on a crawled source:
+index memory, latency and recall@k.
+
+Queries are stored chunk embeddings of the source with a little noise, the
+ground truth is an exact scan (no index). The compact indexes have to exist
+(VECTOR_QUANTIZATION=halfvec/bit, created on app startup) - without them the
+quantized search falls back to a sequential scan.
+
+    uv run python -m benchmarks.bench_quantized --source pydantic --queries 50 --k 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from sqlalchemy import text
+from src.database import sessionmanager_pgvector
+from src.utils.loop_monitor import LatencyStats
+from src.utils.vector_index import INDEX_KINDS, vector_index
+
+EXACT_SEARCH = text("""
+    SELECT id
+    FROM site_pages
+    WHERE source = :source
+    ORDER BY embedding <=> CAST(:query_embedding AS vector)
+    LIMIT :match_count
+""")
+
+FULL_SEARCH = text("""
+    SELECT id
+    FROM match_site_pages(
+        CAST(:query_embedding AS vector),
+        :match_count,
+        CAST(:filter AS jsonb)
+    )
+""")
+
+QUANTIZED_SEARCH = text("""
+    SELECT id
+    FROM match_site_pages_quantized(
+        CAST(:query_embedding AS vector),
+        :match_count,
+        CAST(:filter AS jsonb),
+        :quantization,
+        :rerank_factor
+    )
+""")
+
+
+async def sample_queries(source: str, count: int, noise: float) -> list[list[float]]:
+    async with sessionmanager_pgvector.session() as db:
+        result = await db.execute(
+            text("""
+                SELECT CAST(embedding AS text)
+                FROM site_pages
+                WHERE source = :source AND embedding IS NOT NULL
+                ORDER BY random()
+                LIMIT :count
+            """),
+            {"source": source, "count": count},
+        )
+        embeddings = [json.loads(row) for row in result.scalars().all()]
+
+    rnd = random.Random(0)
+    return [[value + rnd.gauss(0, noise) for value in emb] for emb in embeddings]
+
+
+async def index_sizes() -> dict[str, int]:
+    """Bytes per index kind (summed over all partitions) and of the table data."""
+    async with sessionmanager_pgvector.session() as db:
+        result = await db.execute(
+            text("""
+                SELECT indexname, pg_relation_size(CAST(quote_ident(indexname) AS regclass))
+                FROM pg_indexes
+                WHERE tablename LIKE 'site_pages%'
+            """)
+        )
+        indexes = result.all()
+
+        result = await db.execute(
+            text("""
+                SELECT coalesce(sum(pg_table_size(CAST(quote_ident(tablename) AS regclass))), 0)
+                FROM pg_tables
+                WHERE tablename LIKE 'site_pages%'
+            """)
+        )
+        sizes = {"table": int(result.scalar_one())}
+
+    for kind, (suffix, *_) in INDEX_KINDS.items():
+        sizes[kind] = sum(size for name, size in indexes if name.endswith(suffix))
+    return sizes
+
+
+async def run_search(
+    stmt, params: dict, search_count: int, exact: bool = False
+) -> tuple[list[int], float]:
+    async with sessionmanager_pgvector.session() as db:
+        if exact:
+            for name in ("enable_indexscan", "enable_bitmapscan"):
+                await db.execute(
+                    text("SELECT set_config(:name, 'off', true)"), {"name": name}
+                )
+        else:
+            await vector_index.apply_search_settings(db, match_count=search_count)
+
+        started = time.perf_counter()
+        result = await db.execute(stmt, params)
+        ids = list(result.scalars().all())
+        return ids, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--noise", type=float, default=0.01)
+    args = parser.parse_args()
+
+    queries = await sample_queries(args.source, args.queries, args.noise)
+    if not queries:
+        print(f"No embeddings for source '{args.source}'")
+        return
+
+    sizes = await index_sizes()
+    print(f"table data: {sizes['table'] / 1024**2:.1f} MB")
+    for kind in INDEX_KINDS:
+        print(f"index {kind:<8} {sizes[kind] / 1024**2:>8.1f} MB")
+    print()
+
+    methods = {
+        "match_site_pages": (FULL_SEARCH, None, args.k),
+        "halfvec + rerank": (QUANTIZED_SEARCH, "halfvec", args.k * args.rerank_factor),
+        "bit + rerank": (QUANTIZED_SEARCH, "bit", args.k * args.rerank_factor),
+    }
+    latency = {name: LatencyStats(window=len(queries)) for name in methods}
+    hits = {name: 0 for name in methods}
+
+    for query in queries:
+        params = {
+            "query_embedding": json.dumps(query),
+            "match_count": args.k,
+            "source": args.source,
+            "filter": json.dumps({"source": args.source}),
+            "rerank_factor": args.rerank_factor,
+        }
+        truth, _ = await run_search(EXACT_SEARCH, params, args.k, exact=True)
+
+        for name, (stmt, quantization, search_count) in methods.items():
+            ids, seconds = await run_search(
+                stmt, {**params, "quantization": quantization}, search_count
+            )
+            latency[name].add(seconds)
+            hits[name] += len(set(ids) & set(truth))
+
+    total = len(queries) * args.k
+    print(f"{'search':<20}{f'recall@{args.k}':>10}{'p50':>10}{'p99':>10}")
+    for name in methods:
+        stats = latency[name].stats()
+        print(
+            f"{name:<20}{hits[name] / total:>10.3f}"
+            f"{stats['p50_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms"
+        )
+
+    await sessionmanager_pgvector.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Latency of the in-process memory-mapped vector search vs. exact SQL search on
+a crawled source (top-k agreement with Postgres is reported as well; the
+search itself is tested against a brute-force reference in
+tests/test_vector_mmap.py).
+
+The source is exported into a temporary directory (the app's exports in
+VECTOR_MMAP_DIR are left alone).
+
+    uv run python -m benchmarks.bench_vector_mmap --source pydantic --queries 50 --k 5
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from benchmarks.bench_quantized import EXACT_SEARCH, run_search, sample_queries
+from src.database import sessionmanager_pgvector
+from src.utils.loop_monitor import LatencyStats
+from src.utils.vector_mmap import VectorMmapIndex
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.01)
+    args = parser.parse_args()
+
+    queries = await sample_queries(args.source, args.queries, args.noise)
+    if not queries:
+        print(f"No embeddings for source '{args.source}'")
+        return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorMmapIndex(directory=directory, sources=[args.source])
+        rows = await index.refresh(args.source)
+        print(f"exported {rows} rows")
+
+        latency = {"exact SQL": LatencyStats(), "mmap": LatencyStats()}
+        mismatches = 0
+
+        for query in queries:
+            params = {
+                "query_embedding": json.dumps(query),
+                "match_count": args.k,
+                "source": args.source,
+            }
+            truth, seconds = await run_search(EXACT_SEARCH, params, args.k, exact=True)
+            latency["exact SQL"].add(seconds)
+
+            started = time.perf_counter()
+            found = await index.search(args.source, query, args.k)
+            latency["mmap"].add(time.perf_counter() - started)
+
+            if [row["id"] for row in found] != truth:
+                mismatches += 1
+
+    await sessionmanager_pgvector.close()
+
+    print(f"{'search':<12}{'p50':>10}{'p99':>10}")
+    for name, stats in latency.items():
+        stats = stats.stats()
+        print(f"{name:<12}{stats['p50_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms")
+
+    print(f"top-{args.k} mismatches: {mismatches}/{len(queries)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,152 @@
+"""
+Golden check of `chunk_text`: its chunks for fixed synthetic corpora and edge
+cases have to match benchmarks/fixtures/chunking_golden.json, recorded with the
+original (pre-rewrite) chunker. Exits with status 1 on a mismatch.
+
+Chunks are compared by length and SHA-256; a mismatch prints the first
+differing chunk of the case.
+
+    uv run python -m benchmarks.golden_chunking
+    uv run python -m benchmarks.golden_chunking --write  # chunking changed on purpose
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+from pathlib import Path
+from benchmarks.bench_chunking import (
+    WORDS,
+    synthetic_api_reference,
+    synthetic_worst_case,
+)
+from src.utils.chunking import chunk_text
+
+FIXTURE = Path(__file__).parent / "fixtures" / "chunking_golden.json"
+
+
+def synthetic_padded_code(size: int, seed: int = 0) -> str:
+    """
+    Prose padded with whitespace, a code block and a code block too large for
+    one chunk: the prose chunk shrinks when stripped, so it and the following
+    code chunk get merged although both are above min_chunk_size.
+    """
+    rnd = random.Random(seed)
+    parts, length, n = [], 0, 0
+    while length < size:
+        prose = " ".join(rnd.choices(WORDS, k=rnd.randint(80, 400))) + "."
+        padding = rnd.choice([" ", "\n"]) * rnd.randint(0, 3000)
+        code, large_code = (
+            "".join(f"value_{n}_{i} = {i}\n" for i in range(rnd.randint(low, high)))
+            for low, high in ((50, 250), (500, 700))
+        )
+        section = (
+            f"{prose}{padding}\n\n```python\n{code}```\n\n"
+            f"```python\n{large_code}```\n\n"
+        )
+        parts.append(section)
+        length += len(section)
+        n += 1
+    return "".join(parts)[:size]
+
+
+GENERATORS = {
+    "api-reference": synthetic_api_reference,
+    "worst-case": synthetic_worst_case,
+    "padded-code": synthetic_padded_code,
+}
+
+# (name, generator or inline text, size, seed, max_chunk_size, min_chunk_size)
+CASES = [
+    *[
+        (f"api-reference {size} #{seed}", "api-reference", size, seed, 5000, 4000)
+        for size in (20_000, 200_000, 1_000_000)
+        for seed in (0, 1)
+    ],
+    ("worst-case 50000", "worst-case", 50_000, 0, 5000, 4000),
+    ("api-reference small chunks", "api-reference", 50_000, 2, 1000, 500),
+    ("api-reference min 100", "api-reference", 50_000, 3, 2000, 100),
+    ("worst-case small chunks", "worst-case", 20_000, 1, 800, 200),
+    # chunks between min_chunk_size and 4000 chars are still merged
+    ("padded code merge min 1000", "padded-code", 100_000, 3, 5000, 1000),
+    ("padded code merge min 2000", "padded-code", 100_000, 1, 6000, 2000),
+]
+
+INLINE = {
+    "empty": "",
+    "short": "# Title\n\nOne short paragraph.",
+    "huge code block": "Intro text.\n\n```python\n"
+    + "".join(f"value_{i} = {i}\n" for i in range(1000))
+    + "```\n\nOutro text.",
+    "indented code": "Usage:\n\n"
+    + "".join(f"    call({i})\n" for i in range(600))
+    + "\nDone.",
+    "links only": " ".join(f"[link {i}](https://example.com/{i})" for i in range(800)),
+    "headers": "".join(
+        f"# Header {i}\n## Sub {i}\nText {i} without end " * 3 for i in range(300)
+    ),
+}
+
+
+def case_texts():
+    for name, kind, size, seed, max_size, min_size in CASES:
+        yield name, GENERATORS[kind](size, seed), max_size, min_size
+    for name, text in INLINE.items():
+        yield name, text, 5000, 4000
+
+
+def digest(chunks: list[str]) -> list[dict]:
+    return [
+        {"length": len(chunk), "sha256": hashlib.sha256(chunk.encode()).hexdigest()}
+        for chunk in chunks
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--write", action="store_true", help="record the current output as golden"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name, text, max_size, min_size in case_texts():
+        chunks = chunk_text(text, max_chunk_size=max_size, min_chunk_size=min_size)
+        results[name] = (chunks, digest(chunks))
+
+    if args.write:
+        FIXTURE.parent.mkdir(exist_ok=True)
+        golden = {name: expected for name, (_, expected) in results.items()}
+        FIXTURE.write_text(json.dumps(golden, indent=1) + "\n", encoding="utf-8")
+        print(f"recorded {len(golden)} cases in {FIXTURE}")
+        return 0
+
+    golden = json.loads(FIXTURE.read_text(encoding="utf-8"))
+    mismatches = 0
+    for name, (chunks, found) in results.items():
+        expected = golden.get(name)
+        if found == expected:
+            print(f"ok        {name} ({len(chunks)} chunks)")
+            continue
+
+        mismatches += 1
+        print(f"MISMATCH  {name}")
+        if expected is None:
+            print("  no golden output recorded")
+            continue
+        print(f"  chunks: expected {len(expected)}, got {len(found)}")
+        for i, (want, got) in enumerate(zip(expected, found)):
+            if want != got:
+                print(
+                    f"  chunk {i}: expected {want['length']} chars, got {got['length']}"
+                )
+                print(f"  got: {chunks[i][:200]!r}")
+                break
+
+    print(f"{mismatches}/{len(results)} cases differ from the golden output")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
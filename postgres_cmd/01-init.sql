@@ -21,8 +21,10 @@ create table site_pages (
 );
 
 -- Create an index for better vector similarity search performance
+-- HNSW works on an empty table. The app keeps this index in line with
+-- VECTOR_INDEX_TYPE (hnsw/ivfflat) and rebuilds IVFFlat lists from the row count.
 set maintenance_work_mem = '1GB';  -- Adjust memory if needed
-create index on site_pages using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+create index site_pages_embedding_idx on site_pages using hnsw (embedding vector_cosine_ops);
 
 -- Create an index on meta_details for faster filtering (formerly metadata)
 create index idx_site_pages_meta_details on site_pages using gin (meta_details);
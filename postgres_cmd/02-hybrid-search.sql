@@ -0,0 +1,105 @@
+-- HYBRID SEARCH: FULL-TEXT (tsvector) + VECTOR, FUSED WITH RECIPROCAL RANK FUSION
+-- Runs after 01-init.sql on a new database. For an existing database run it once:
+--   psql -U <user> -d <db> -f postgres_cmd/02-hybrid-search.sql
+
+-- Full-text column, maintained by Postgres on every insert/update.
+-- 'simple' config: no stemming/stop words, so identifiers (model_validate,
+-- Depends, config keys) stay searchable in any documentation language.
+alter table site_pages
+  add column if not exists fts tsvector
+  generated always as (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', content), 'B')
+  ) stored;
+
+create index if not exists idx_site_pages_fts on site_pages using gin (fts);
+
+-- Query side of the full-text search: the words of the question, ORed.
+-- websearch_to_tsquery ANDs every word (and 'simple' keeps the stop words),
+-- so a full question would only match chunks containing all of its words.
+-- ts_rank still ranks chunks with more of the words first.
+create or replace function or_tsquery(query_text text)
+returns tsquery
+language sql immutable strict
+as $$
+  select coalesce(
+    string_agg(
+      '''' || replace(replace(lexeme, '\', '\\'), '''', '''''') || '''',
+      ' | '
+    )::tsquery,
+    ''::tsquery
+  )
+  from unnest(tsvector_to_array(to_tsvector('simple', query_text))) as lexeme
+$$;
+
+-- Full-text and ANN search in one round trip:
+-- both retrievers return candidate_count ranked ids, fused with
+-- score = sum(1 / (rrf_k + rank)) over the retrievers that found the chunk.
+create or replace function hybrid_search_site_pages (
+  query_text text,
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  rrf_k int default 60,
+  candidate_count int default 40
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  meta_details jsonb,
+  similarity float,
+  score float,
+  vector_rank bigint,
+  text_rank bigint
+)
+language sql stable
+as $$
+  with vector_hits as (
+    select
+      site_pages.id,
+      row_number() over (order by site_pages.embedding <=> query_embedding) as rank
+    from site_pages
+    where (filter = '{}'::jsonb or site_pages.meta_details @> filter)
+    order by site_pages.embedding <=> query_embedding
+    limit candidate_count
+  ),
+  text_hits as (
+    select
+      site_pages.id,
+      row_number() over (order by ts_rank_cd(site_pages.fts, query) desc) as rank
+    from site_pages, or_tsquery(query_text) as query
+    where site_pages.fts @@ query
+      and (filter = '{}'::jsonb or site_pages.meta_details @> filter)
+    order by ts_rank_cd(site_pages.fts, query) desc
+    limit candidate_count
+  ),
+  fused as (
+    select
+      coalesce(vector_hits.id, text_hits.id) as id,
+      vector_hits.rank as vector_rank,
+      text_hits.rank as text_rank,
+      (coalesce(1.0 / (rrf_k + vector_hits.rank), 0.0)
+        + coalesce(1.0 / (rrf_k + text_hits.rank), 0.0))::float as score
+    from vector_hits
+    full outer join text_hits on vector_hits.id = text_hits.id
+  )
+  select
+    site_pages.id,
+    site_pages.url,
+    site_pages.chunk_number,
+    site_pages.title,
+    site_pages.summary,
+    site_pages.content,
+    site_pages.meta_details,
+    (1 - (site_pages.embedding <=> query_embedding))::float as similarity,
+    fused.score,
+    fused.vector_rank,
+    fused.text_rank
+  from fused
+  join site_pages on site_pages.id = fused.id
+  order by fused.score desc
+  limit match_count;
+$$;
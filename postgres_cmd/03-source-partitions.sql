@@ -0,0 +1,205 @@
+-- SOURCE COLUMN + LIST PARTITIONING OF site_pages BY SOURCE
+-- Runs after 02-hybrid-search.sql on a new database. For an existing database
+-- run it once (rewrites site_pages, stop the app while it runs):
+--   psql -U <user> -d <db> -f postgres_cmd/03-source-partitions.sql
+--
+-- Every documentation source (library) gets its own partition with its own
+-- vector index, so a source-filtered search only touches that library's data.
+-- Partitions are created by the app (ensure_site_pages_partition) before the
+-- first chunk of a new source is stored, their ANN index by the app as well
+-- (VECTOR_INDEX_TYPE).
+
+-- Partition of a source, created if missing. Returns the partition name.
+create or replace function ensure_site_pages_partition(source_name text)
+returns text
+language plpgsql
+as $$
+declare
+  -- readable + unique, short enough for "<partition>_embedding_idx" (63 chars)
+  partition_name text := 'site_pages_'
+    || left(trim(both '_' from regexp_replace(lower(source_name), '[^a-z0-9]+', '_', 'g')), 29)
+    || '_' || left(md5(source_name), 8);
+begin
+  execute format(
+    'create table if not exists %I partition of site_pages for values in (%L)',
+    partition_name,
+    source_name
+  );
+  return partition_name;
+end;
+$$;
+
+do $$
+begin
+  if exists (
+    select 1 from pg_partitioned_table where partrelid = 'site_pages'::regclass
+  ) then
+    raise notice 'site_pages is already partitioned';
+    return;
+  end if;
+
+  -- keep the old table (and its data) out of the way of the new names
+  alter table site_pages rename to site_pages_unpartitioned;
+  alter table site_pages_unpartitioned rename constraint site_pages_pkey to site_pages_unpartitioned_pkey;
+  alter table site_pages_unpartitioned rename constraint site_pages_url_chunk_number_key to site_pages_unpartitioned_url_chunk_number_key;
+  alter index if exists site_pages_embedding_idx rename to site_pages_unpartitioned_embedding_idx;
+  alter index if exists idx_site_pages_meta_details rename to idx_site_pages_unpartitioned_meta_details;
+  alter index if exists idx_site_pages_fts rename to idx_site_pages_unpartitioned_fts;
+  alter sequence site_pages_id_seq owned by none;
+
+  create table site_pages (
+    id bigint not null default nextval('site_pages_id_seq'),
+    source varchar not null,
+    url varchar not null,
+    chunk_number integer not null,
+    title varchar not null,
+    summary varchar not null,
+    content text not null,
+    meta_details jsonb not null default '{}'::jsonb,
+    embedding vector(768),
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    fts tsvector generated always as (
+      setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+      setweight(to_tsvector('simple', content), 'B')
+    ) stored,
+
+    -- the partition key has to be part of every unique constraint
+    primary key (source, id),
+    unique (source, url, chunk_number)
+  ) partition by list (source);
+
+  alter sequence site_pages_id_seq owned by site_pages.id;
+
+  -- created on every partition automatically (vector indexes: by the app)
+  create index idx_site_pages_meta_details on site_pages using gin (meta_details);
+  create index idx_site_pages_fts on site_pages using gin (fts);
+  create index idx_site_pages_url on site_pages (url);
+
+  perform ensure_site_pages_partition(source_name)
+  from (
+    select distinct coalesce(meta_details->>'source', 'unknown') as source_name
+    from site_pages_unpartitioned
+  ) as sources;
+
+  insert into site_pages (
+    id, source, url, chunk_number, title, summary, content,
+    meta_details, embedding, created_at
+  )
+  select
+    id, coalesce(meta_details->>'source', 'unknown'), url, chunk_number, title,
+    summary, content, meta_details, embedding, created_at
+  from site_pages_unpartitioned;
+
+  drop table site_pages_unpartitioned;
+end;
+$$;
+
+-- Source filter on the partition key (partition pruning), other keys of
+-- `filter` still match against meta_details.
+create or replace function match_site_pages (
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  meta_details jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    title,
+    summary,
+    content,
+    meta_details,
+    1 - (site_pages.embedding <=> query_embedding) as similarity
+  from site_pages
+  where (filter->>'source' is null or site_pages.source = filter->>'source')
+    and (filter - 'source' = '{}'::jsonb or meta_details @> (filter - 'source'))
+  order by site_pages.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+create or replace function hybrid_search_site_pages (
+  query_text text,
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  rrf_k int default 60,
+  candidate_count int default 40
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  meta_details jsonb,
+  similarity float,
+  score float,
+  vector_rank bigint,
+  text_rank bigint
+)
+language sql stable
+as $$
+  with vector_hits as (
+    select
+      site_pages.id,
+      row_number() over (order by site_pages.embedding <=> query_embedding) as rank
+    from site_pages
+    where (filter->>'source' is null or site_pages.source = filter->>'source')
+      and (filter - 'source' = '{}'::jsonb or site_pages.meta_details @> (filter - 'source'))
+    order by site_pages.embedding <=> query_embedding
+    limit candidate_count
+  ),
+  text_hits as (
+    select
+      site_pages.id,
+      row_number() over (order by ts_rank_cd(site_pages.fts, query) desc) as rank
+    from site_pages, or_tsquery(query_text) as query
+    where site_pages.fts @@ query
+      and (filter->>'source' is null or site_pages.source = filter->>'source')
+      and (filter - 'source' = '{}'::jsonb or site_pages.meta_details @> (filter - 'source'))
+    order by ts_rank_cd(site_pages.fts, query) desc
+    limit candidate_count
+  ),
+  fused as (
+    select
+      coalesce(vector_hits.id, text_hits.id) as id,
+      vector_hits.rank as vector_rank,
+      text_hits.rank as text_rank,
+      (coalesce(1.0 / (rrf_k + vector_hits.rank), 0.0)
+        + coalesce(1.0 / (rrf_k + text_hits.rank), 0.0))::float as score
+    from vector_hits
+    full outer join text_hits on vector_hits.id = text_hits.id
+  )
+  select
+    site_pages.id,
+    site_pages.url,
+    site_pages.chunk_number,
+    site_pages.title,
+    site_pages.summary,
+    site_pages.content,
+    site_pages.meta_details,
+    (1 - (site_pages.embedding <=> query_embedding))::float as similarity,
+    fused.score,
+    fused.vector_rank,
+    fused.text_rank
+  from fused
+  join site_pages on site_pages.id = fused.id
+    and site_pages.source = coalesce(filter->>'source', site_pages.source)
+  order by fused.score desc
+  limit match_count;
+$$;
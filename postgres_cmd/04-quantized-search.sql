@@ -0,0 +1,190 @@
+-- QUANTIZED VECTOR SEARCH WITH EXACT RE-RANKING
+-- Runs after 03-source-partitions.sql on a new database. For an existing
+-- database run it once:
+--   psql -U <user> -d <db> -f postgres_cmd/04-quantized-search.sql
+--
+-- Compact expression indexes (created per partition by the app, see
+-- VECTOR_QUANTIZATION) - the table keeps the full vector(768):
+--   halfvec: embedding::halfvec(768)                 (2 bytes/dim, ~1/2 size)
+--   bit:     binary_quantize(embedding)::bit(768)    (1 bit/dim, ~1/32 size)
+-- The first pass over the compact index returns match_count * rerank_factor
+-- candidates, re-ranked by exact cosine distance on the full vectors.
+
+create or replace function match_site_pages_quantized (
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  quantization text default 'halfvec',
+  rerank_factor int default 4
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  meta_details jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if quantization = 'bit' then
+    return query
+    select
+      candidates.id,
+      candidates.url,
+      candidates.chunk_number,
+      candidates.title,
+      candidates.summary,
+      candidates.content,
+      candidates.meta_details,
+      1 - (candidates.embedding <=> query_embedding) as similarity
+    from (
+      select site_pages.*
+      from site_pages
+      where (filter->>'source' is null or site_pages.source = filter->>'source')
+        and (filter - 'source' = '{}'::jsonb or site_pages.meta_details @> (filter - 'source'))
+      order by binary_quantize(site_pages.embedding)::bit(768)
+        <~> binary_quantize(query_embedding)
+      limit match_count * rerank_factor
+    ) as candidates
+    order by candidates.embedding <=> query_embedding
+    limit match_count;
+
+  elsif quantization = 'halfvec' then
+    return query
+    select
+      candidates.id,
+      candidates.url,
+      candidates.chunk_number,
+      candidates.title,
+      candidates.summary,
+      candidates.content,
+      candidates.meta_details,
+      1 - (candidates.embedding <=> query_embedding) as similarity
+    from (
+      select site_pages.*
+      from site_pages
+      where (filter->>'source' is null or site_pages.source = filter->>'source')
+        and (filter - 'source' = '{}'::jsonb or site_pages.meta_details @> (filter - 'source'))
+      order by site_pages.embedding::halfvec(768) <=> query_embedding::halfvec(768)
+      limit match_count * rerank_factor
+    ) as candidates
+    order by candidates.embedding <=> query_embedding
+    limit match_count;
+
+  else
+    return query
+    select * from match_site_pages(query_embedding, match_count, filter);
+  end if;
+end;
+$$;
+
+-- Hybrid search with the same quantized first pass for the vector retriever.
+-- (new parameters -> drop the old signature, calls without them still work)
+drop function if exists hybrid_search_site_pages(text, vector, int, jsonb, int, int);
+
+create or replace function hybrid_search_site_pages (
+  query_text text,
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  rrf_k int default 60,
+  candidate_count int default 40,
+  quantization text default 'none',
+  rerank_factor int default 4
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  meta_details jsonb,
+  similarity float,
+  score float,
+  vector_rank bigint,
+  text_rank bigint
+)
+language sql stable
+as $$
+  -- inlined into every reference, so each branch can use its own index
+  with filtered as not materialized (
+    select site_pages.*
+    from site_pages
+    where (filter->>'source' is null or site_pages.source = filter->>'source')
+      and (filter - 'source' = '{}'::jsonb or site_pages.meta_details @> (filter - 'source'))
+  ),
+  -- only the branch of the configured quantization runs (one-time filter)
+  vector_candidates as (
+    (
+      select filtered.id, filtered.embedding
+      from filtered
+      where quantization not in ('halfvec', 'bit')
+      order by filtered.embedding <=> query_embedding
+      limit candidate_count
+    )
+    union all
+    (
+      select filtered.id, filtered.embedding
+      from filtered
+      where quantization = 'halfvec'
+      order by filtered.embedding::halfvec(768) <=> query_embedding::halfvec(768)
+      limit candidate_count * rerank_factor
+    )
+    union all
+    (
+      select filtered.id, filtered.embedding
+      from filtered
+      where quantization = 'bit'
+      order by binary_quantize(filtered.embedding)::bit(768)
+        <~> binary_quantize(query_embedding)
+      limit candidate_count * rerank_factor
+    )
+  ),
+  vector_hits as (
+    select
+      vector_candidates.id,
+      row_number() over (order by vector_candidates.embedding <=> query_embedding) as rank
+    from vector_candidates
+    order by vector_candidates.embedding <=> query_embedding
+    limit candidate_count
+  ),
+  text_hits as (
+    select
+      filtered.id,
+      row_number() over (order by ts_rank_cd(filtered.fts, query) desc) as rank
+    from filtered, or_tsquery(query_text) as query
+    where filtered.fts @@ query
+    order by ts_rank_cd(filtered.fts, query) desc
+    limit candidate_count
+  ),
+  fused as (
+    select
+      coalesce(vector_hits.id, text_hits.id) as id,
+      vector_hits.rank as vector_rank,
+      text_hits.rank as text_rank,
+      (coalesce(1.0 / (rrf_k + vector_hits.rank), 0.0)
+        + coalesce(1.0 / (rrf_k + text_hits.rank), 0.0))::float as score
+    from vector_hits
+    full outer join text_hits on vector_hits.id = text_hits.id
+  )
+  select
+    filtered.id,
+    filtered.url,
+    filtered.chunk_number,
+    filtered.title,
+    filtered.summary,
+    filtered.content,
+    filtered.meta_details,
+    (1 - (filtered.embedding <=> query_embedding))::float as similarity,
+    fused.score,
+    fused.vector_rank,
+    fused.text_rank
+  from fused
+  join filtered on filtered.id = fused.id
+  order by fused.score desc
+  limit match_count;
+$$;
@@ -0,0 +1,41 @@
+-- PAGE CATALOG: TITLE COLUMN + PREFIX INDEX ON crawled_pages
+-- crawled_pages is created by the app (with these columns) - this file only
+-- upgrades an existing table. For an existing database run it once:
+--   psql -U <user> -d <db> -f postgres_cmd/05-page-catalog.sql
+--
+-- crawled_pages (one row per page, maintained by the ingest) is the catalog
+-- of a source for list_documentation_pages: url, title, chunk count.
+
+do $$
+begin
+  if to_regclass('crawled_pages') is null then
+    raise notice 'crawled_pages does not exist yet (created by the app)';
+    return;
+  end if;
+
+  alter table crawled_pages add column if not exists title varchar;
+
+  create index if not exists idx_crawled_pages_url_pattern
+    on crawled_pages (source, url varchar_pattern_ops);
+
+  -- pages stored before crawled_pages existed
+  insert into crawled_pages (source, url, chunk_count)
+  select source, url, count(*)
+  from site_pages
+  group by source, url
+  on conflict (source, url) do nothing;
+
+  -- title of the first chunk (same as get_page_content)
+  update crawled_pages
+  set title = first_chunks.title
+  from (
+    select distinct on (source, url)
+      source, url, split_part(title, ' - ', 1) as title
+    from site_pages
+    order by source, url, chunk_number
+  ) as first_chunks
+  where crawled_pages.title is null
+    and crawled_pages.source = first_chunks.source
+    and crawled_pages.url = first_chunks.url;
+end;
+$$;
@@ -0,0 +1,20 @@
+-- CRAWL JOB CLAIMS: WHICH PROCESS RUNS A JOB
+-- crawl_jobs is created by the app (with these columns) - this file only
+-- upgrades an existing table. For an existing database run it once:
+--   psql -U <user> -d <db> -f postgres_cmd/06-crawl-job-claims.sql
+--
+-- Every worker claims unfinished jobs atomically (FOR UPDATE SKIP LOCKED) and
+-- refreshes heartbeat_at while it runs them. Jobs of a process that died
+-- (heartbeat older than CRAWL_JOB_STALE_AFTER) are claimed by another one.
+
+do $$
+begin
+  if to_regclass('crawl_jobs') is null then
+    raise notice 'crawl_jobs does not exist yet (created by the app)';
+    return;
+  end if;
+
+  alter table crawl_jobs add column if not exists claimed_by varchar;
+  alter table crawl_jobs add column if not exists heartbeat_at timestamptz;
+end;
+$$;
@@ -1,18 +1,46 @@
 import json
 from dataclasses import dataclass
-from pydantic_ai import Agent, RunContext
+from functools import lru_cache
+from typing import AsyncIterator
+from pydantic_ai import (
+    Agent,
+    AgentRunResultEvent,
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    RunContext,
+    TextPart,
+    TextPartDelta,
+)
 from src.database import sessionmanager_pgvector, DatabaseSessionManager
 from src.database.models.agent_sitepage import SitePage
+from src.crud.agent import list_pages
 from sqlalchemy.future import select
 from sqlalchemy import text
 from src.utils.text_embedder import get_embedding_single
+from src.utils.vector_index import vector_index
+from src.utils.vector_mmap import vector_mmap
+from src.utils.page_cache import AssembledPage, page_cache
+from src.utils.context_packing import context_packer
+from src.utils.answer_cache import record_retrieval
 from src.utils.llm.gemini_cl import gemini_model, model_name_ask
+from src.config import SET_CONF
+
+
+# answer of the model when the documentation has nothing (never cached)
+NO_DATA_MESSAGES = {
+    "de": "Keine Daten in der Dokumentation gefunden.",
+    "en": "No data found in documentation.",
+}
 
 
 @dataclass
 class DocumentationDeps:
     sessionmanager_pgvector: DatabaseSessionManager
     source_filter: str
+    probes: int | None = None  # ivfflat.probes for this request (None = default)
+    ef_search: int | None = None  # hnsw.ef_search for this request
 
 
 def make_system_prompt(
@@ -25,11 +53,7 @@ def make_system_prompt(
         language: Output language ('de' for German, 'en' for English)
     """
     lang_name = "German" if language == "de" else "English"
-    no_data_msg = (
-        "Keine Daten in der Dokumentation gefunden."
-        if language == "de"
-        else "No data found in documentation."
-    )
+    no_data_msg = NO_DATA_MESSAGES["de" if language == "de" else "en"]
 
     return f"""You are an expert assistant for {library_name} documentation.
 
@@ -39,9 +63,9 @@ Your role:
 - Always respond in {lang_name}
 
 Search strategy:
-1. Use RAG (vector similarity search) first to find relevant documentation
+1. Use RAG (hybrid keyword + vector search) first to find relevant documentation
 2. Check multiple documentation sections if the first result is insufficient
-3. Retrieve specific pages when needed for detailed information
+3. Browse the page list (path prefix / text filter, paged) and retrieve specific pages when needed
 
 Response guidelines:
 - Provide code examples when helpful (keep them in their original language)
@@ -93,6 +117,14 @@ class RAGAgent:
         # return result.output
         return result
 
+    def run_stream_events(self, query: str, source_filter: str):
+        """Like run(), as stream of tool/model events ending with the result."""
+        agent_deps = DocumentationDeps(
+            sessionmanager_pgvector=sessionmanager_pgvector,
+            source_filter=source_filter,
+        )
+        return self.agent.run_stream_events(query, deps=agent_deps)
+
 
 class AnswerAgent:
     """Agent for final Answer with better Model."""
@@ -120,6 +152,123 @@ class AnswerAgent:
         )
         return result
 
+    async def run_with_context(self, query: str, source_filter: str, context: str):
+        """Single call: answer from already retrieved documentation chunks."""
+        agent_deps = DocumentationDeps(
+            sessionmanager_pgvector=sessionmanager_pgvector,
+            source_filter=source_filter,
+        )
+
+        return await self.agent.run(context_prompt(query, context), deps=agent_deps)
+
+    def run_stream_events(self, query: str, source_filter: str, message_history=None):
+        """Like run(), as stream of model events ending with the result."""
+        agent_deps = DocumentationDeps(
+            sessionmanager_pgvector=sessionmanager_pgvector,
+            source_filter=source_filter,
+        )
+        return self.agent.run_stream_events(
+            query, deps=agent_deps, message_history=message_history
+        )
+
+
+def context_prompt(query: str, context: str) -> str:
+    """Prompt of the fast mode: retrieved chunks + question."""
+    return f"""Documentation retrieved for this question:
+
+{context}
+
+---
+
+Question: {query}"""
+
+
+# Agents hold no per-run state: one per (library, language), reused across requests
+@lru_cache(maxsize=SET_CONF.AGENT_CACHE_MAX_ENTRIES)
+def get_rag_agent(library_name: str, language: str = "en") -> RAGAgent:
+    return RAGAgent(library_name=library_name, language=language)
+
+
+@lru_cache(maxsize=SET_CONF.AGENT_CACHE_MAX_ENTRIES)
+def get_answer_agent(library_name: str, language: str = "en") -> AnswerAgent:
+    return AnswerAgent(library_name=library_name, language=language)
+
+
+async def answer_fast(query: str, source_filter: str, language: str = "en"):
+    """
+    Fast mode: embed + retrieve directly, then one answer-model call
+    (no tool loop, no second conversation).
+    """
+    deps = DocumentationDeps(
+        sessionmanager_pgvector=sessionmanager_pgvector,
+        source_filter=source_filter,
+    )
+    rows = await search_documentation(deps, query)
+    context = format_chunks(rows) if rows else "No relevant documentation found."
+
+    answer_agent = get_answer_agent(source_filter, language)
+    return await answer_agent.run_with_context(query, source_filter, context)
+
+
+def _text_delta(event) -> str | None:
+    """New answer text of a model stream event (None = no text)."""
+    if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+        return event.part.content
+    if isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+        return event.delta.content_delta
+    return None
+
+
+async def stream_answer(
+    query: str, source_filter: str, language: str = "en", mode: str = "agentic"
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Answer as (event, data) pairs while it is produced:
+    "tool" / "tool_result" (retrieval progress), "token" (answer text) and
+    finally "done" with the whole answer.
+    """
+    if mode == "fast":
+        deps = DocumentationDeps(
+            sessionmanager_pgvector=sessionmanager_pgvector,
+            source_filter=source_filter,
+        )
+        tool = "retrieve_relevant_documentation"
+        yield "tool", {"tool": tool, "args": {"user_query": query}}
+        rows = await search_documentation(deps, query)
+        yield "tool_result", {"tool": tool, "chunks": len(rows)}
+
+        context = format_chunks(rows) if rows else "No relevant documentation found."
+        events = get_answer_agent(source_filter, language).run_stream_events(
+            context_prompt(query, context), source_filter
+        )
+    else:
+        # tool loop: only progress is streamed, its text isn't the answer
+        tool_result = None
+        tool_agent = get_rag_agent(source_filter, language)
+        async for event in tool_agent.run_stream_events(query, source_filter):
+            if isinstance(event, FunctionToolCallEvent):
+                yield (
+                    "tool",
+                    {
+                        "tool": event.part.tool_name,
+                        "args": event.part.args_as_dict(),
+                    },
+                )
+            elif isinstance(event, FunctionToolResultEvent):
+                yield "tool_result", {"tool": event.result.tool_name}
+            elif isinstance(event, AgentRunResultEvent):
+                tool_result = event.result
+
+        events = get_answer_agent(source_filter, language).run_stream_events(
+            query, source_filter, message_history=tool_result.new_messages()
+        )
+
+    async for event in events:
+        if isinstance(event, AgentRunResultEvent):
+            yield "done", {"output": event.result.output}
+        elif (text := _text_delta(event)) is not None:
+            yield "token", {"text": text}
+
 
 # OLD WAY
 # Let's define a placeholder for the agent that the decorators can use.
@@ -134,6 +283,7 @@ async def retrieve_relevant_documentation(
 ) -> str:
     """
     Retrieve relevant documentation chunks based on the query with RAG.
+    Hybrid search: matches exact identifiers (full-text) and meaning (vector).
 
     Args:
         ctx: The context including the pbvector/db client and gemini/llm client
@@ -141,128 +291,360 @@ async def retrieve_relevant_documentation(
 
     Returns:
         A formatted string containing the top 5 most relevant documentation chunks
+        (with RETRIEVAL_NEIGHBOR_CHUNKS: with the surrounding chunks of the page)
     """
     try:
-        query_embedding = await get_embedding_single(user_query)
-
-        clean_source = ctx.deps.source_filter.strip('"')
-
-        async with ctx.deps.sessionmanager_pgvector.session() as session:
-            result = await session.execute(
-                text("""
-                    SELECT *
-                    FROM match_site_pages(
-                        CAST(:query_embedding AS vector),
-                        :match_count,
-                        :filter
-                    )
-                """),
-                {
-                    "query_embedding": json.dumps(query_embedding),
-                    "match_count": 5,
-                    "filter": json.dumps({"source": clean_source}),
-                },
-            )
-
-            # Use .mappings() to return rows as dictionaries
-            rows = result.mappings().all()  # This will give you a list of dictionaries
+        rows = await search_documentation(ctx.deps, user_query)
 
         if not rows:
             print("No relevant documentation found.")
             return "No relevant documentation found."
 
         print("================\nretrieve_relevant_documentation ROWS: ", rows)
-        # Format the results
-        formatted_chunks = []
-        for row in rows:
-            chunk_text = f"""
+        return format_chunks(rows)
+
+    except Exception as e:
+        print(f"Error retrieving documentation: {e}")
+        return f"Error retrieving documentation: {str(e)}"
+
+
+async def search_documentation(
+    deps: DocumentationDeps, user_query: str, match_count: int = 5
+) -> list:
+    """
+    Embed the query and return the top chunks of deps.source_filter:
+    RETRIEVAL_OVERFETCH candidates per chunk, near duplicates dropped (MMR),
+    packed into RETRIEVAL_TOKEN_BUDGET. With RETRIEVAL_NEIGHBOR_CHUNKS each
+    hit comes with the chunks around it (overlapping windows merged).
+
+    Hot sources (VECTOR_MMAP_SOURCES) are searched in-process by exact vector
+    similarity only: HYBRID_SEARCH's full-text retriever (exact identifiers)
+    doesn't apply to them.
+    """
+    try:
+        rows = await _search_documentation(deps, user_query, match_count)
+    except Exception:
+        record_retrieval(error=True)  # the answer isn't cached
+        raise
+
+    record_retrieval(chunks=len(rows))
+    return rows
+
+
+async def _search_documentation(
+    deps: DocumentationDeps, user_query: str, match_count: int
+) -> list:
+    query_embedding = await get_embedding_single(user_query)
+
+    clean_source = deps.source_filter.strip('"')
+    candidate_count = match_count * SET_CONF.RETRIEVAL_OVERFETCH
+
+    # rows the ANN index has to return (quantized: first pass is larger)
+    ann_count = candidate_count
+    if SET_CONF.HYBRID_SEARCH:
+        ann_count = max(SET_CONF.HYBRID_CANDIDATES, candidate_count)
+    if SET_CONF.VECTOR_QUANTIZATION != "none":
+        ann_count *= SET_CONF.QUANTIZED_RERANK_FACTOR
+
+    neighbor_chunks = SET_CONF.RETRIEVAL_NEIGHBOR_CHUNKS
+
+    # hot sources: in-process search, no SQL round trip (None = not exported)
+    rows = await vector_mmap.search(
+        clean_source, query_embedding, candidate_count, neighbor_chunks
+    )
+
+    if rows is None:
+        async with deps.sessionmanager_pgvector.session() as session:
+            # recall/speed trade-off of the ANN index, for this transaction only
+            await vector_index.apply_search_settings(
+                session,
+                probes=deps.probes,
+                ef_search=deps.ef_search,
+                match_count=ann_count,
+            )
+
+            rows = await search_site_pages(
+                session,
+                user_query,
+                query_embedding,
+                clean_source,
+                candidate_count,
+                neighbor_chunks,
+            )
+
+    return context_packer.pack(rows, max_chunks=match_count)
+
+
+def format_chunks(rows) -> str:
+    """Chunks as markdown sections, joined with a separator."""
+    formatted_chunks = []
+    for row in rows:
+        chunk_text = f"""
 # {row["title"]}
 
 {row["content"]}
 """
-            formatted_chunks.append(chunk_text)
+        formatted_chunks.append(chunk_text)
 
-        # Join all chunks with a separator
-        return "\n\n---\n\n".join(formatted_chunks)
+    return "\n\n---\n\n".join(formatted_chunks)
 
-    except Exception as e:
-        print(f"Error retrieving documentation: {e}")
-        return f"Error retrieving documentation: {str(e)}"
+
+async def search_site_pages(
+    session,
+    query: str,
+    query_embedding: list[float],
+    source: str,
+    match_count: int = 5,
+    neighbor_chunks: int = 0,
+) -> list[dict]:
+    """
+    Top chunks of a source in one SQL round trip: hybrid_search_site_pages
+    (full-text + ANN, RRF) or match_site_pages (ANN only, HYBRID_SEARCH=False).
+    With VECTOR_QUANTIZATION the ANN pass runs over the compact index and is
+    re-ranked by exact cosine distance.
+
+    The search function is called without WITH ORDINALITY, so Postgres can
+    inline the SQL function and prune the site_pages partitions. The outer
+    query restores the ranking from score (hybrid) or similarity.
+
+    The same query returns the embedding of each hit (context packing) and,
+    with neighbor_chunks > 0, its window: chunk_number +-neighbor_chunks of the
+    same URL, looked up per hit (LATERAL) on the (source, url, chunk_number)
+    unique index.
+    """
+    params = {
+        "query_embedding": json.dumps(query_embedding),
+        "match_count": match_count,
+        "filter": json.dumps({"source": source}),
+        "quantization": SET_CONF.VECTOR_QUANTIZATION,
+        "rerank_factor": SET_CONF.QUANTIZED_RERANK_FACTOR,
+        "source": source,
+        "neighbor_chunks": neighbor_chunks,
+    }
+
+    if SET_CONF.HYBRID_SEARCH:
+        search = """
+            hybrid_search_site_pages(
+                :query_text,
+                CAST(:query_embedding AS vector),
+                :match_count,
+                CAST(:filter AS jsonb),
+                :rrf_k,
+                :candidate_count,
+                :quantization,
+                :rerank_factor
+            )
+        """
+        params |= {
+            "query_text": query,
+            "rrf_k": SET_CONF.HYBRID_RRF_K,
+            "candidate_count": max(SET_CONF.HYBRID_CANDIDATES, match_count),
+        }
+        ranking = "hits.score DESC"
+    elif SET_CONF.VECTOR_QUANTIZATION != "none":
+        search = """
+            match_site_pages_quantized(
+                CAST(:query_embedding AS vector),
+                :match_count,
+                CAST(:filter AS jsonb),
+                :quantization,
+                :rerank_factor
+            )
+        """
+        ranking = "hits.similarity DESC"
+    else:
+        search = """
+            match_site_pages(
+                CAST(:query_embedding AS vector),
+                :match_count,
+                :filter
+            )
+        """
+        ranking = "hits.similarity DESC"
+
+    stmt = text(f"""
+        SELECT
+            hits.*,
+            CAST(pages.embedding AS text) AS hit_embedding,
+            windows.chunk_numbers AS window_chunk_numbers,
+            windows.contents AS window_contents
+        FROM {search} AS hits
+        JOIN site_pages pages
+          ON pages.source = :source AND pages.id = hits.id
+        LEFT JOIN LATERAL (
+            SELECT
+                array_agg(n.chunk_number ORDER BY n.chunk_number) AS chunk_numbers,
+                array_agg(n.content ORDER BY n.chunk_number) AS contents
+            FROM site_pages n
+            WHERE :neighbor_chunks > 0
+              AND n.source = :source
+              AND n.url = hits.url
+              AND n.chunk_number BETWEEN hits.chunk_number - :neighbor_chunks
+                                     AND hits.chunk_number + :neighbor_chunks
+        ) windows ON true
+        ORDER BY {ranking}, hits.id
+    """)
+
+    result = await session.execute(stmt, params)
+
+    rows = []
+    for mapping in result.mappings():
+        row = dict(mapping)
+        embedding = row.pop("hit_embedding")
+        row["embedding"] = json.loads(embedding) if embedding else None
+
+        numbers, contents = row.pop("window_chunk_numbers"), row.pop("window_contents")
+        if numbers:
+            row["window"] = dict(zip(numbers, contents))
+        rows.append(row)
+    return rows
 
 
 # @documentation_expert.tool
 async def list_documentation_pages(
     ctx: RunContext[DocumentationDeps] = None,
-) -> list[str]:
+    path_prefix: str | None = None,
+    contains: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> dict:
     """
-    Retrieve a list of all available documentation pages of the desired library.
+    List documentation pages of the desired library, sorted by URL.
+
+    Large libraries have thousands of pages: narrow the list down with
+    path_prefix / contains and page through it with limit / offset.
+
+    Args:
+        path_prefix: Only pages whose URL path ("/docs/api") or full URL starts with it
+        contains: Only pages whose URL or title contains this text (case-insensitive)
+        limit: Max. number of pages to return (1-200)
+        offset: Number of pages to skip (next page: the returned next_offset)
 
     Returns:
-        List[str]: List of unique URLs for all documentation pages
+        dict: total (matching pages), next_offset (None = no more pages) and
+        pages (url, title, chunks)
     """
     try:
         clean_source = ctx.deps.source_filter.strip('"')
+        limit = max(1, min(limit, 200))
+        offset = max(0, offset)
 
         async with ctx.deps.sessionmanager_pgvector.session() as session:
-            stmt = select(SitePage.url).where(text("meta_details->>'source' = :source"))
-
-            result = await session.execute(stmt, {"source": clean_source})
-
-            urls = sorted(set(row[0] for row in result.fetchall()))
+            total, rows = await list_pages(
+                session, clean_source, path_prefix, contains, limit, offset
+            )
 
-        return urls
+        next_offset = offset + len(rows)
+        return {
+            "total": total,
+            "next_offset": next_offset if next_offset < total else None,
+            "pages": [
+                {"url": row.url, "title": row.title, "chunks": row.chunk_count}
+                for row in rows
+            ],
+        }
 
     except Exception as e:
         print(f"Error retrieving documentation pages: {e}")
-        return []
+        return {"total": 0, "next_offset": None, "pages": []}
 
 
 # @documentation_expert.tool
 async def get_page_content(
-    ctx: RunContext[DocumentationDeps] = None, url: str = None
+    ctx: RunContext[DocumentationDeps] = None,
+    url: str = None,
+    start_chunk: int = 0,
+    end_chunk: int | None = None,
+    max_chars: int = SET_CONF.PAGE_CONTENT_MAX_CHARS,
 ) -> str:
     """
-    Retrieve the full content of a specific documentation page by combining all its chunks.
+    Retrieve the content of a documentation page, a window of its chunks at a time.
+
+    Long pages are returned in parts: the first line tells which chunks were
+    returned, the page length and start_chunk of the next part.
 
     Args:
         ctx: The context including the db client
         url: The URL of the page to retrieve
+        start_chunk: First chunk to return (0 = page start)
+        end_chunk: Last chunk to return (inclusive, None = as many as fit)
+        max_chars: Character budget of this part (at least one chunk is returned)
 
     Returns:
-        str: The complete page content with all chunks combined in order
+        str: Page length metadata and the content of the chunk window
     """
     try:
         clean_source = ctx.deps.source_filter.strip('"')
 
-        async with ctx.deps.sessionmanager_pgvector.session() as session:
-            stmt = (
-                select(
-                    SitePage.title,
-                    SitePage.content,
-                    SitePage.chunk_number,
-                )
-                .where(SitePage.url == url)
-                .where(text("meta_details->>'source' = :source"))
-                .order_by(SitePage.chunk_number)
-            )
+        page = page_cache.get((clean_source, url))
+        if page is None:
+            page = await load_page(ctx.deps.sessionmanager_pgvector, clean_source, url)
+            if page is None:
+                return f"No content found for URL: {url} in {clean_source}"
+            page_cache.set((clean_source, url), page)
 
-            result = await session.execute(stmt, {"source": clean_source})
-            rows = result.fetchall()
+        return format_page_window(page, url, start_chunk, end_chunk, max_chars)
 
-            print(f"===========\nget_page_content {rows=}")
+    except Exception as e:
+        return f"Error retrieving page content: {str(e)}"
 
-        if not rows:
-            return f"No content found for URL: {url} in {clean_source}"
 
-        page_title = rows[0][0].split(" - ")[0]
-        formatted_content = [f"# {page_title}\n"]
+async def load_page(
+    sessionmanager: DatabaseSessionManager, source: str, url: str
+) -> AssembledPage | None:
+    """All chunks of a page in order (None = unknown page)."""
+    async with sessionmanager.session() as session:
+        stmt = (
+            select(
+                SitePage.title,
+                SitePage.content,
+                SitePage.chunk_number,
+            )
+            .where(SitePage.source == source)
+            .where(SitePage.url == url)
+            .order_by(SitePage.chunk_number)
+        )
+
+        result = await session.execute(stmt)
+        rows = result.fetchall()
 
-        for row in rows:
-            formatted_content.append(row[1])
+    if not rows:
+        return None
 
-        output = "\n\n".join(formatted_content)
+    return AssembledPage(
+        title=rows[0][0].split(" - ")[0],
+        chunks=[row[1] for row in rows],
+    )
 
-        return output
 
-    except Exception as e:
-        return f"Error retrieving page content: {str(e)}"
+def format_page_window(
+    page: AssembledPage,
+    url: str,
+    start_chunk: int = 0,
+    end_chunk: int | None = None,
+    max_chars: int = SET_CONF.PAGE_CONTENT_MAX_CHARS,
+) -> str:
+    """Chunks start_chunk..end_chunk within max_chars, with page length metadata."""
+    total = len(page.chunks)
+    start = min(max(0, start_chunk), total - 1)
+    last = total - 1 if end_chunk is None else min(max(start, end_chunk), total - 1)
+
+    parts = [page.chunks[start]]
+    chars = len(parts[0])
+    for chunk in page.chunks[start + 1 : last + 1]:
+        if chars + len(chunk) > max_chars:
+            break
+        parts.append(chunk)
+        chars += len(chunk)
+
+    end = start + len(parts) - 1
+    if end + 1 < total:
+        next_part = f"next part: start_chunk={end + 1}"
+    else:
+        next_part = "end of page"
+    header = (
+        f"[{url} | chunks {start}-{end} of {total} | "
+        f"{chars} of {page.total_chars} characters | {next_part}]"
+    )
+
+    return "\n\n".join([f"# {page.title}\n", header, *parts])
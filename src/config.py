@@ -11,6 +11,99 @@ class AppSettings(BaseSettings):
     GEMINI_API_KEY: str
     EMBED_STORE: str
 
+    # Persistent embedding cache (table "embedding_cache")
+    EMBED_CACHE_ENABLED: bool = True
+    EMBED_CACHE_MAX_ENTRIES: int = 500_000
+
+    # Shared embedding micro-batcher (max. 100 texts per API call)
+    EMBED_BATCH_SIZE: int = 100
+    EMBED_BATCH_MAX_WAIT: float = 0.2  # seconds until a partial batch is sent
+    EMBED_MAX_CONCURRENT_BATCHES: int = 4  # API calls in flight
+
+    # Chunk excerpts per title/summary LLM call (1 = one call per chunk)
+    SUMMARY_BATCH_SIZE: int = 10
+
+    # Staged ingest pipeline (fetch workers = max_concurrent of the crawl)
+    INGEST_CHUNK_WORKERS: int = 2  # >= CPU_POOL_WORKERS keeps the pool busy
+    INGEST_SUMMARY_WORKERS: int = 4
+    INGEST_EMBED_WORKERS: int = 4
+    INGEST_STORE_WORKERS: int = 2
+    INGEST_QUEUE_SIZE: int = 8  # max. pages waiting in front of each stage
+
+    # Persistent crawl jobs: attempts per URL before it's given up
+    CRAWL_MAX_ATTEMPTS: int = 3
+    # claims of running jobs: heartbeat interval, and after how long without
+    # heartbeat another worker takes the job over (its process died)
+    CRAWL_JOB_HEARTBEAT: float = 30  # seconds
+    CRAWL_JOB_STALE_AFTER: float = 120  # seconds
+
+    # In-process cache for query embeddings
+    QUERY_EMBED_CACHE_MAX_ENTRIES: int = 2048
+    QUERY_EMBED_CACHE_TTL: float = 3600  # seconds
+
+    # Process pool for HTML pruning, markdown cleaning and chunking (0 = inline)
+    CPU_POOL_WORKERS: int = 2
+
+    # Event loop lag monitor
+    LOOP_MONITOR_INTERVAL: float = 0.1  # seconds between probes
+    LATENCY_WINDOW: int = 1000  # samples kept for percentiles
+
+    # ANN index on site_pages.embedding: "hnsw" or "ivfflat"
+    VECTOR_INDEX_TYPE: str = "hnsw"
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    IVFFLAT_PROBES: int | None = None  # None = sqrt(lists)
+    IVFFLAT_REBUILD_RATIO: float = 2.0  # rebuild when ideal lists drift by this
+    INDEX_MAINTENANCE_WORK_MEM: str = "1GB"
+
+    # Compact ANN index: "none", "halfvec" or "bit" (04-quantized-search.sql),
+    # candidates (x QUANTIZED_RERANK_FACTOR) are re-ranked on the full vectors
+    VECTOR_QUANTIZATION: str = "none"
+    VECTOR_FULL_INDEX: bool = True  # False = only the compact index (quantized)
+    QUANTIZED_RERANK_FACTOR: int = 4
+
+    # Hybrid retrieval: full-text + vector, fused with RRF (02-hybrid-search.sql)
+    HYBRID_SEARCH: bool = True  # False = vector search only (match_site_pages)
+    HYBRID_RRF_K: int = 60
+    HYBRID_CANDIDATES: int = 40  # candidates per retriever before fusion
+
+    # In-process vector search for hot sources: memory-mapped exports of
+    # site_pages, shared by all workers via the page cache (e.g. '["pydantic"]').
+    # Exact vector search only: no full-text half of HYBRID_SEARCH for them
+    VECTOR_MMAP_SOURCES: list[str] = []
+    VECTOR_MMAP_DIR: str = os.path.join(BASEDIR, "data", "vector_mmap")
+
+    # /agent/ask: "agentic" (tool loop + answer model) or "fast" (retrieve +
+    # one answer-model call), selectable per request
+    ASK_DEFAULT_MODE: str = "agentic"
+    AGENT_CACHE_MAX_ENTRIES: int = 64  # reused agents per (library, language)
+
+    # Semantic answer cache: answers reused for similar questions per
+    # source/language, dropped when the source is re-crawled
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # min. cosine similarity of the questions
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL: float = 86400  # seconds
+
+    # In-process cache of the sources catalog (show_docs, url_exists)
+    SOURCES_CACHE_TTL: float = 60  # seconds other workers may lag behind a crawl
+    SOURCE_COUNTS_INTERVAL: float = 30  # seconds between count updates in a crawl
+
+    # get_page_content: assembled pages (LRU) and characters per call
+    PAGE_CACHE_MAX_ENTRIES: int = 256
+    PAGE_CACHE_TTL: float = 3600  # seconds
+    PAGE_CONTENT_MAX_CHARS: int = 12_000
+
+    # retrieve_relevant_documentation: over-fetched candidates, deduplicated
+    # with MMR and packed into a token budget
+    RETRIEVAL_OVERFETCH: int = 4  # candidates per returned chunk
+    RETRIEVAL_TOKEN_BUDGET: int = 4000
+    MMR_LAMBDA: float = 0.7  # 1 = relevance only, 0 = diversity only
+    MMR_DUPLICATE_THRESHOLD: float = 0.95  # cosine of near-duplicate chunks
+    # chunks before/after each hit (same page) fetched with it, 0 = hits only
+    RETRIEVAL_NEIGHBOR_CHUNKS: int = 0
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(BASEDIR, ".env"),
         env_file_encoding="utf-8",
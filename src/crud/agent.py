@@ -1,22 +1,102 @@
-from sqlalchemy import select, distinct, cast, String
+from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.models.agent_sitepage import SitePage
+from src.database.models.crawled_page import CrawledPage
+from src.database.models.source import Source
+from src.utils.ttl_cache import TTLCache
+from src.config import SET_CONF
+
+# sources only change during crawls (save_source clears it), the TTL bounds
+# how long other workers serve the old list
+sources_cache = TTLCache(max_entries=16, ttl=SET_CONF.SOURCES_CACHE_TTL)
+
+
+def normalize_url(url: str) -> str:
+    return url.strip().rstrip("/")
 
 
 async def show_docs(db: AsyncSession) -> list[str]:
-    """Get all available documentation sources."""
-    source = cast(SitePage.meta_details["source"], String)
+    """Get all available documentation sources (with stored chunks)."""
+    names = sources_cache.get("names")
+    if names is None:
+        result = await db.execute(
+            select(Source.name).where(Source.chunk_count > 0).order_by(Source.name)
+        )
+        names = [row[0] for row in result.fetchall()]
+        sources_cache.set("names", names)
 
-    result = await db.execute(
-        select(distinct(source))
-        .where(SitePage.meta_details["source"].isnot(None))
-        .order_by(source)
-    )
+    return names
 
-    return [row[0] for row in result.fetchall()]
+
+async def source_version(db: AsyncSession, source: str) -> str | None:
+    """
+    Version of a source's documentation (last_crawled_at), the same in all
+    workers - answers cached for another version are stale.
+    """
+    versions = sources_cache.get("versions")
+    if versions is None:
+        result = await db.execute(select(Source.name, Source.last_crawled_at))
+        versions = {
+            name: crawled_at.isoformat() if crawled_at else None
+            for name, crawled_at in result.all()
+        }
+        sources_cache.set("versions", versions)
+
+    return versions.get(source)
 
 
 async def url_exists(db: AsyncSession, url: str) -> bool:
-    """Check if URL was already crawled."""
-    result = await db.execute(select(1).where(SitePage.url == url).limit(1))
-    return result.scalar() is not None
+    """Check if URL was already crawled (base URL or sitemap of a source)."""
+    urls = sources_cache.get("urls")
+    if urls is None:
+        result = await db.execute(select(Source.url).where(Source.url.is_not(None)))
+        urls = {normalize_url(source_url) for source_url in result.scalars().all()}
+        sources_cache.set("urls", urls)
+
+    return normalize_url(url) in urls
+
+
+async def list_pages(
+    db: AsyncSession,
+    source: str,
+    path_prefix: str | None = None,
+    contains: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> tuple[int, list]:
+    """
+    Page catalog of a source (pages with chunks), ordered by URL.
+
+    path_prefix matches the start of the full URL ("https://...") or of the
+    URL path ("/docs/api"), contains the URL or title (case-insensitive).
+    Returns the number of matching pages and the rows (url, title, chunk_count)
+    of the requested slice.
+    """
+    conditions = [CrawledPage.source == source, CrawledPage.chunk_count > 0]
+
+    if path_prefix:
+        if "://" in path_prefix:
+            conditions.append(CrawledPage.url.startswith(path_prefix, autoescape=True))
+        else:
+            path = func.regexp_replace(CrawledPage.url, "^[a-zA-Z]+://[^/]+", "")
+            prefix = path_prefix if path_prefix.startswith("/") else f"/{path_prefix}"
+            conditions.append(path.startswith(prefix, autoescape=True))
+
+    if contains:
+        conditions.append(
+            or_(
+                CrawledPage.url.icontains(contains, autoescape=True),
+                CrawledPage.title.icontains(contains, autoescape=True),
+            )
+        )
+
+    result = await db.execute(select(func.count()).where(*conditions))
+    total = result.scalar_one()
+
+    result = await db.execute(
+        select(CrawledPage.url, CrawledPage.title, CrawledPage.chunk_count)
+        .where(*conditions)
+        .order_by(CrawledPage.url)
+        .limit(limit)
+        .offset(offset)
+    )
+    return total, result.all()
@@ -0,0 +1,272 @@
+from datetime import timedelta
+from sqlalchemy import select, update, delete, func, or_, and_, text, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models.agent_sitepage import SitePage
+from src.database.models.crawled_page import CrawledPage
+from src.database.models.crawl_job import CrawlJob, CrawlJobUrl
+from src.database.models.source import Source
+from src.crud.agent import sources_cache
+from src.utils.llm.gemini_cl import model_name_embed
+
+EMBEDDING_DIMENSIONS = 768
+
+
+async def get_page_states(db: AsyncSession, source: str) -> dict[str, CrawledPage]:
+    """Get crawl state of all pages of a source, keyed by URL."""
+    result = await db.execute(select(CrawledPage).where(CrawledPage.source == source))
+    return {page.url: page for page in result.scalars().all()}
+
+
+async def save_page_state(db: AsyncSession, source: str, url: str, **fields) -> None:
+    """Insert or update the crawl state of a page (only the given fields)."""
+    stmt = insert(CrawledPage).values(source=source, url=url, **fields)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CrawledPage.source, CrawledPage.url],
+        set_={**fields, "crawled_at": func.now()},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def save_source(
+    db: AsyncSession, source: str, url: str = None, crawled: bool = True
+) -> None:
+    """
+    Insert/update a source in the sources catalog, page and chunk counts from
+    its crawl state (crawled=False: registered at crawl start, not crawled yet).
+    """
+    result = await db.execute(
+        select(func.count(), func.coalesce(func.sum(CrawledPage.chunk_count), 0))
+        .where(CrawledPage.source == source)
+        .where(CrawledPage.chunk_count > 0)
+    )
+    pages, chunks = result.one()
+
+    values = {
+        "page_count": pages,
+        "chunk_count": chunks,
+        "embedding_model": model_name_embed,
+        "embedding_dimensions": EMBEDDING_DIMENSIONS,
+    }
+    if url:
+        values["url"] = url
+    if crawled:
+        values["last_crawled_at"] = func.now()
+
+    stmt = insert(Source).values(name=source, **values)
+    stmt = stmt.on_conflict_do_update(index_elements=[Source.name], set_=values)
+    await db.execute(stmt)
+    await db.commit()
+    sources_cache.clear()
+
+
+async def sync_sources(db: AsyncSession) -> int:
+    """
+    Add sources crawled before the sources catalog existed, counted from their
+    chunks (older sources may have no crawl state in crawled_pages).
+    """
+    latest_url = (
+        select(CrawlJob.url)
+        .where(CrawlJob.source == SitePage.source)
+        .order_by(CrawlJob.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    stmt = (
+        insert(Source)
+        .from_select(
+            [
+                "name",
+                "url",
+                "page_count",
+                "chunk_count",
+                "last_crawled_at",
+                "embedding_model",
+                "embedding_dimensions",
+            ],
+            select(
+                SitePage.source,
+                latest_url,
+                func.count(SitePage.url.distinct()),
+                func.count(),
+                func.max(SitePage.created_at),
+                literal(model_name_embed),
+                literal(EMBEDDING_DIMENSIONS),
+            ).group_by(SitePage.source),
+        )
+        .on_conflict_do_nothing()
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+
+    if result.rowcount:
+        sources_cache.clear()
+    return result.rowcount
+
+
+async def ensure_source_partition(db: AsyncSession, source: str) -> str:
+    """Create the site_pages partition of a source if missing, returns its name."""
+    result = await db.execute(
+        text("SELECT ensure_site_pages_partition(:source)"), {"source": source}
+    )
+    await db.commit()
+    return result.scalar_one()
+
+
+async def delete_pages(
+    db: AsyncSession, source: str, urls: list[str], keep_state: bool = False
+) -> int:
+    """Delete all chunks (and the crawl state) of pages. Returns deleted chunks."""
+    result = await db.execute(
+        delete(SitePage).where(SitePage.source == source).where(SitePage.url.in_(urls))
+    )
+
+    if not keep_state:
+        await db.execute(
+            delete(CrawledPage)
+            .where(CrawledPage.source == source)
+            .where(CrawledPage.url.in_(urls))
+        )
+
+    await db.commit()
+    return result.rowcount
+
+
+async def create_crawl_job(
+    db: AsyncSession,
+    source: str,
+    url: str,
+    refresh: bool = False,
+    claimed_by: str = None,
+) -> CrawlJob:
+    """Creates a new persistent crawl job (claimed by the creating worker)."""
+    job = CrawlJob(
+        source=source,
+        url=url,
+        refresh=refresh,
+        claimed_by=claimed_by,
+        heartbeat_at=func.now() if claimed_by else None,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def claim_unfinished_jobs(
+    db: AsyncSession, worker: str, stale_after: float
+) -> list[CrawlJob]:
+    """
+    Atomically claim the pending/running jobs nobody runs: unclaimed, or the
+    claiming worker sent no heartbeat for stale_after seconds (it died).
+    Concurrent workers skip each other's locked rows, every job is claimed once.
+    """
+    claimable = (
+        select(CrawlJob.id)
+        .where(CrawlJob.status.in_(["pending", "running"]))
+        .where(
+            or_(
+                CrawlJob.claimed_by.is_(None),
+                CrawlJob.heartbeat_at.is_(None),
+                CrawlJob.heartbeat_at < func.now() - timedelta(seconds=stale_after),
+            )
+        )
+        .order_by(CrawlJob.id)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(CrawlJob)
+        .where(CrawlJob.id.in_(claimable.scalar_subquery()))
+        .values(claimed_by=worker, heartbeat_at=func.now())
+        .returning(CrawlJob)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = sorted(result.scalars().all(), key=lambda job: job.id)
+    await db.commit()
+    return jobs
+
+
+async def heartbeat_jobs(db: AsyncSession, worker: str, job_ids: list[int]) -> None:
+    """Keep the claims of the jobs a worker is running."""
+    if not job_ids:
+        return
+    await db.execute(
+        update(CrawlJob)
+        .where(CrawlJob.id.in_(job_ids), CrawlJob.claimed_by == worker)
+        .values(heartbeat_at=func.now())
+    )
+    await db.commit()
+
+
+async def release_jobs(db: AsyncSession, worker: str, job_ids: list[int]) -> None:
+    """Give up claims (shutdown): the next worker resumes the jobs right away."""
+    if not job_ids:
+        return
+    await db.execute(
+        update(CrawlJob)
+        .where(CrawlJob.id.in_(job_ids), CrawlJob.claimed_by == worker)
+        .values(claimed_by=None, heartbeat_at=None)
+    )
+    await db.commit()
+
+
+async def set_job_status(db: AsyncSession, job_id: int, status: str) -> None:
+    values = {"status": status}
+    if status in ("finished", "failed"):
+        values["finished_at"] = func.now()
+
+    await db.execute(update(CrawlJob).where(CrawlJob.id == job_id).values(**values))
+    await db.commit()
+
+
+async def add_job_urls(db: AsyncSession, job_id: int, urls: list[str]) -> None:
+    """Register URLs of a job (already registered URLs keep their state)."""
+    for i in range(0, len(urls), 5000):
+        await db.execute(
+            insert(CrawlJobUrl)
+            .values([{"job_id": job_id, "url": url} for url in urls[i : i + 5000]])
+            .on_conflict_do_nothing()
+        )
+    await db.commit()
+
+
+async def get_open_job_urls(
+    db: AsyncSession, job_id: int, max_attempts: int
+) -> list[str]:
+    """URLs still to crawl: pending, or failed with attempts left."""
+    result = await db.execute(
+        select(CrawlJobUrl.url).where(
+            CrawlJobUrl.job_id == job_id,
+            or_(
+                CrawlJobUrl.status == "pending",
+                and_(
+                    CrawlJobUrl.status == "failed",
+                    CrawlJobUrl.attempts < max_attempts,
+                ),
+            ),
+        )
+    )
+    return [row[0] for row in result.fetchall()]
+
+
+async def count_job_urls(db: AsyncSession, job_id: int) -> dict[str, int]:
+    """Number of URLs per status."""
+    result = await db.execute(
+        select(CrawlJobUrl.status, func.count())
+        .where(CrawlJobUrl.job_id == job_id)
+        .group_by(CrawlJobUrl.status)
+    )
+    return {status: count for status, count in result.fetchall()}
+
+
+async def mark_job_url(
+    db: AsyncSession, job_id: int, url: str, status: str, error: str = None
+) -> None:
+    """Checkpoint a URL as done/failed and count the attempt."""
+    await db.execute(
+        update(CrawlJobUrl)
+        .where(CrawlJobUrl.job_id == job_id, CrawlJobUrl.url == url)
+        .values(status=status, attempts=CrawlJobUrl.attempts + 1, last_error=error)
+    )
+    await db.commit()
@@ -7,3 +7,7 @@ from src.database.db_settings import (
 )
 
 from src.database.models.user import User
+from src.database.models.embedding_cache import EmbeddingCacheEntry
+from src.database.models.crawled_page import CrawledPage
+from src.database.models.crawl_job import CrawlJob, CrawlJobUrl
+from src.database.models.source import Source
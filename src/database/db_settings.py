@@ -3,6 +3,7 @@ from fastapi import Depends
 from typing import Annotated
 from src.config import SET_CONF
 from typing import Any, AsyncIterator
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -50,6 +51,30 @@ class DatabaseSessionManager:
                 await connection.rollback()
                 raise
 
+    @contextlib.asynccontextmanager
+    async def try_advisory_lock(self, key: str) -> AsyncIterator[bool]:
+        """
+        Session-level advisory lock across processes (without waiting), held
+        on its own connection. Yields whether it was acquired.
+        """
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        async with self._engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            params = {"key": key}
+            result = await conn.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:key))"), params
+            )
+            acquired = result.scalar_one()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute(
+                        text("SELECT pg_advisory_unlock(hashtext(:key))"), params
+                    )
+
     @contextlib.asynccontextmanager
     async def session(self) -> AsyncIterator[AsyncSession]:
         if self._sessionmaker is None:
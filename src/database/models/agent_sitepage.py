@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, TIMESTAMP
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    Integer,
+    String,
+    Text,
+    TIMESTAMP,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 from pgvector.sqlalchemy import Vector
@@ -7,15 +16,25 @@ Base = declarative_base()
 
 
 class SitePage(Base):
+    """
+    Documentation chunks, list-partitioned by source (one partition per
+    library, see postgres_cmd/03-source-partitions.sql).
+    """
+
     __tablename__ = "site_pages"
+    __table_args__ = (
+        UniqueConstraint("source", "url", "chunk_number"),
+        {"postgresql_partition_by": "LIST (source)"},
+    )
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    source = Column(String, primary_key=True)  # partition key
     url = Column(String, nullable=False)
     chunk_number = Column(Integer, nullable=False)
     title = Column(String, nullable=False)
     summary = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    meta_details = Column(JSON, nullable=False, default={})
+    meta_details = Column(JSONB, nullable=False, default={})
     embedding = Column(Vector(768))
     created_at = Column(
         TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
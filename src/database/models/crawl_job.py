@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, TIMESTAMP, ForeignKey
+from sqlalchemy.sql import func
+from src.database import Base
+
+
+class CrawlJob(Base):
+    """Persistent crawl job, resumed after a restart until it is finished."""
+
+    __tablename__ = "crawl_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False, index=True)
+    url = Column(String, nullable=False)  # base URL or sitemap
+    refresh = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    claimed_by = Column(String)  # worker running the job (None = unclaimed)
+    heartbeat_at = Column(TIMESTAMP(timezone=True))  # refreshed while it runs
+    created_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at = Column(TIMESTAMP(timezone=True), onupdate=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+
+class CrawlJobUrl(Base):
+    """Checkpoint per URL of a crawl job (pending, done, failed)."""
+
+    __tablename__ = "crawl_job_urls"
+
+    job_id = Column(
+        Integer, ForeignKey("crawl_jobs.id", ondelete="CASCADE"), primary_key=True
+    )
+    url = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    updated_at = Column(TIMESTAMP(timezone=True), onupdate=func.now())
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Index, Integer, String, TIMESTAMP
+from sqlalchemy.sql import func
+from src.database import Base
+
+
+class CrawledPage(Base):
+    """
+    Crawl state per page, used for incremental re-crawls - and the page
+    catalog of a source (url, title, chunk count) for list_documentation_pages.
+    """
+
+    __tablename__ = "crawled_pages"
+    __table_args__ = (
+        # path prefix filters: LIKE 'prefix%' on the url of one source
+        Index(
+            "idx_crawled_pages_url_pattern",
+            "source",
+            "url",
+            postgresql_ops={"url": "varchar_pattern_ops"},
+        ),
+    )
+
+    source = Column(String, primary_key=True)
+    url = Column(String, primary_key=True)
+    title = Column(String)  # first heading of the page
+    sitemap_lastmod = Column(String)  # raw <lastmod> from the sitemap
+    etag = Column(String)
+    last_modified = Column(String)  # HTTP Last-Modified header
+    content_hash = Column(String(64))  # sha256 of the cleaned markdown
+    chunk_count = Column(Integer, nullable=False, default=0)
+    crawled_at = Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, TIMESTAMP
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+from src.database import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 of the text
+    model = Column(String, primary_key=True)
+    task_type = Column(String, primary_key=True)
+    dimensions = Column(Integer, primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
+    )
+    last_used_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
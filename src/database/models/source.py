@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, TIMESTAMP
+from sqlalchemy.sql import func
+from src.database import Base
+
+
+class Source(Base):
+    """Catalog of crawled documentation sources, updated by the crawls."""
+
+    __tablename__ = "sources"
+
+    name = Column(String, primary_key=True)
+    url = Column(String)  # base URL or sitemap of the last crawl
+    page_count = Column(Integer, nullable=False, default=0)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    last_crawled_at = Column(TIMESTAMP(timezone=True))
+    embedding_model = Column(String)
+    embedding_dimensions = Column(Integer)
+    created_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -9,6 +9,9 @@ from src.database import Base, sessionmanager_pgvector
 from src.routes.base import base_route
 from src.routes.user import user_route
 from src.routes.agent import agent_route
+from src.utils.loop_monitor import loop_monitor
+from src.utils.vector_index import vector_index
+from src.utils.vector_mmap import vector_mmap
 from zoneinfo import ZoneInfo
 from src.config import BASEDIR
 
@@ -31,10 +34,40 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+    # Sources crawled before the sources catalog existed
+    from src.crud.crawl import sync_sources
+
+    async with sessionmanager_pgvector.session() as db:
+        await sync_sources(db)
+
+    # Measure event loop lag (/agent/metrics)
+    loop_monitor.start()
+
+    # Create/replace the ANN index according to VECTOR_INDEX_TYPE (background)
+    vector_index.start()
+
+    # Export hot sources for in-process vector search (background)
+    vector_mmap.start()
+
+    # Resume crawl jobs interrupted by a restart/deploy (lazy: circular import)
+    from src.utils.crawl_jobs import crawl_job_runner
+    from src.utils.cpu_pool import cpu_pool
+
+    cpu_pool.start()
+    await crawl_job_runner.resume_unfinished()
+    crawl_job_runner.watch()
+
     yield
 
     # Shutdown logic HERE
 
+    # stop running crawls, they resume on next startup
+    await crawl_job_runner.shutdown()
+    cpu_pool.shutdown()
+    await vector_index.stop()
+    await vector_mmap.stop()
+    await loop_monitor.stop()
+
     # close DB Sessions
     if sessionmanager_pgvector._engine is not None:
         await sessionmanager_pgvector.close()
@@ -1,10 +1,21 @@
-import asyncio
+import json
+import time
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from src.shared.templates import templates
-from src.crud.agent import show_docs, url_exists
+from src.crud.agent import show_docs, url_exists, source_version, sources_cache
+from src.utils.page_cache import page_cache
+from src.utils.context_packing import context_packer
 from src.database import DBSessionDep_pgvector
-from src.agent.rag import RAGAgent, AnswerAgent
+from src.agent.rag import (
+    NO_DATA_MESSAGES,
+    get_rag_agent,
+    get_answer_agent,
+    answer_fast,
+    stream_answer,
+)
+from src.config import SET_CONF
+from src.utils.answer_cache import answer_cache, track_retrieval
 from markdown import markdown
 
 
@@ -23,9 +34,10 @@ async def start_crawl(
     db: DBSessionDep_pgvector,
     url: str = Form(...),
     name: str = Form(...),
+    refresh: bool = Form(False),
 ):
-    """Start crawling documentation."""
-    from src.utils.crawl_site import init_crawling
+    """Start crawling documentation (refresh: only re-crawl changed pages)."""
+    from src.utils.crawl_jobs import crawl_job_runner
 
     try:
         print(f"🔍 Checking URL: {url}")
@@ -39,24 +51,25 @@ async def start_crawl(
                 },
             )
 
-        if await url_exists(db, url):
+        if not refresh and await url_exists(db, url):
             print("already crawled")
             return templates.TemplateResponse(
                 "crawl.html",
                 {
                     "request": request,
-                    "flash_msg": "URL already crawled: go for 'ask'",
+                    "flash_msg": "URL already crawled: go for 'ask' or refresh it",
                     "error": "Already crawled",
                 },
             )
 
-        asyncio.create_task(init_crawling(url_or_sitemap=url, source_name=name))
+        await crawl_job_runner.start(url=url, source_name=name, refresh=refresh)
 
+        mode = "Refresh" if refresh else "Crawling"
         return templates.TemplateResponse(
             "crawl.html",
             {
                 "request": request,
-                "message": f"🕷️ Crawling started: '{name}' - ({url}) - This will take a while",
+                "message": f"🕷️ {mode} started: '{name}' - ({url}) - This will take a while",
                 "name": name,
             },
         )
@@ -77,6 +90,46 @@ async def get_crawl_status(name: str):
     return status
 
 
+@agent_route.get("/metrics")
+async def get_metrics():
+    """Get cache and performance counters as JSON."""
+    from src.utils.text_embedder import query_embedding_cache, embedding_batcher
+    from src.utils.ratelimiter import AsyncRateLimiter
+    from src.utils.cpu_pool import cpu_pool
+    from src.utils.loop_monitor import (
+        loop_monitor,
+        ask_latency,
+        ask_mode_latency,
+        ask_ttft,
+    )
+    from src.utils.vector_index import vector_index
+    from src.utils.vector_mmap import vector_mmap
+
+    return {
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "rate_limiters": {
+            name: limiter.stats()
+            for name, limiter in AsyncRateLimiter._instances.items()
+        },
+        "cpu_pool": cpu_pool.stats(),
+        "event_loop_lag": loop_monitor.stats(),
+        "ask_latency": {state: stats.stats() for state, stats in ask_latency.items()},
+        "ask_mode_latency": {
+            mode: stats.stats() for mode, stats in ask_mode_latency.items()
+        },
+        "ask_time_to_first_token": {
+            mode: stats.stats() for mode, stats in ask_ttft.items()
+        },
+        "vector_index": vector_index.stats(),
+        "vector_mmap": vector_mmap.stats(),
+        "answer_cache": answer_cache.stats(),
+        "sources_cache": sources_cache.stats(),
+        "page_cache": page_cache.stats(),
+        "context_packing": context_packer.stats(),
+    }
+
+
 @agent_route.get("/ask", response_class=HTMLResponse, name="ask_form")
 async def ask_form(request: Request, db: DBSessionDep_pgvector):
     """Display ask form with available docs."""
@@ -104,9 +157,123 @@ async def ask_question(
     source: str = Form(...),
     question: str = Form(...),
     use_german: bool = Form(False),
+    mode: str = Form(SET_CONF.ASK_DEFAULT_MODE),
 ):
-    """Process question and return answer."""
+    """Process question and return answer (mode: "agentic" or "fast")."""
+    from src.utils.crawl_status import crawl_status
+    from src.utils.loop_monitor import ask_latency, ask_mode_latency
+
+    if mode not in ask_mode_latency:
+        mode = SET_CONF.ASK_DEFAULT_MODE
+
+    started = time.perf_counter()
+    latency = ask_latency["crawling" if crawl_status.is_crawling() else "idle"]
+
+    try:
+        return await _answer_question(request, db, source, question, use_german, mode)
+    finally:
+        seconds = time.perf_counter() - started
+        latency.add(seconds)
+        ask_mode_latency[mode].add(seconds)
+
+
+@agent_route.post("/ask/stream", name="ask_stream")
+async def ask_question_stream(
+    db: DBSessionDep_pgvector,
+    source: str = Form(...),
+    question: str = Form(...),
+    use_german: bool = Form(False),
+    mode: str = Form(SET_CONF.ASK_DEFAULT_MODE),
+):
+    """
+    Answer as Server-Sent Events while it is produced:
+    tool / tool_result (retrieval progress), token (answer text),
+    done (answer as HTML) or error.
+    """
+    from src.utils.crawl_status import crawl_status
+    from src.utils.loop_monitor import ask_latency, ask_mode_latency, ask_ttft
+
+    if mode not in ask_mode_latency:
+        mode = SET_CONF.ASK_DEFAULT_MODE
+    language = "de" if use_german else "en"
+    version = await _source_version(db, source)  # before the session closes
+
+    async def events():
+        started = time.perf_counter()
+        latency = ask_latency["crawling" if crawl_status.is_crawling() else "idle"]
+        first_token = True
+        retrieval = track_retrieval()
+
+        try:
+            cached, question_embedding, generation = await answer_cache.lookup(
+                source, language, question, version
+            )
+            if cached is not None:
+                ask_ttft[mode].add(time.perf_counter() - started)
+                html = markdown(cached.answer, extensions=["fenced_code", "codehilite"])
+                yield _sse("done", {"html": html, "cached": True})
+                return
 
+            async for event, data in stream_answer(question, source, language, mode):
+                if event == "token" and first_token:
+                    ask_ttft[mode].add(time.perf_counter() - started)
+                    first_token = False
+                elif event == "done":
+                    answer_cache.put(
+                        source,
+                        language,
+                        question,
+                        question_embedding,
+                        data["output"],
+                        time.perf_counter() - started,
+                        generation,
+                        retrieval,
+                        NO_DATA_MESSAGES[language],
+                    )
+                    data = {
+                        "html": markdown(
+                            data["output"], extensions=["fenced_code", "codehilite"]
+                        )
+                    }
+                yield _sse(event, data)
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            yield _sse("error", {"message": f"❌ Error: {str(e)}"})
+
+        finally:
+            seconds = time.perf_counter() - started
+            latency.add(seconds)
+            ask_mode_latency[mode].add(seconds)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # no buffering in proxies (nginx), every event goes out right away
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _source_version(db, source: str) -> str | None:
+    try:
+        return await source_version(db, source)
+    except Exception as e:
+        print(f"Error reading version of '{source}': {e}")
+        return None
+
+
+async def _answer_question(
+    request: Request,
+    db: DBSessionDep_pgvector,
+    source: str,
+    question: str,
+    use_german: bool,
+    mode: str,
+):
     try:
         available_docs = await show_docs(db)
     except Exception as e:
@@ -114,23 +281,49 @@ async def ask_question(
         available_docs = []
 
     try:
+        started = time.perf_counter()
         language = "de" if use_german else "en"
 
-        tool_agent = RAGAgent(library_name=source, language=language)
-        tool_result = await tool_agent.run(
-            query=question,
-            source_filter=source,
+        # similar question answered before (same source + language + crawl)
+        retrieval = track_retrieval()
+        cached, question_embedding, generation = await answer_cache.lookup(
+            source, language, question, await _source_version(db, source)
         )
 
-        answer_agent = AnswerAgent(library_name=source, language=language)
+        if cached is not None:
+            output = cached.answer
+        elif mode == "fast":
+            output = (await answer_fast(question, source, language)).output
+        else:
+            tool_agent = get_rag_agent(source, language)
+            tool_result = await tool_agent.run(
+                query=question,
+                source_filter=source,
+            )
+
+            answer_agent = get_answer_agent(source, language)
 
-        answer = await answer_agent.run(
-            query=question,
-            source_filter=source,
-            message_history=tool_result.new_messages(),  # Passes Tool-Results
-        )
+            answer = await answer_agent.run(
+                query=question,
+                source_filter=source,
+                message_history=tool_result.new_messages(),  # Passes Tool-Results
+            )
+            output = answer.output
+
+        if cached is None:
+            answer_cache.put(
+                source,
+                language,
+                question,
+                question_embedding,
+                output,
+                time.perf_counter() - started,
+                generation,
+                retrieval,
+                NO_DATA_MESSAGES[language],
+            )
 
-        answer_html = markdown(answer.output, extensions=["fenced_code", "codehilite"])
+        answer_html = markdown(output, extensions=["fenced_code", "codehilite"])
 
         return templates.TemplateResponse(
             "ask.html",
@@ -140,6 +333,7 @@ async def ask_question(
                 "question": question,
                 "source": source,
                 "use_german": use_german,
+                "mode": mode,
                 "answer": answer_html,
             },
         )
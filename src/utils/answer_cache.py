@@ -0,0 +1,237 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Hashable
+import numpy as np
+from src.config import SET_CONF
+from src.utils.text_embedder import get_embedding_single, normalize_query
+from src.utils.ttl_cache import TTLCache
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str  # markdown
+    seconds: float  # time it took to produce the answer
+    generation: tuple  # of the source when the answer was started
+
+
+@dataclass
+class RetrievalOutcome:
+    """What the retrieval of one answer returned (see track_retrieval)."""
+
+    searches: int = 0
+    chunks: int = 0
+    errors: int = 0
+
+    @property
+    def cacheable(self) -> bool:
+        """Answers built on failed or empty retrieval aren't cached."""
+        return not self.errors and (not self.searches or self.chunks > 0)
+
+
+_retrieval: ContextVar[RetrievalOutcome | None] = ContextVar("retrieval", default=None)
+
+
+def track_retrieval() -> RetrievalOutcome:
+    """Collect the retrievals of the current request (and its tool tasks)."""
+    outcome = RetrievalOutcome()
+    _retrieval.set(outcome)
+    return outcome
+
+
+def record_retrieval(chunks: int = 0, error: bool = False):
+    outcome = _retrieval.get()
+    if outcome is not None:
+        outcome.searches += 1
+        outcome.chunks += chunks
+        outcome.errors += int(error)
+
+
+class SemanticAnswerCache:
+    """
+    Answers of /agent/ask, reused for similar questions.
+
+    Entries are keyed by (source, language, question) in a TTL/LRU cache; a
+    new question hits when the cosine similarity of its embedding to a cached
+    question of the same source and language is >= threshold. Answers are
+    only cached when their retrieval found chunks without errors.
+
+    Every answer carries the generation of its source from the time it was
+    started: the local counter of invalidate_source (re-crawl in this worker)
+    plus the version of the source in the sources catalog (last_crawled_at,
+    seen by all workers within SOURCES_CACHE_TTL). Answers of another
+    generation are neither stored nor returned, so answers started before a
+    re-crawl don't survive it - in any worker.
+
+    In-process: every worker has its own cache.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SET_CONF.ANSWER_CACHE_ENABLED,
+        threshold: float = SET_CONF.ANSWER_CACHE_THRESHOLD,
+        max_entries: int = SET_CONF.ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = SET_CONF.ANSWER_CACHE_TTL,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.entries = TTLCache(max_entries=max_entries, ttl=ttl)
+
+        # normalized question embeddings per (source, language), stacked lazily
+        self._vectors: dict[tuple[str, str], dict[str, np.ndarray]] = {}
+        self._matrices: dict[tuple[str, str], tuple[list[str], np.ndarray]] = {}
+        self._generations: dict[str, int] = {}  # bumped by invalidate_source
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.invalidations = 0
+        self.rejected = 0  # answers not stored (retrieval failed, stale)
+
+    def generation(self, source: str, version: Hashable = None) -> tuple:
+        return (self._generations.get(source, 0), version)
+
+    @staticmethod
+    def _normalize(embedding: list[float] | None) -> np.ndarray | None:
+        """Unit vector (None for missing/zero embeddings, e.g. API errors)."""
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _matrix(self, scope: tuple[str, str]) -> tuple[list[str], np.ndarray | None]:
+        if scope not in self._matrices:
+            vectors = self._vectors.get(scope, {})
+            keys = list(vectors)
+            matrix = np.stack([vectors[key] for key in keys]) if keys else None
+            self._matrices[scope] = (keys, matrix)
+        return self._matrices[scope]
+
+    def _remove(self, scope: tuple[str, str], keys: list[str]):
+        if not keys:
+            return
+        vectors = self._vectors.get(scope, {})
+        for key in keys:
+            vectors.pop(key, None)
+        self._matrices.pop(scope, None)
+
+    async def lookup(
+        self, source: str, language: str, question: str, version: Hashable = None
+    ) -> tuple[CachedAnswer | None, list[float] | None, tuple]:
+        """
+        Cached answer of the most similar question (or None), the question
+        embedding (shared with retrieval through the query embedding cache)
+        and the generation of the source (pass it to put).
+
+        version: current version of the source in the sources catalog
+        """
+        generation = self.generation(source, version)
+        if not self.enabled:
+            return None, None, generation
+
+        embedding = await get_embedding_single(question)
+        query = self._normalize(embedding)
+        scope = (source, language)
+        keys, matrix = self._matrix(scope)
+
+        if query is not None and matrix is not None:
+            scores = matrix @ query
+            expired = []
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                entry = self.entries.get((source, language, keys[i]))
+                if entry is not None and entry.generation != generation:
+                    self.entries.pop((source, language, keys[i]))  # re-crawled
+                    entry = None
+                if entry is None:  # expired or evicted
+                    expired.append(keys[i])
+                    continue
+
+                self._remove(scope, expired)
+                self.hits += 1
+                self.saved_seconds += entry.seconds
+                print(f"💾 Answer cache hit ({scores[i]:.3f}): {entry.question!r}")
+                return entry, embedding, generation
+
+            self._remove(scope, expired)
+
+        self.misses += 1
+        return None, embedding, generation
+
+    def put(
+        self,
+        source: str,
+        language: str,
+        question: str,
+        embedding: list[float] | None,
+        answer: str,
+        seconds: float,
+        generation: tuple,
+        retrieval: RetrievalOutcome | None = None,
+        no_data_message: str | None = None,
+    ):
+        """
+        Store an answer, unless its retrieval failed or found nothing, it is
+        the no-data answer, or the source was re-crawled since the lookup.
+        """
+        vector = self._normalize(embedding)
+        if not self.enabled or vector is None:
+            return
+
+        if (
+            (retrieval is not None and not retrieval.cacheable)
+            or (no_data_message and no_data_message in answer)
+            or generation[0] != self._generations.get(source, 0)
+        ):
+            self.rejected += 1
+            return
+
+        scope = (source, language)
+        key = normalize_query(question).casefold()
+        entry = CachedAnswer(
+            question=question, answer=answer, seconds=seconds, generation=generation
+        )
+        self.entries.set((source, language, key), entry)
+        self._vectors.setdefault(scope, {})[key] = vector
+        self._matrices.pop(scope, None)
+
+        # drop vectors of answers the LRU evicted meanwhile
+        vectors = self._vectors[scope]
+        if len(vectors) > self.entries.max_entries:
+            stale = [k for k in vectors if (source, language, k) not in self.entries]
+            self._remove(scope, stale)
+
+    def invalidate_source(self, source: str) -> int:
+        """Drop all answers of a source (its documentation changed)."""
+        self._generations[source] = self._generations.get(source, 0) + 1
+        removed = self.entries.invalidate(lambda key: key[0] == source)
+        for scope in [scope for scope in self._vectors if scope[0] == source]:
+            del self._vectors[scope]
+            self._matrices.pop(scope, None)
+
+        self.invalidations += 1
+        if removed:
+            print(f"💾 Answer cache: {removed} answers of '{source}' dropped")
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": len(self.entries),
+            "max_entries": self.entries.max_entries,
+            "ttl": self.entries.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 1),
+            "evictions": self.entries.evictions,
+            "invalidations": self.invalidations,
+            "rejected": self.rejected,
+        }
+
+
+answer_cache = SemanticAnswerCache()
@@ -1,11 +1,27 @@
 import re
+import time
+from collections import deque
 from typing import Any
 from dataclasses import dataclass
 from src.database import sessionmanager_pgvector
 from src.database.models.agent_sitepage import (
     SitePage,
 )
+from sqlalchemy import delete, and_, or_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
+from src.crud.crawl import ensure_source_partition
+from src.utils.vector_index import vector_index
+
+# asyncpg allows max. 32767 bind parameters per statement (8 columns per row)
+UPSERT_ROWS_PER_STATEMENT = 2000
+
+# finished chunks below this size are merged with the previous chunk (fixed,
+# independent of min_chunk_size - as in the original chunker)
+MERGE_CHUNK_SIZE = 4000
+
+# sources whose site_pages partition exists (checked once per process)
+_known_partitions: set[str] = set()
 
 
 @dataclass
@@ -27,12 +43,168 @@ class TextSegment:
     original_text: str = None
 
 
+# Code blocks (both fenced and indented)
+CODE_BLOCK_PATTERN = re.compile(
+    r"(```[\s\S]*?```)|(?:(?:^|\n)(?:    |\t)[^\n]+(?:\n(?:    |\t)[^\n]+)*)",
+    re.MULTILINE,
+)
+# Headers - without re.MULTILINE "^" only matches at the start of the window
+HEADER_PATTERN = re.compile(r"#\s|\#{2}\s")
+# Reversed patterns: the first match in the reversed window is the last one
+# in the window (neither pattern can overlap itself)
+SENTENCE_END_REVERSED_PATTERN = re.compile(r"\s[\.\?\!]")
+WHITESPACE_PATTERN = re.compile(r"\s")
+MD_LINK_PATTERN = re.compile(r"(?<!\!)\[.*?\]\(.*?\)")
+
+
+def iter_code_blocks(text: str):
+    """
+    Same matches as CODE_BLOCK_PATTERN.finditer(text), but only tries the
+    positions where a code block can start (fence or newline + indent),
+    found with str.find instead of trying the pattern at every character.
+    """
+    needles = ("```", "\n    ", "\n\t")
+    next_pos = {needle: text.find(needle) for needle in needles}
+    pos = 0
+
+    # indented block at the very start (without leading newline)
+    if text.startswith(("    ", "\t")):
+        match = CODE_BLOCK_PATTERN.match(text, 0)
+        if match:
+            yield match
+            pos = match.end()
+
+    while True:
+        for needle in needles:
+            if next_pos[needle] != -1 and next_pos[needle] < pos:
+                next_pos[needle] = text.find(needle, pos)
+
+        candidates = [p for p in next_pos.values() if p != -1]
+        if not candidates:
+            return
+
+        candidate = min(candidates)
+        match = CODE_BLOCK_PATTERN.match(text, candidate)
+        if match:
+            yield match
+            pos = match.end()
+        else:
+            pos = candidate + 1
+
+
+def split_into_segments(text: str) -> list[TextSegment]:
+    """Split text into alternating regular text and code block segments."""
+    segments = []
+    current_pos = 0
+
+    for match in iter_code_blocks(text):
+        start, end = match.span()
+
+        # Add text before code block if exists
+        if start > current_pos:
+            segments.append(TextSegment(content=text[current_pos:start], is_code=False))
+
+        # Add code block
+        segments.append(
+            TextSegment(
+                content=match.group(0), is_code=True, original_text=match.group(0)
+            )
+        )
+        current_pos = end
+
+    # Add remaining text if exists
+    if current_pos < len(text):
+        segments.append(TextSegment(content=text[current_pos:], is_code=False))
+
+    return segments
+
+
+def _last_link_end(text: str, start: int, end: int) -> int | None:
+    """End of the last markdown link in text[start:end], searched line by line from the back."""
+    line_end = end
+    while line_end > start:
+        newline = text.rfind("\n", start, line_end)
+        line_start = newline + 1 if newline != -1 else start
+
+        # links can't span lines, cheap check before running the regex
+        if text.find("](", line_start, line_end) != -1:
+            if line_start == start:
+                # slice, so the lookbehind can't see the char before the window
+                line = text[start:line_end]
+                matches = MD_LINK_PATTERN.finditer(line)
+                offset = start
+            else:
+                matches = MD_LINK_PATTERN.finditer(text, line_start, line_end)
+                offset = 0
+
+            last = deque(matches, maxlen=1)
+            if last:
+                return offset + last[0].end()
+
+        if newline == -1:
+            break
+        line_end = newline
+
+    return None
+
+
+def find_break_point(text: str, start: int, end: int) -> int:
+    """
+    Find suitable break point in text between start and end.
+
+    Prioritized break points: double newline, header, sentence ending,
+    markdown link, single newline, space. Returns the end of the last match
+    of the first pattern that matches in the window (same as running
+    re.finditer over text[start:end]), but searches from the back.
+    """
+    # Double newline: finditer matches "\n\n" pairs from the start of a run
+    double_newline = text.rfind("\n\n", start, end)
+    if double_newline != -1:
+        run_start = double_newline
+        while run_start > start and text[run_start - 1] == "\n":
+            run_start -= 1
+        run_length = double_newline + 2 - run_start
+        return run_start + run_length // 2 * 2
+
+    # Headers
+    header = HEADER_PATTERN.match(text, start, end)
+    if header:
+        return header.end()
+
+    reversed_window = text[start:end][::-1]
+
+    # Sentence endings
+    sentence_end = SENTENCE_END_REVERSED_PATTERN.search(reversed_window)
+    if sentence_end:
+        return end - sentence_end.start()
+
+    # Markdown links
+    link_end = _last_link_end(text, start, end)
+    if link_end is not None:
+        return link_end
+
+    # Single newline
+    newline = text.rfind("\n", start, end)
+    if newline != -1:
+        return newline + 1
+
+    # Space
+    space = WHITESPACE_PATTERN.search(reversed_window)
+    if space:
+        return end - space.start()
+
+    return end
+
+
 def chunk_text(
     text: str, max_chunk_size: int = 5000, min_chunk_size: int = 4000
 ) -> list[str]:
     """
     Split markdown text into chunks while preserving code blocks.
 
+    Single pass: finished chunks are stripped and merged with the previous
+    chunk right away, if they are smaller than MERGE_CHUNK_SIZE.
+
     Args:
         text: Input markdown text
         max_chunk_size: Maximum size of each chunk
@@ -41,95 +213,34 @@ def chunk_text(
     Returns:
         List of text chunks with preserved code blocks
     """
-
-    def split_into_segments(text: str) -> list[TextSegment]:
-        """Split text into alternating regular text and code block segments."""
-        segments = []
-        current_pos = 0
-
-        # Find all code blocks (both fenced and indented)
-        code_block_pattern = (
-            r"(```[\s\S]*?```)|(?:(?:^|\n)(?:    |\t)[^\n]+(?:\n(?:    |\t)[^\n]+)*)"
-        )
-        for match in re.finditer(code_block_pattern, text, re.MULTILINE):
-            start, end = match.span()
-
-            # Add text before code block if exists
-            if start > current_pos:
-                segments.append(
-                    TextSegment(content=text[current_pos:start], is_code=False)
-                )
-
-            # Add code block
-            segments.append(
-                TextSegment(
-                    content=match.group(0), is_code=True, original_text=match.group(0)
-                )
-            )
-            current_pos = end
-
-        # Add remaining text if exists
-        if current_pos < len(text):
-            segments.append(TextSegment(content=text[current_pos:], is_code=False))
-
-        return segments
-
-    def find_break_point(text: str, start: int, end: int) -> int:
-        """Find suitable break point in text between start and end."""
-        # Prioritized break points
-        break_patterns = [
-            r"\n\n",  # Double newline
-            r"^#\s|^\#{2}\s",  # Headers
-            r"[\.\?\!]\s",  # Sentence endings
-            r"(?<!\!)\[.*?\]\(.*?\)",  # Markdown links
-            r"\n",  # Single newline
-            r"\s",  # Space
-        ]
-
-        search_text = text[start:end]
-
-        for pattern in break_patterns:
-            matches = list(re.finditer(pattern, search_text))
-            if matches:
-                return start + matches[-1].end()
-
-        return end
-
-    def merge_small_chunks(chunks: list[str], min_chunk_size: int) -> list[str]:
-        """Merge small chunks with previous chunks if possible."""
-        merged_chunks = []
-
-        for chunk in chunks:
-            if merged_chunks and len(chunk) < min_chunk_size:
-                if len(merged_chunks[-1]) + len(chunk) <= max_chunk_size:
-                    merged_chunks[-1] += "\n" + chunk
-                else:
-                    merged_chunks.append(chunk)
-            else:
-                merged_chunks.append(chunk)
-
-        return merged_chunks
-
-    # Split text into regular text and code block segments
-    segments = split_into_segments(text)
-
     chunks = []
     current_chunk = []
     current_size = 0
 
-    for segment in segments:
+    def emit(chunk: str):
+        """Add a finished chunk, merge small chunks with the previous one."""
+        chunk = chunk.strip()
+        if not chunk:
+            return
+
+        if (
+            chunks
+            and len(chunk) < MERGE_CHUNK_SIZE
+            and len(chunks[-1]) + len(chunk) <= max_chunk_size
+        ):
+            chunks[-1] += "\n" + chunk
+        else:
+            chunks.append(chunk)
+
+    for segment in split_into_segments(text):
         if segment.is_code:
             if current_size + len(segment.content) > max_chunk_size and current_chunk:
-                chunks.append("".join(current_chunk))
+                emit("".join(current_chunk))
                 current_chunk = []
                 current_size = 0
 
             if len(segment.content) > max_chunk_size:
-                if current_chunk:
-                    chunks.append("".join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
-                chunks.append(segment.content)
+                emit(segment.content)
                 continue
 
             current_chunk.append(segment.content)
@@ -137,24 +248,25 @@ def chunk_text(
 
         else:
             text_to_process = segment.content
+            text_length = len(text_to_process)
             start = 0
 
-            while start < len(text_to_process):
+            while start < text_length:
                 remaining_space = max_chunk_size - current_size
 
                 if remaining_space < min_chunk_size and current_chunk:
                     # Finish current chunk
-                    chunks.append("".join(current_chunk))
+                    emit("".join(current_chunk))
                     current_chunk = []
                     current_size = 0
                     remaining_space = max_chunk_size
 
-                end = min(start + remaining_space, len(text_to_process))
+                end = min(start + remaining_space, text_length)
 
                 if end - start < min_chunk_size:
                     # Add remaining text to current chunk
                     current_chunk.append(text_to_process[start:])
-                    current_size += len(text_to_process[start:])
+                    current_size += text_length - start
                     break
 
                 # Find break point
@@ -166,37 +278,124 @@ def chunk_text(
 
     # Add final chunk if exists
     if current_chunk:
-        chunks.append("".join(current_chunk))
-
-    # return [chunk.strip() for chunk in chunks if chunk.strip()]
+        emit("".join(current_chunk))
 
-    ##### TEST
-    chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
-    chunks = merge_small_chunks(chunks, min_chunk_size=4000)
     return chunks
 
 
 #############################
-async def insert_chunk(chunk: ProcessedChunk):
-    """Insert a processed chunk into the pgvector database using SQLAlchemy."""
+async def insert_chunks(chunks: list[ProcessedChunk], prune_stale: bool = True) -> int:
+    """
+    Upsert the chunks of one or many pages in ONE transaction.
+
+    Uses multi-row `INSERT ... ON CONFLICT (source, url, chunk_number) DO
+    UPDATE`, so re-crawls overwrite existing rows instead of failing on the
+    unique constraint. Missing source partitions are created first.
+
+    Args:
+        chunks: Processed chunks of one or many pages
+        prune_stale: Delete chunks of a page beyond its new last chunk
+                     (page got shorter on re-crawl)
+
+    Returns:
+        Number of stored rows (0 on error)
+    """
+    if not chunks:
+        return 0
+
+    rows = [
+        {
+            "source": chunk.meta_details.get("source", "unknown"),
+            "url": chunk.url,
+            "chunk_number": chunk.chunk_number,
+            "title": chunk.title,
+            "summary": chunk.summary,
+            "content": chunk.content,
+            "meta_details": chunk.meta_details,
+            "embedding": chunk.embedding,
+        }
+        for chunk in chunks
+    ]
+
+    # highest chunk_number per (source, url) -> everything above is stale
+    page_sizes: dict[tuple[str, str], int] = {}
+    for row in rows:
+        page = (row["source"], row["url"])
+        page_sizes[page] = max(page_sizes.get(page, 0), row["chunk_number"] + 1)
+
+    try:
+        await ensure_partitions({row["source"] for row in rows})
+    except SQLAlchemyError as e:
+        print(f"Error creating site_pages partitions: {e}")
+        return 0
+
+    started = time.perf_counter()
+
     async with sessionmanager_pgvector.session() as db_session:
         try:
-            # New SitePage-Objekt
-            new_chunk = SitePage(
-                url=chunk.url,
-                chunk_number=chunk.chunk_number,
-                title=chunk.title,
-                summary=chunk.summary,
-                content=chunk.content,
-                meta_details=chunk.meta_details,
-                embedding=chunk.embedding,
-            )
+            for i in range(0, len(rows), UPSERT_ROWS_PER_STATEMENT):
+                batch = rows[i : i + UPSERT_ROWS_PER_STATEMENT]
+                stmt = insert(SitePage).values(batch)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[
+                        SitePage.source,
+                        SitePage.url,
+                        SitePage.chunk_number,
+                    ],
+                    set_={
+                        "title": stmt.excluded.title,
+                        "summary": stmt.excluded.summary,
+                        "content": stmt.excluded.content,
+                        "meta_details": stmt.excluded.meta_details,
+                        "embedding": stmt.excluded.embedding,
+                    },
+                )
+                await db_session.execute(stmt)
+
+            if prune_stale:
+                await db_session.execute(
+                    delete(SitePage).where(
+                        or_(
+                            *[
+                                and_(
+                                    SitePage.source == source,
+                                    SitePage.url == url,
+                                    SitePage.chunk_number >= size,
+                                )
+                                for (source, url), size in page_sizes.items()
+                            ]
+                        )
+                    )
+                )
 
-            db_session.add(new_chunk)
             await db_session.commit()
-            print(f"Inserted chunk {chunk.chunk_number} for {chunk.url}")
-            return True
+
         except SQLAlchemyError as e:
-            print(f"Error inserting chunk: {e}")
+            print(f"Error upserting {len(rows)} chunks: {e}")
             await db_session.rollback()
-            return False
+            return 0
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"💾 Upserted {len(rows)} chunks ({len(page_sizes)} pages) "
+        f"in {elapsed:.2f}s - {len(rows) / max(elapsed, 1e-6):.0f} rows/s"
+    )
+    return len(rows)
+
+
+async def ensure_partitions(sources: set[str]):
+    """
+    Create missing source partitions (own short transaction: attaching a
+    partition locks site_pages) and their vector index.
+    """
+    for source in sources - _known_partitions:
+        async with sessionmanager_pgvector.session() as db_session:
+            partition = await ensure_source_partition(db_session, source)
+
+        await vector_index.ensure_table_index(partition, check_lists=False)
+        _known_partitions.add(source)
+
+
+async def insert_chunk(chunk: ProcessedChunk):
+    """Insert (upsert) a single processed chunk into the pgvector database."""
+    return await insert_chunks([chunk], prune_stale=False) == 1
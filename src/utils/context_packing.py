@@ -0,0 +1,205 @@
+import numpy as np
+from src.config import SET_CONF
+from src.utils.ratelimiter import estimate_tokens
+
+
+def mmr_order(
+    embeddings: np.ndarray,
+    relevance: np.ndarray,
+    mmr_lambda: float = SET_CONF.MMR_LAMBDA,
+    duplicate_threshold: float = SET_CONF.MMR_DUPLICATE_THRESHOLD,
+) -> tuple[list[int], int]:
+    """
+    Candidates in maximal marginal relevance order:
+    mmr_lambda * relevance - (1 - mmr_lambda) * max. similarity to the chunks
+    already selected. Near duplicates (cosine >= duplicate_threshold to a
+    selected chunk) are dropped. Returns the order and the number dropped.
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    vectors = np.divide(
+        embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0
+    )
+    similarity = vectors @ vectors.T
+
+    available = np.ones(len(relevance), dtype=bool)
+    max_similarity = np.zeros(len(relevance), dtype=np.float32)
+    order, dropped = [], 0
+
+    while available.any():
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        duplicates = available & (max_similarity >= duplicate_threshold)
+        dropped += int(duplicates.sum())
+        available &= ~duplicates
+
+    return order, dropped
+
+
+def row_tokens(row: dict) -> int:
+    """Estimated tokens of a row: its window (if any) or its chunk."""
+    if row.get("window"):
+        return estimate_tokens(row["title"], *row["window"].values())
+    return estimate_tokens(row["title"], row["content"])
+
+
+def merge_windows(rows: list[dict]) -> list[dict]:
+    """
+    Rows with windows (chunk_number -> content of the chunks around a hit) ->
+    one row per run of overlapping/adjacent windows of the same URL, at the
+    position of its best hit, content = the chunks in order. Rows without a
+    window are passed through.
+    """
+    groups: list[list[dict]] = []
+    open_groups: dict[str, list[list[dict]]] = {}  # url -> groups
+
+    for row in rows:
+        if not row.get("window"):
+            groups.append([row])
+            continue
+
+        first, last = min(row["window"]), max(row["window"])
+        merged = None
+        for group in open_groups.get(row["url"], []):
+            if not group:  # merged into another group
+                continue
+            numbers = [n for member in group for n in member["window"]]
+            if first <= max(numbers) + 1 and last >= min(numbers) - 1:
+                if merged is None:
+                    group.append(row)
+                    merged = group
+                else:  # the row bridges two groups
+                    merged.extend(group)
+                    group.clear()
+
+        if merged is None:
+            groups.append([row])
+            open_groups.setdefault(row["url"], []).append(groups[-1])
+
+    result = []
+    for group in groups:
+        if not group:
+            continue
+        best = dict(group[0])
+        window = {}
+        for member in group:
+            window |= member.get("window") or {}
+
+        if window:
+            numbers = sorted(window)
+            best["content"] = "\n\n".join(window[n] for n in numbers)
+            best["chunk_numbers"] = numbers
+        best.pop("window", None)
+        result.append(best)
+    return result
+
+
+class ContextPacker:
+    """
+    Turns over-fetched search candidates into the chunks sent to the model:
+    MMR order without near duplicates, packed into a token budget. Rows with a
+    "window" (neighboring chunks of the hit) cost the whole window; windows of
+    the same page that overlap are merged.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = SET_CONF.RETRIEVAL_TOKEN_BUDGET,
+        mmr_lambda: float = SET_CONF.MMR_LAMBDA,
+        duplicate_threshold: float = SET_CONF.MMR_DUPLICATE_THRESHOLD,
+    ):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+        self.calls = 0
+        self.candidates = 0
+        self.duplicates = 0
+        self.tokens_returned = 0
+        self.tokens_saved = 0
+
+    def pack(self, rows: list[dict], max_chunks: int = 5) -> list[dict]:
+        """
+        Rows (best first) with an "embedding" each -> at most max_chunks rows
+        within the token budget, without the embeddings.
+        """
+        if not rows:
+            return []
+
+        present = [row["embedding"] for row in rows if row.get("embedding") is not None]
+        dimensions = len(present[0]) if present else 1
+        embeddings = np.stack(
+            [
+                np.asarray(row["embedding"], dtype=np.float32)
+                if row.get("embedding") is not None
+                else np.zeros(dimensions, dtype=np.float32)  # never a duplicate
+                for row in rows
+            ]
+        )
+
+        # hybrid rows: RRF score, vector rows: cosine similarity
+        relevance = np.array(
+            [row.get("score") or row.get("similarity") or 0.0 for row in rows],
+            dtype=np.float32,
+        )
+        if relevance.max() > 0:
+            relevance /= relevance.max()
+
+        order, dropped = mmr_order(
+            embeddings, relevance, self.mmr_lambda, self.duplicate_threshold
+        )
+
+        packed, used = [], 0
+        for i in order:
+            if len(packed) == max_chunks:
+                break
+
+            row = {key: value for key, value in rows[i].items() if key != "embedding"}
+            tokens = row_tokens(row)
+
+            if used + tokens > self.token_budget and row.get("window"):
+                row.pop("window")  # the hit alone may still fit
+                tokens = row_tokens(row)
+
+            if used + tokens > self.token_budget:
+                if packed:
+                    continue  # a smaller chunk may still fit
+                # the best chunk alone is over budget: cut it (~4 chars/token)
+                row["content"] = row["content"][: self.token_budget * 4]
+                tokens = row_tokens(row)
+
+            packed.append(row)
+            used += tokens
+
+        # overlapping windows were counted once per hit
+        packed = merge_windows(packed)
+        used = sum(row_tokens(row) for row in packed)
+
+        # what the top max_chunks candidates would have cost unpacked
+        baseline = sum(
+            estimate_tokens(row["title"], row["content"]) for row in rows[:max_chunks]
+        )
+
+        self.calls += 1
+        self.candidates += len(rows)
+        self.duplicates += dropped
+        self.tokens_returned += used
+        self.tokens_saved += max(0, baseline - used)
+        return packed
+
+    def stats(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "calls": self.calls,
+            "candidates": self.candidates,
+            "duplicates_dropped": self.duplicates,
+            "tokens_returned": self.tokens_returned,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+context_packer = ContextPacker()
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+from src.config import SET_CONF
+from src.utils.crawl_config import get_md_conf
+from src.utils.helpers_crawl import clean_codeblocks, remove_md_links
+from src.utils.chunking import chunk_text
+from src.utils.embedding_cache import content_hash
+
+
+def prepare_page(html: str, base_url: str) -> tuple[str, list[str]]:
+    """
+    CPU-bound part of the ingestion for one page, runs in a worker process.
+
+    Prunes the crawled HTML to markdown (crawl4ai PruningContentFilter),
+    cleans it and splits it into chunks. Input and output are plain strings,
+    so they pickle cheaply.
+
+    Args:
+        html: cleaned_html of the CrawlResult
+        base_url: URL the page was served from (for relative links)
+
+    Returns:
+        (content hash of the cleaned markdown, chunks)
+    """
+    fit_md = get_md_conf().generate_markdown(input_html=html, base_url=base_url)
+    fit_md = clean_codeblocks(fit_md.fit_markdown)
+    fit_md = remove_md_links(fit_md)
+    return content_hash(fit_md), chunk_text(fit_md)
+
+
+class CpuPool:
+    """
+    Process pool for CPU-bound work, so it doesn't block the event loop.
+
+    Workers are spawned (not forked - the app process runs threads and a
+    browser), sized with CPU_POOL_WORKERS. With 0 workers the functions run
+    inline on the event loop. A crashed pool is replaced on the next call.
+    """
+
+    def __init__(self, workers: int = SET_CONF.CPU_POOL_WORKERS):
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self.submitted = 0
+        self.running = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def start(self):
+        """Create the pool (workers start on first use)."""
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    async def run(self, func: Callable, *args):
+        """Run a picklable module-level function with picklable args in the pool."""
+        if self.workers <= 0:
+            return func(*args)
+
+        self.start()
+        executor = self._executor
+        self.submitted += 1
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+
+        except BrokenProcessPool:
+            self.failed += 1
+            if self._executor is executor:
+                print("⚠️ CPU pool broken, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            raise
+
+        finally:
+            self.running -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "running": self.running,
+            "failed": self.failed,
+            "total_seconds": round(self.total_seconds, 2),
+        }
+
+
+cpu_pool = CpuPool()
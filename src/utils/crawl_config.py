@@ -36,10 +36,14 @@ def get_md_conf():
     return md_generator
 
 
-def get_crawl_conf():
+def get_crawl_conf(prune: bool = True):
+    """
+    prune=False: skip the PruningContentFilter in the crawler (no fit_markdown),
+    the ingest pipeline runs it on result.cleaned_html in the CPU pool instead.
+    """
     crawl_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        markdown_generator=get_md_conf(),
+        markdown_generator=get_md_conf() if prune else DefaultMarkdownGenerator(),
         excluded_tags=["form", "header", "footer", "nav"],
         word_count_threshold=20,  # Minimum words per block
         # excluded_selector="div#BorlabsCookieBox, div.lesson__disclaimer, p.cta__heading, div#cookie-banner, div.et_pb_row_2, div.ld-focus-sidebar, div#cmplz-cookiebanner-container",
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import socket
+import uuid
+from src.config import SET_CONF
+from src.crud.crawl import (
+    create_crawl_job,
+    claim_unfinished_jobs,
+    heartbeat_jobs,
+    release_jobs,
+)
+from src.database import sessionmanager_pgvector
+from src.database.models.crawl_job import CrawlJob
+from src.utils.crawl_site import init_crawling
+
+
+class CrawlJobRunner:
+    """
+    Runs persistent crawl jobs as background tasks.
+
+    Keeps a reference to every running task (so it can't be garbage collected)
+    and resumes jobs that were pending/running when the process stopped.
+
+    With several workers every job runs once: jobs are claimed atomically
+    (claimed_by), the claims are kept alive with a heartbeat and released on
+    shutdown. Jobs of a worker that died without releasing them are taken
+    over once their heartbeat is older than CRAWL_JOB_STALE_AFTER.
+    """
+
+    def __init__(
+        self,
+        heartbeat_interval: float = SET_CONF.CRAWL_JOB_HEARTBEAT,
+        stale_after: float = SET_CONF.CRAWL_JOB_STALE_AFTER,
+    ):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._heartbeat: asyncio.Task | None = None
+
+    async def start(self, url: str, source_name: str, refresh: bool = False):
+        """Create a persistent job and run it."""
+        async with sessionmanager_pgvector.session() as db:
+            job = await create_crawl_job(
+                db, source=source_name, url=url, refresh=refresh, claimed_by=self.worker
+            )
+
+        self.submit(job)
+        return job
+
+    def submit(self, job: CrawlJob):
+        if job.id in self._tasks:
+            return
+
+        task = asyncio.create_task(
+            init_crawling(
+                url_or_sitemap=job.url,
+                source_name=job.source,
+                refresh=job.refresh,
+                job_id=job.id,
+            )
+        )
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def resume_unfinished(self) -> int:
+        """Claim and resume the unfinished jobs no other worker runs."""
+        async with sessionmanager_pgvector.session() as db:
+            jobs = await claim_unfinished_jobs(db, self.worker, self.stale_after)
+
+        for job in jobs:
+            print(f"♻️ Resuming crawl job {job.id}: '{job.source}' ({job.url})")
+            self.submit(job)
+
+        return len(jobs)
+
+    def watch(self):
+        """Heartbeat of the own jobs, take over jobs of dead workers (background)."""
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with sessionmanager_pgvector.session() as db:
+                    await heartbeat_jobs(db, self.worker, list(self._tasks))
+                await self.resume_unfinished()
+            except Exception as e:
+                print(f"Error in crawl job heartbeat: {e}")
+
+    async def shutdown(self):
+        """Cancel running jobs - they stay unfinished and resume on next start."""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+        job_ids = list(self._tasks)
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                await release_jobs(db, self.worker, job_ids)
+        except Exception as e:
+            print(f"Error releasing crawl jobs: {e}")
+
+
+crawl_job_runner = CrawlJobRunner()
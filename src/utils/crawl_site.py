@@ -1,65 +1,50 @@
-import asyncio
 from xml.etree import ElementTree
 from urllib.parse import urljoin, urlparse
 from curl_cffi.requests import AsyncSession
 from crawl4ai import AsyncWebCrawler
-from src.utils.process_doc import process_and_store_document
-from src.utils.helpers_crawl import clean_codeblocks, remove_md_links
-from src.utils.crawl_config import get_browser_conf, get_crawl_conf
+from src.utils.crawl_config import get_browser_conf
 from src.utils.crawl_status import crawl_status
-
-
-async def process_url(
-    url: str,
-    crawler: AsyncWebCrawler,
-    semaphore: asyncio.Semaphore = None,
-    i: int = None,
-    source_name: str = None,
-):
-    crawl_config = get_crawl_conf()
-
-    try:
-        if semaphore:
-            async with semaphore:
-                result = await crawler.arun(
-                    url=url,
-                    config=crawl_config,
-                    # session_id="session1"
-                )
-        else:
-            result = await crawler.arun(url=url, config=crawl_config)
-
-        if result.success:
-            print(f"Successfully crawled: {url}")
-            fit_md = clean_codeblocks(result.markdown.fit_markdown)
-            fit_md = remove_md_links(fit_md)
-            print(fit_md)
-
-            ### PROCESS, VECTORIZE UND SAVE TO DB with source_name
-            await process_and_store_document(
-                url=url, markdown=fit_md, source_name=source_name
-            )
-
-            crawl_status.update(source_name, success=True)
-
-        else:
-            print(f"Failed: {url} - Error: {result.error_message}")
-            crawl_status.update(source_name, success=False)
-
-    except Exception as e:
-        print(f"Error processing URL {url}: {e}")
+from src.utils.ingest_pipeline import IngestPipeline
+from src.utils.vector_index import vector_index
+from src.utils.vector_mmap import vector_mmap
+from src.utils.answer_cache import answer_cache
+from src.utils.page_cache import invalidate_pages
+from src.crud.crawl import (
+    get_page_states,
+    delete_pages,
+    set_job_status,
+    add_job_urls,
+    get_open_job_urls,
+    count_job_urls,
+    save_source,
+)
+from src.config import SET_CONF
+from src.database import sessionmanager_pgvector
+from src.database.models.crawled_page import CrawledPage
 
 
 async def crawl_parallel(
-    urls: list[str], max_concurrent: int = 3, source_name: str = None
+    urls: list[str],
+    max_concurrent: int = 3,
+    source_name: str = None,
+    lastmods: dict[str, str | None] = None,
+    known_pages: dict[str, CrawledPage] = None,
+    job_id: int = None,
 ):
     """
-    Crawl multiple URLs in parallel with a concurrency limit.
-    session_id="session1" noch ändern
+    Crawl and ingest multiple URLs through the staged ingest pipeline.
+
+    Pages are fetched by `max_concurrent` browser workers while chunking,
+    summarizing, embedding and storing of earlier pages run in their own
+    stages (see IngestPipeline).
 
     Args:
-        urls (list[str]): _description_
-        max_concurrent (int, optional): _description_. Defaults to 3.
+        urls (list[str]): URLs to crawl
+        max_concurrent (int, optional): Parallel page fetches. Defaults to 3.
+        source_name (str, optional): Name of the documentation source
+        lastmods (dict, optional): Sitemap <lastmod> per URL
+        known_pages (dict, optional): Crawl state per URL (incremental refresh)
+        job_id (int, optional): Persistent crawl job for URL checkpoints
     """
 
     browser_config = get_browser_conf()
@@ -67,24 +52,21 @@ async def crawl_parallel(
     crawler = AsyncWebCrawler(config=browser_config)
 
     await crawler.start()
-    semaphore = asyncio.Semaphore(max_concurrent)
+    pipeline = IngestPipeline(
+        crawler=crawler,
+        source_name=source_name,
+        workers={"fetch": max_concurrent},
+        lastmods=lastmods,
+        known_pages=known_pages,
+        job_id=job_id,
+    )
+    crawl_status.attach_pipeline(source_name, pipeline)
 
     try:
-        # Process all URLs in parallel with limited concurrency
-        await asyncio.gather(
-            *[
-                process_url(
-                    url=url,
-                    crawler=crawler,
-                    semaphore=semaphore,
-                    i=i,
-                    source_name=source_name,
-                )
-                for i, url in enumerate(urls)
-            ]
-        )
+        await pipeline.run(urls)
 
     finally:
+        crawl_status.detach_pipeline(source_name)
         await crawler.close()
 
 
@@ -96,6 +78,22 @@ async def get_urls_from_xml(sitemap_url: str = "https://ai.pydantic.dev/sitemap.
     Returns:
         List[str]: List of URLs
     """
+    return [url for url, _ in await get_sitemap_entries(sitemap_url)]
+
+
+async def get_sitemap_entries(
+    sitemap_url: str, failed: list[str] | None = None
+) -> list[tuple[str, str | None]]:
+    """
+    Fetches all (URL, <lastmod>) entries of a sitemap or sitemap-index.
+
+    Args:
+        failed: collects the (sub-)sitemaps that couldn't be fetched/parsed -
+            their URLs are missing from the result
+
+    Returns:
+        List of (url, lastmod) - lastmod is None if the sitemap has none
+    """
     try:
         async with AsyncSession() as s:
             response = await s.get(sitemap_url, timeout=30)
@@ -113,22 +111,29 @@ async def get_urls_from_xml(sitemap_url: str = "https://ai.pydantic.dev/sitemap.
 
         if sitemap_locs:
             print(f"📂 Sitemap-Index found with {len(sitemap_locs)} Sub-Sitemaps")
-            all_urls = []
+            all_entries = []
 
             for sitemap_loc in sitemap_locs:
                 sub_sitemap_url = sitemap_loc.text
                 print(f"  📄 Sub-Sitemap: {sub_sitemap_url}")
-                sub_urls = await get_urls_from_xml(sub_sitemap_url)
-                all_urls.extend(sub_urls)
+                sub_entries = await get_sitemap_entries(sub_sitemap_url, failed)
+                all_entries.extend(sub_entries)
 
-            return all_urls
+            return all_entries
 
-        urls = [loc.text for loc in root.findall(".//ns:loc", namespace)]
+        entries = []
+        for url_tag in root.findall(".//ns:url", namespace):
+            loc = url_tag.findtext("ns:loc", namespace=namespace)
+            lastmod = url_tag.findtext("ns:lastmod", namespace=namespace)
+            if loc:
+                entries.append((loc.strip(), lastmod.strip() if lastmod else None))
 
-        return urls
+        return entries
 
     except Exception as e:
-        print(f"Error fetching sitemap: {e}")
+        print(f"Error fetching sitemap {sitemap_url}: {e}")
+        if failed is not None:
+            failed.append(sitemap_url)
         return []
 
 
@@ -137,6 +142,9 @@ async def run_crawl(
     max_concurrent: int = None,
     blocklist: list[str] = None,
     source_name: str = None,
+    lastmods: dict[str, str | None] = None,
+    known_pages: dict[str, CrawledPage] = None,
+    job_id: int = None,
 ):
     if isinstance(url_input, list):
         if blocklist is not None:
@@ -146,12 +154,13 @@ async def run_crawl(
                 if not any(word in url.lower() for word in blocklist)
             ]
             print(f"cleaned by blocklist. New Listlength: {len(url_input)} Elements")
-        result = (
-            await crawl_parallel(
-                urls=url_input, max_concurrent=max_concurrent, source_name=source_name
-            )
-            if max_concurrent is not None
-            else await crawl_parallel(urls=url_input, source_name=source_name)
+        result = await crawl_parallel(
+            urls=url_input,
+            max_concurrent=max_concurrent if max_concurrent is not None else 3,
+            source_name=source_name,
+            lastmods=lastmods,
+            known_pages=known_pages,
+            job_id=job_id,
         )
         return result
 
@@ -159,15 +168,9 @@ async def run_crawl(
         if blocklist is not None:
             if any(word in url_input.lower() for word in blocklist):
                 return "URL IN BLOCKLIST"
-        browser_config = get_browser_conf()
-        crawler = AsyncWebCrawler(config=browser_config)
-        await crawler.start()
-        try:
-            return await process_url(
-                url=url_input, crawler=crawler, source_name=source_name
-            )
-        finally:
-            await crawler.close()
+        return await crawl_parallel(
+            urls=[url_input], max_concurrent=1, source_name=source_name
+        )
 
 
 async def find_sitemap(base_url: str) -> str | None:
@@ -234,6 +237,8 @@ async def init_crawling(
     max_concurrent: int = 3,
     blocklist: list[str] = None,
     source_name: str = None,
+    refresh: bool = False,
+    job_id: int = None,
 ):
     """
     Main-Function: Start of Crawling
@@ -245,50 +250,179 @@ async def init_crawling(
             - single Site-URL
         max_concurrent: Anzahl paralleler Requests
         blocklist: Liste von Wörtern zum Filtern
+        refresh: Incremental re-crawl - skip unchanged pages, re-embed only
+                 changed pages, delete pages that disappeared from the sitemap
+        job_id: Persistent crawl job (see CrawlJobRunner) - URLs are
+                checkpointed, failed URLs retried up to CRAWL_MAX_ATTEMPTS
 
     Examples:
         >>> await init_crawling("https://ai.pydantic.dev")
         >>> await init_crawling("https://ai.pydantic.dev/sitemap.xml")
         >>> await init_crawling("https://docs.python.org", blocklist=["tutorial"])
+        >>> await init_crawling("https://ai.pydantic.dev", refresh=True)
     """
     if not source_name:
         print("⚠️ Warning: No source_name provided. Using URL as fallback.")
         source_name = urlparse(url_or_sitemap).netloc
 
-    if "sitemap" in url_or_sitemap.lower() and url_or_sitemap.endswith(".xml"):
-        print(f"🗺️ Sitemap found: {url_or_sitemap}")
-        sitemap_url = url_or_sitemap
-    else:
-        print(f"🔍 Scanning for Sitemap für: {url_or_sitemap}")
-        sitemap_url = await find_sitemap(url_or_sitemap)
+    # every exit leaves the job finished/failed - an unfinished job would be
+    # claimed and run again (CrawlJobRunner)
+    crawl_started = False
+    try:
+        if "sitemap" in url_or_sitemap.lower() and url_or_sitemap.endswith(".xml"):
+            print(f"🗺️ Sitemap found: {url_or_sitemap}")
+            sitemap_url = url_or_sitemap
+        else:
+            print(f"🔍 Scanning for Sitemap für: {url_or_sitemap}")
+            sitemap_url = await find_sitemap(url_or_sitemap)
 
-        if not sitemap_url:
-            print("no Sitemap gefunden.")
+            if not sitemap_url:
+                print("no Sitemap gefunden.")
+                await _set_job_status(job_id, "failed")
+                return
+
+        failed_sitemaps = []
+        lastmods = dict(await get_sitemap_entries(sitemap_url, failed_sitemaps))
+        urls = list(lastmods)
+
+        if not urls:
+            print("❌ No URLs in Sitemap found")
+            await _set_job_status(job_id, "failed")
             return
 
-    urls = await get_urls_from_xml(sitemap_url)
+        print(f"📋 found {len(urls)} URLs for Crawling")
+        crawl_started = True
+        await _crawl_urls(
+            url_or_sitemap,
+            urls,
+            lastmods,
+            failed_sitemaps,
+            max_concurrent,
+            blocklist,
+            source_name,
+            refresh,
+            job_id,
+        )
 
-    if not urls:
-        print("❌ No URLs in Sitemap found")
-        return
+    except Exception as e:
+        print(f"❌ Crawling failed: {e}")
+        await _set_job_status(job_id, "failed")
+        if crawl_started:
+            crawl_status.finish(source_name)
+            # pages stored before the failure are searchable
+            await _save_source(source_name, url_or_sitemap)
 
-    print(f"📋 found {len(urls)} URLs for Crawling")
 
-    # ✅ Register Crawl Job
-    crawl_status.start(source_name, total_urls=len(urls))
+async def _crawl_urls(
+    url_or_sitemap: str,
+    urls: list[str],
+    lastmods: dict[str, str | None],
+    failed_sitemaps: list[str],
+    max_concurrent: int,
+    blocklist: list[str] | None,
+    source_name: str,
+    refresh: bool,
+    job_id: int | None,
+):
+    """Crawl the sitemap URLs of init_crawling (errors: init_crawling fails)."""
+
+    # url_exists knows the URL from now on
+    await _save_source(source_name, url_or_sitemap, crawled=False)
+
+    known_pages = {}
+    if refresh:
+        async with sessionmanager_pgvector.session() as db:
+            known_pages = await get_page_states(db, source_name)
+            removed = [url for url in known_pages if url not in lastmods]
+
+            if removed and failed_sitemaps:
+                # pages of an unreadable sitemap aren't gone, keep them all
+                print(
+                    f"⚠️ {len(failed_sitemaps)} sitemaps failed: "
+                    f"not removing {len(removed)} unlisted pages"
+                )
+            elif removed:
+                deleted = await delete_pages(db, source_name, removed)
+                invalidate_pages(source_name, removed)
+                print(f"🗑️ Removed {len(removed)} pages ({deleted} chunks)")
+
+        print(f"🔄 Refresh: {len(known_pages)} known pages for '{source_name}'")
+
+    if blocklist is not None:
+        urls = [
+            url for url in urls if not any(word in url.lower() for word in blocklist)
+        ]
+
+    # ✅ Register Crawl Job (persistent jobs: checkpoint every URL)
+    done = 0
+    if job_id is not None:
+        async with sessionmanager_pgvector.session() as db:
+            await set_job_status(db, job_id, "running")
+            await add_job_urls(db, job_id, urls)
+            done = (await count_job_urls(db, job_id)).get("done", 0)
+
+    crawl_status.start(source_name, total_urls=len(urls), processed=done)
+
+    for attempt in range(SET_CONF.CRAWL_MAX_ATTEMPTS):
+        if job_id is not None:
+            # resumed jobs skip URLs that are already stored
+            async with sessionmanager_pgvector.session() as db:
+                urls = await get_open_job_urls(
+                    db, job_id, max_attempts=SET_CONF.CRAWL_MAX_ATTEMPTS
+                )
+            if not urls:
+                break
+            if attempt:
+                print(f"🔁 Retry {attempt}: {len(urls)} failed URLs")
+                crawl_status.retry(source_name, len(urls))
 
-    try:
         await run_crawl(
             url_input=urls,
             max_concurrent=max_concurrent,
-            blocklist=blocklist,
             source_name=source_name,
+            lastmods=lastmods,
+            known_pages=known_pages,
+            job_id=job_id,
         )
 
-        # ✅ Mark as finished
-        crawl_status.finish(source_name)
-        print(f"✅ Crawling completed for '{source_name}'")
+        if job_id is None:
+            break
+
+    # ✅ Mark as finished
+    await _set_job_status(job_id, "finished")
+    crawl_status.finish(source_name)
+    print(f"✅ Crawling completed for '{source_name}'")
 
+    # page/chunk counts for the sources catalog (show_docs)
+    await _save_source(source_name, url_or_sitemap)
+
+    # IVFFlat lists are fixed at build time: re-cluster after large ingests
+    try:
+        await vector_index.maybe_rebuild()
     except Exception as e:
-        print(f"❌ Crawling failed: {e}")
-        crawl_status.finish(source_name)
+        print(f"Error rebuilding vector index: {e}")
+
+    # answers of the old documentation are stale now
+    answer_cache.invalidate_source(source_name)
+
+    # hot sources: fresh in-process vectors
+    try:
+        await vector_mmap.refresh(source_name)
+    except Exception as e:
+        print(f"Error exporting vectors of '{source_name}': {e}")
+
+
+async def _save_source(source_name: str, url: str, crawled: bool = True):
+    try:
+        async with sessionmanager_pgvector.session() as db:
+            await save_source(db, source_name, url, crawled=crawled)
+    except Exception as e:
+        print(f"Error updating source '{source_name}': {e}")
+
+
+async def _set_job_status(job_id: int | None, status: str):
+    if job_id is None:
+        return
+
+    async with sessionmanager_pgvector.session() as db:
+        await set_job_status(db, job_id, status)
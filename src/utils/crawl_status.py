@@ -5,24 +5,35 @@ from typing import Dict
 class CrawlStatus:
     def __init__(self):
         self.jobs: Dict[str, dict] = {}
+        self.pipelines: Dict[str, object] = {}
 
-    def start(self, name: str, total_urls: int = 0):
-        """Register new crawl job."""
+    def start(self, name: str, total_urls: int = 0, processed: int = 0):
+        """Register new crawl job (processed > 0: resumed job)."""
         self.jobs[name] = {
             "status": "running",
             "started": datetime.now(),
             "total_urls": total_urls,
-            "processed": 0,
+            "processed": processed,
             "errors": 0,
+            "skipped": 0,
             "finished": None,
         }
 
-    def update(self, name: str, success: bool = True):
+    def update(self, name: str, success: bool = True, skipped: bool = False):
         """Update progress."""
         if name in self.jobs:
             self.jobs[name]["processed"] += 1
             if not success:
                 self.jobs[name]["errors"] += 1
+            if skipped:
+                self.jobs[name]["skipped"] += 1
+
+    def retry(self, name: str, urls: int):
+        """Failed URLs are crawled again - don't count them twice."""
+        if name in self.jobs:
+            job = self.jobs[name]
+            job["processed"] = max(0, job["processed"] - urls)
+            job["errors"] = max(0, job["errors"] - urls)
 
     def finish(self, name: str):
         """Mark as finished."""
@@ -30,9 +41,23 @@ class CrawlStatus:
             self.jobs[name]["status"] = "finished"
             self.jobs[name]["finished"] = datetime.now()
 
+    def is_crawling(self) -> bool:
+        """Any crawl job running right now."""
+        return any(job["status"] == "running" for job in self.jobs.values())
+
+    def attach_pipeline(self, name: str, pipeline):
+        """Report queue depths of a running ingest pipeline with the status."""
+        self.pipelines[name] = pipeline
+
+    def detach_pipeline(self, name: str):
+        self.pipelines.pop(name, None)
+
     def get(self, name: str) -> dict:
         """Get status."""
-        return self.jobs.get(name, {"status": "unknown"})
+        status = self.jobs.get(name, {"status": "unknown"})
+        if name in self.pipelines:
+            status = {**status, "queues": self.pipelines[name].queue_depths()}
+        return status
 
 
 # Global instance
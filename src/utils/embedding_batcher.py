@@ -0,0 +1,123 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+EmbedFn = Callable[[list[str], str, int], Awaitable[list[list[float]]]]
+
+
+@dataclass
+class _EmbedRequest:
+    text: str
+    future: asyncio.Future
+
+
+class EmbeddingBatcher:
+    """
+    Shared embedding micro-batcher across documents.
+
+    Concurrent callers submit texts and await futures. Texts are packed into
+    API calls of up to `batch_size` items per (task_type, dimensions) and
+    flushed as soon as a batch is full or `max_wait` seconds after the first
+    text was queued. Identical texts within one API call are embedded once.
+    Up to `max_concurrent_batches` API calls are in flight at the same time
+    (inside the rate limit of `embed_fn`).
+
+    Args:
+        embed_fn: Rate-limited async API call `(texts, task_type, dimensions)`
+        batch_size: Max. texts per API call
+        max_wait: Deadline (seconds) for flushing a partial batch
+        max_concurrent_batches: Max. API calls in flight
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        batch_size: int = 100,
+        max_wait: float = 0.2,
+        max_concurrent_batches: int = 4,
+    ):
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._in_flight = asyncio.Semaphore(max_concurrent_batches)
+        self._pending: dict[tuple[str, int], list[_EmbedRequest]] = {}
+        self._timers: dict[tuple[str, int], asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.api_calls = 0
+        self.texts_sent = 0
+        self.texts_submitted = 0
+
+    async def embed(
+        self, texts: list[str], task_type: str, dimensions: int
+    ) -> list[list[float] | None]:
+        """Embed texts via shared batches. Failed items are returned as None."""
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+        key = (task_type, dimensions)
+        futures = []
+
+        for text in texts:
+            future = loop.create_future()
+            self._pending.setdefault(key, []).append(_EmbedRequest(text, future))
+            futures.append(future)
+
+            if len(self._pending[key]) >= self.batch_size:
+                self._flush(key)
+
+        if self._pending.get(key) and key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        self.texts_submitted += len(texts)
+        return await asyncio.gather(*futures)
+
+    def _flush(self, key: tuple[str, int]):
+        """Send all pending texts of key as one API call (in background)."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        requests = self._pending.pop(key, [])
+        if not requests:
+            return
+
+        task = asyncio.create_task(self._run_batch(key, requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key: tuple[str, int], requests: list[_EmbedRequest]):
+        task_type, dimensions = key
+        unique_texts = list(dict.fromkeys(r.text for r in requests))
+
+        try:
+            async with self._in_flight:
+                embeddings = await self.embed_fn(unique_texts, task_type, dimensions)
+            by_text = dict(zip(unique_texts, embeddings))
+            print(
+                f"✅ Embedding batch: {len(unique_texts)} texts "
+                f"({len(requests)} requested)"
+            )
+
+        except Exception as e:
+            print(f"❌ Embedding batch failed ({len(unique_texts)} texts): {e}")
+            by_text = {}
+
+        self.api_calls += 1
+        self.texts_sent += len(unique_texts)
+
+        for request in requests:
+            if not request.future.done():
+                request.future.set_result(by_text.get(request.text))
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "api_calls": self.api_calls,
+            "texts_submitted": self.texts_submitted,
+            "texts_sent": self.texts_sent,
+            "avg_batch_size": (
+                round(self.texts_sent / self.api_calls, 1) if self.api_calls else 0.0
+            ),
+            "pending_batches": len(self._tasks),
+        }
@@ -0,0 +1,141 @@
+import hashlib
+from sqlalchemy import select, update, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from src.config import SET_CONF
+from src.database import sessionmanager_pgvector
+from src.database.models.embedding_cache import EmbeddingCacheEntry
+
+# run size-based eviction only every n new entries (COUNT(*) isn't free)
+EVICT_EVERY = 1000
+
+
+def content_hash(text: str) -> str:
+    """sha256 hex digest of the (byte-identical) text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in Postgres.
+
+    Keyed by (sha256 of text, model, task_type, dimensions). Least recently
+    used entries are evicted once the table grows beyond `max_entries`.
+    Cache errors are logged and treated as misses - they never break ingestion.
+    """
+
+    def __init__(self, max_entries: int = 500_000, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._writes_since_evict = 0
+
+    async def get_many(
+        self, hashes: set[str], model: str, task_type: str, dimensions: int
+    ) -> dict[str, list[float]]:
+        """Return {content_hash: embedding} for all cached hashes."""
+        if not self.enabled or not hashes:
+            return {}
+
+        E = EmbeddingCacheEntry
+        key_filter = (
+            (E.model == model)
+            & (E.task_type == task_type)
+            & (E.dimensions == dimensions)
+            & E.content_hash.in_(hashes)
+        )
+
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                result = await db.execute(
+                    select(E.content_hash, E.embedding).where(key_filter)
+                )
+                hits = {row[0]: list(row[1]) for row in result.fetchall()}
+
+                if hits:
+                    await db.execute(
+                        update(E)
+                        .where(key_filter & E.content_hash.in_(hits.keys()))
+                        .values(last_used_at=func.now())
+                    )
+                    await db.commit()
+
+            return hits
+
+        except Exception as e:
+            print(f"⚠️ Embedding cache lookup failed: {e}")
+            return {}
+
+    async def put_many(
+        self,
+        embeddings: dict[str, list[float]],
+        model: str,
+        task_type: str,
+        dimensions: int,
+    ):
+        """Store {content_hash: embedding}, existing keys are kept."""
+        if not self.enabled or not embeddings:
+            return
+
+        rows = [
+            {
+                "content_hash": h,
+                "model": model,
+                "task_type": task_type,
+                "dimensions": dimensions,
+                "embedding": embedding,
+            }
+            for h, embedding in embeddings.items()
+        ]
+
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                await db.execute(
+                    insert(EmbeddingCacheEntry).values(rows).on_conflict_do_nothing()
+                )
+                await db.commit()
+
+        except Exception as e:
+            print(f"⚠️ Embedding cache write failed: {e}")
+            return
+
+        self._writes_since_evict += len(rows)
+        if self._writes_since_evict >= EVICT_EVERY:
+            self._writes_since_evict = 0
+            await self.evict()
+
+    async def evict(self) -> int:
+        """Delete least recently used entries above `max_entries`."""
+        E = EmbeddingCacheEntry
+
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                result = await db.execute(select(func.count()).select_from(E))
+                overflow = result.scalar() - self.max_entries
+                if overflow <= 0:
+                    return 0
+
+                oldest = (
+                    select(E.content_hash, E.model, E.task_type, E.dimensions)
+                    .order_by(E.last_used_at)
+                    .limit(overflow)
+                )
+                await db.execute(
+                    delete(E).where(
+                        tuple_(E.content_hash, E.model, E.task_type, E.dimensions).in_(
+                            oldest
+                        )
+                    )
+                )
+                await db.commit()
+
+            print(f"🧹 Embedding cache: evicted {overflow} entries")
+            return overflow
+
+        except Exception as e:
+            print(f"⚠️ Embedding cache eviction failed: {e}")
+            return 0
+
+
+embedding_cache = EmbeddingCache(
+    max_entries=SET_CONF.EMBED_CACHE_MAX_ENTRIES,
+    enabled=SET_CONF.EMBED_CACHE_ENABLED,
+)
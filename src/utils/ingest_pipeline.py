@@ -0,0 +1,341 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from curl_cffi.requests import AsyncSession
+from crawl4ai import AsyncWebCrawler
+from src.config import SET_CONF
+from src.crud.crawl import save_page_state, save_source, delete_pages, mark_job_url
+from src.utils.page_cache import invalidate_pages
+from src.database import sessionmanager_pgvector
+from src.database.models.crawled_page import CrawledPage
+from src.utils.crawl_config import get_crawl_conf
+from src.utils.crawl_status import crawl_status
+from src.utils.chunking import insert_chunks
+from src.utils.cpu_pool import cpu_pool, prepare_page
+from src.utils.process_doc import (
+    get_titles_and_summaries,
+    build_processed_chunks,
+    page_title,
+)
+from src.utils.text_embedder import get_embeddings_batch
+
+
+@dataclass
+class PageJob:
+    """A page travelling through the ingest pipeline."""
+
+    url: str
+    previous: CrawledPage | None = None  # state of the last crawl
+    lastmod: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    html: str = ""  # cleaned_html, pruned to markdown in the CPU pool
+    base_url: str = ""
+    chunks: list[str] = field(default_factory=list)
+    titles_summaries: list[dict[str, str]] = field(default_factory=list)
+    embeddings: list[list[float] | None] = field(default_factory=list)
+
+
+async def is_not_modified(url: str, etag: str = None, last_modified: str = None):
+    """Conditional HEAD request with stored HTTP validators (304 = unchanged)."""
+    if not etag and not last_modified:
+        return False
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        async with AsyncSession() as s:
+            response = await s.head(url, headers=headers, timeout=10)
+        return response.status_code == 304
+
+    except Exception as e:
+        print(e)
+        return False
+
+
+def default_workers() -> dict[str, int]:
+    """Workers per stage from config."""
+    return {
+        "fetch": 3,
+        "chunk": SET_CONF.INGEST_CHUNK_WORKERS,
+        "summarize": SET_CONF.INGEST_SUMMARY_WORKERS,
+        "embed": SET_CONF.INGEST_EMBED_WORKERS,
+        "store": SET_CONF.INGEST_STORE_WORKERS,
+    }
+
+
+class IngestPipeline:
+    """
+    Staged streaming ingestion: fetch -> chunk -> summarize -> embed -> store.
+
+    Every stage has its own input queue and number of workers. The queues are
+    bounded, so a slow stage applies backpressure to the stages before it,
+    while the browser keeps rendering pages as long as there is room.
+
+    Incremental: pages with a known state (`known_pages`) are skipped when
+    their sitemap <lastmod> is unchanged, the server answers 304 to the stored
+    ETag/Last-Modified, or the cleaned markdown has the same content hash.
+
+    Args:
+        crawler: Started AsyncWebCrawler
+        source_name: Name of the documentation source
+        workers: Workers per stage, i.e. {"fetch": 3, "embed": 4}
+        queue_size: Max. items waiting in front of each stage
+        lastmods: Sitemap <lastmod> per URL
+        known_pages: Crawl state per URL of the previous crawl (refresh only)
+        job_id: Persistent crawl job - every finished URL is checkpointed
+    """
+
+    STAGES = ("fetch", "chunk", "summarize", "embed", "store")
+
+    def __init__(
+        self,
+        crawler: AsyncWebCrawler,
+        source_name: str = None,
+        workers: dict[str, int] = None,
+        queue_size: int = SET_CONF.INGEST_QUEUE_SIZE,
+        lastmods: dict[str, str | None] = None,
+        known_pages: dict[str, CrawledPage] = None,
+        job_id: int = None,
+    ):
+        self.crawler = crawler
+        self.source_name = source_name
+        self.lastmods = lastmods or {}
+        self.known_pages = known_pages or {}
+        self.job_id = job_id
+        self.crawl_config = get_crawl_conf(prune=False)
+        self.workers = {**default_workers(), **(workers or {})}
+        self.queues = {
+            stage: asyncio.Queue(maxsize=queue_size) for stage in self.STAGES
+        }
+        self.handlers = {
+            "fetch": self._fetch,
+            "chunk": self._chunk,
+            "summarize": self._summarize,
+            "embed": self._embed,
+            "store": self._store,
+        }
+        self.completed = {stage: 0 for stage in self.STAGES}
+        self._counts_saved_at: float | None = None
+
+    def queue_depths(self) -> dict[str, dict]:
+        """Current queue depth per stage (for tuning worker counts)."""
+        return {
+            stage: {
+                "queued": self.queues[stage].qsize(),
+                "maxsize": self.queues[stage].maxsize,
+                "workers": self.workers[stage],
+                "completed": self.completed[stage],
+            }
+            for stage in self.STAGES
+        }
+
+    async def run(self, urls: list[str]):
+        """Feed all URLs through the pipeline and wait until everything is stored."""
+        workers = [
+            asyncio.create_task(self._worker(stage))
+            for stage in self.STAGES
+            for _ in range(self.workers[stage])
+        ]
+
+        try:
+            for url in urls:
+                await self.queues["fetch"].put(url)
+
+            # items only move forward, so joining the queues in order is enough
+            for stage in self.STAGES:
+                await self.queues[stage].join()
+
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self, stage: str):
+        queue = self.queues[stage]
+        handler = self.handlers[stage]
+        index = self.STAGES.index(stage)
+        next_queue = (
+            self.queues[self.STAGES[index + 1]]
+            if index + 1 < len(self.STAGES)
+            else None
+        )
+
+        while True:
+            item = await queue.get()
+            try:
+                result = await handler(item)
+                self.completed[stage] += 1
+
+                if result is not None and next_queue is not None:
+                    await next_queue.put(result)
+
+            except Exception as e:
+                url = item if isinstance(item, str) else item.url
+                print(f"Error in {stage} stage for {url}: {e}")
+                await self._finish_page(url, success=False, error=f"{stage}: {e}")
+
+            finally:
+                queue.task_done()
+
+    async def _fetch(self, url: str) -> PageJob | None:
+        job = PageJob(
+            url=url, previous=self.known_pages.get(url), lastmod=self.lastmods.get(url)
+        )
+
+        if job.previous is not None:
+            if job.lastmod and job.lastmod == job.previous.sitemap_lastmod:
+                print(f"⏭️ Unchanged (sitemap lastmod): {url}")
+                await self._finish_page(url, skipped=True)
+                return None
+
+            if await is_not_modified(
+                url, job.previous.etag, job.previous.last_modified
+            ):
+                print(f"⏭️ Unchanged (HTTP 304): {url}")
+                await self._save_state(url, sitemap_lastmod=job.lastmod)
+                await self._finish_page(url, skipped=True)
+                return None
+
+        result = await self.crawler.arun(url=url, config=self.crawl_config)
+
+        if not result.success:
+            print(f"Failed: {url} - Error: {result.error_message}")
+            await self._finish_page(url, success=False, error=result.error_message)
+            return None
+
+        print(f"Successfully crawled: {url}")
+        headers = {k.lower(): v for k, v in (result.response_headers or {}).items()}
+        job.etag = headers.get("etag")
+        job.last_modified = headers.get("last-modified")
+        job.html = result.cleaned_html or ""
+        job.base_url = result.redirected_url or url
+        return job
+
+    async def _chunk(self, job: PageJob) -> PageJob | None:
+        # pruning, cleaning and chunking are CPU-bound: off the event loop
+        job.content_hash, chunks = await cpu_pool.run(
+            prepare_page, job.html, job.base_url
+        )
+        job.html = ""
+
+        if job.previous is not None and job.previous.content_hash == job.content_hash:
+            print(f"⏭️ Unchanged (content hash): {job.url}")
+            await self._save_job_state(job, chunk_count=job.previous.chunk_count)
+            await self._finish_page(job.url, skipped=True)
+            return None
+
+        job.chunks = chunks
+        print(f"📄 Processing {len(job.chunks)} chunks from {job.url}")
+
+        if not job.chunks:
+            print("⚠️ No chunks to process")
+            if job.previous is not None:
+                async with sessionmanager_pgvector.session() as db:
+                    await delete_pages(db, self.source_name, [job.url], keep_state=True)
+                invalidate_pages(self.source_name, [job.url])
+            await self._save_job_state(job, chunk_count=0)
+            await self._finish_page(job.url)
+            return None
+
+        return job
+
+    async def _summarize(self, job: PageJob) -> PageJob:
+        job.titles_summaries = await get_titles_and_summaries(job.chunks, job.url)
+        return job
+
+    async def _embed(self, job: PageJob) -> PageJob | None:
+        job.embeddings = await get_embeddings_batch(
+            texts=job.chunks,
+            task_type="RETRIEVAL_DOCUMENT",
+            dimensions=768,
+        )
+
+        # no page state on failure: the next run embeds the page again
+        if any(embedding is None for embedding in job.embeddings):
+            print(f"⚠️ Embedding failed, page not stored: {job.url}")
+            await self._finish_page(job.url, success=False, error="embedding failed")
+            return None
+
+        return job
+
+    async def _store(self, job: PageJob) -> None:
+        processed_chunks = build_processed_chunks(
+            job.url,
+            job.chunks,
+            job.titles_summaries,
+            job.embeddings,
+            self.source_name,
+        )
+        stored = await insert_chunks(processed_chunks)
+        print(f"✅ Stored {stored} chunks for {job.url}")
+        invalidate_pages(self.source_name, [job.url])
+
+        if stored:
+            # page catalog entry (list_documentation_pages)
+            title = page_title(job.chunks, job.titles_summaries)
+            await self._save_job_state(job, chunk_count=stored, title=title)
+            await self._finish_page(job.url)
+            await self._save_source_counts()
+        else:
+            await self._finish_page(job.url, success=False, error="store failed")
+
+    async def _finish_page(
+        self, url: str, success: bool = True, skipped: bool = False, error=None
+    ):
+        """Count the page in the crawl status and checkpoint it in the job."""
+        crawl_status.update(self.source_name, success=success, skipped=skipped)
+
+        if self.job_id is None:
+            return
+
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                await mark_job_url(
+                    db, self.job_id, url, "done" if success else "failed", error
+                )
+        except Exception as e:
+            print(f"Error checkpointing {url}: {e}")
+
+    async def _save_job_state(
+        self, job: PageJob, chunk_count: int, title: str | None = None
+    ):
+        fields = {"title": title} if title is not None else {}  # None: keep
+        await self._save_state(
+            job.url,
+            sitemap_lastmod=job.lastmod,
+            etag=job.etag,
+            last_modified=job.last_modified,
+            content_hash=job.content_hash,
+            chunk_count=chunk_count,
+            **fields,
+        )
+
+    async def _save_source_counts(self):
+        """
+        Page/chunk counts of the sources catalog during the crawl: a new source
+        is askable after its first stored page, then updated every
+        SOURCE_COUNTS_INTERVAL seconds (crawl_site saves the final counts).
+        """
+        now = time.monotonic()
+        if (
+            self._counts_saved_at is not None
+            and now - self._counts_saved_at < SET_CONF.SOURCE_COUNTS_INTERVAL
+        ):
+            return
+
+        self._counts_saved_at = now
+        try:
+            async with sessionmanager_pgvector.session() as db:
+                await save_source(db, self.source_name, crawled=False)
+        except Exception as e:
+            print(f"Error updating source '{self.source_name}': {e}")
+
+    async def _save_state(self, url: str, **fields):
+        async with sessionmanager_pgvector.session() as db:
+            await save_page_state(db, self.source_name, url, **fields)
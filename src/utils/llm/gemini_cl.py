@@ -5,6 +5,7 @@ from google.genai import types
 from functools import lru_cache
 from pydantic_ai.models.google import GoogleModel
 from pydantic_ai.providers.google import GoogleProvider
+from src.utils.ratelimiter import rate_limiter_gemini, estimate_tokens
 
 project_id = os.getenv("GCP_PROJECT_ID")
 
@@ -21,10 +22,16 @@ gemini_provider = GoogleProvider(
 )
 model_name = "gemini-2.0-flash-001"
 model_name_ask = "gemini-2.5-flash"
+model_name_embed = "gemini-embedding-001"
 gemini_model = GoogleModel(model_name=model_name, provider=gemini_provider)
 gemini_model_ask = GoogleModel(model_name=model_name_ask, provider=gemini_provider)
 
 
+@rate_limiter_gemini.limit(
+    tokens=lambda system_prompt, prompt, *_, **__: estimate_tokens(
+        system_prompt, prompt
+    )
+)
 async def gemini_response(
     system_prompt: str,
     prompt: str,
@@ -34,7 +41,7 @@ async def gemini_response(
     max_output_tokens: int = 2048,
     model: str = model_name,
 ):
-    """Enhanced Gemini response with configurable parameters."""
+    """Enhanced Gemini response with configurable parameters (rate-limited)."""
 
     config = types.GenerateContentConfig(
         system_instruction=system_prompt,
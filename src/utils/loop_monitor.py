@@ -0,0 +1,77 @@
+import asyncio
+from collections import deque
+from src.config import SET_CONF
+
+
+class LatencyStats:
+    """Rolling window of durations (seconds) with percentiles in ms."""
+
+    def __init__(self, window: int = SET_CONF.LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile in ms (0.0 without samples)."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index] * 1000
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50), 1),
+            "p90_ms": round(self.percentile(90), 1),
+            "p99_ms": round(self.percentile(99), 1),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 1),
+        }
+
+
+class EventLoopMonitor:
+    """
+    Measures event loop lag: a task sleeps `interval` seconds and records how
+    much later than requested it wakes up. Anything blocking the loop (CPU-bound
+    code, sync I/O) shows up as lag for every request served at the same time.
+    """
+
+    def __init__(self, interval: float = SET_CONF.LOOP_MONITOR_INTERVAL):
+        self.interval = interval
+        self.lag = LatencyStats()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag.add(max(0.0, loop.time() - started - self.interval))
+
+    def stats(self) -> dict:
+        return {"interval_ms": self.interval * 1000, **self.lag.stats()}
+
+
+loop_monitor = EventLoopMonitor()
+
+# /agent/ask latency, split by whether a crawl was running at the same time
+ask_latency = {"idle": LatencyStats(), "crawling": LatencyStats()}
+
+# /agent/ask latency per answer mode
+ask_mode_latency = {"agentic": LatencyStats(), "fast": LatencyStats()}
+
+# /agent/ask/stream: time to the first answer token per answer mode
+ask_ttft = {"agentic": LatencyStats(), "fast": LatencyStats()}
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+from src.config import SET_CONF
+from src.utils.ttl_cache import TTLCache
+
+
+@dataclass
+class AssembledPage:
+    """Chunks of a page in chunk_number order (get_page_content)."""
+
+    title: str
+    chunks: list[str]
+
+    @property
+    def total_chars(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+
+# keyed by (source, url), dropped when the page is stored/deleted again
+page_cache = TTLCache(
+    max_entries=SET_CONF.PAGE_CACHE_MAX_ENTRIES, ttl=SET_CONF.PAGE_CACHE_TTL
+)
+
+
+def invalidate_pages(source: str, urls: list[str]):
+    """Re-ingested or deleted pages (other workers: until PAGE_CACHE_TTL)."""
+    for url in urls:
+        page_cache.pop((source, url))
@@ -1,13 +1,16 @@
+import re
 import json
 import asyncio
 
 from urllib.parse import urlparse
 
-from src.utils.chunking import chunk_text, insert_chunk, ProcessedChunk
+from src.utils.chunking import chunk_text, insert_chunks, ProcessedChunk
 from src.utils.text_embedder import get_embeddings_batch
 from src.load_app import get_berlin_time
 from src.utils.llm.gemini_cl import gemini_response
-from src.utils.ratelimiter import rate_limiter_gemini
+from src.config import SET_CONF
+
+PAGE_HEADING_PATTERN = re.compile(r"^#{1,2}\s+(.+?)[\s#]*$", re.MULTILINE)
 
 
 async def process_and_store_document(url: str, markdown: str, source_name: str = None):
@@ -16,9 +19,9 @@ async def process_and_store_document(url: str, markdown: str, source_name: str =
 
     Steps:
     1. Split into chunks
-    2. Get titles/summaries in parallel
-    3. Get embeddings in ONE batch
-    4. Store all chunks in parallel
+    2. Get titles/summaries in batched LLM calls
+    3. Get embeddings via the shared batcher
+    4. Store all chunks in ONE transaction
     """
     # 1. Split into chunks
     chunks = chunk_text(markdown)
@@ -28,20 +31,41 @@ async def process_and_store_document(url: str, markdown: str, source_name: str =
         print("⚠️ No chunks to process")
         return
 
-    # 2. Get titles & summaries in parallel
-    title_summary_tasks = [get_title_and_summary(chunk, url) for chunk in chunks]
-    titles_summaries = await asyncio.gather(*title_summary_tasks)
+    # 2. Get titles & summaries (several chunks per LLM call)
+    titles_summaries = await get_titles_and_summaries(chunks, url)
 
-    # 3. Get embeddings in ONE batch (efficient!)
+    # 3. Get embeddings (shared batches across documents, max 100 per API call)
     print(f"🔄 Getting embeddings for {len(chunks)} chunks...")
     embeddings = await get_embeddings_batch(
         texts=chunks,
         task_type="RETRIEVAL_DOCUMENT",
         dimensions=768,
-        batch_size=100,  # ✅ Max 100 per API call
     )
 
+    if any(embedding is None for embedding in embeddings):
+        print(f"⚠️ Embedding failed, page not stored: {url}")
+        return
+
     # 4. Create ProcessedChunks
+    processed_chunks = build_processed_chunks(
+        url, chunks, titles_summaries, embeddings, source_name
+    )
+
+    # 5. Store all chunks in one transaction (bulk upsert)
+    print(f"💾 Storing {len(processed_chunks)} chunks...")
+    stored = await insert_chunks(processed_chunks)
+
+    print(f"✅ Stored {stored} chunks for {url}")
+
+
+def build_processed_chunks(
+    url: str,
+    chunks: list[str],
+    titles_summaries: list[dict[str, str]],
+    embeddings: list[list[float]],
+    source_name: str = None,
+) -> list[ProcessedChunk]:
+    """Combine chunks, titles/summaries and embeddings of a page."""
     crawl_time = get_berlin_time()
     processed_chunks = []
 
@@ -67,15 +91,9 @@ async def process_and_store_document(url: str, markdown: str, source_name: str =
             )
         )
 
-    # 5. Store all chunks in parallel
-    print(f"💾 Storing {len(processed_chunks)} chunks...")
-    insert_tasks = [insert_chunk(chunk) for chunk in processed_chunks]
-    await asyncio.gather(*insert_tasks)
-
-    print(f"✅ Stored {len(processed_chunks)} chunks for {url}")
+    return processed_chunks
 
 
-@rate_limiter_gemini
 async def get_title_and_summary(chunk: str, url: str) -> dict[str, str]:
     """Extract with enforced JSON schema."""
 
@@ -106,9 +124,117 @@ async def get_title_and_summary(chunk: str, url: str) -> dict[str, str]:
 
     except Exception as e:
         print(f"❌ Error: {e}")
-        # Fallback
-        path_part = urlparse(url).path.strip("/").split("/")[-1] or "Doc"
-        return {
-            "title": f"{path_part}",
-            "summary": chunk[:200].replace("\n", " ") + "...",
-        }
+        return _fallback_title_summary(chunk, url)
+
+
+async def get_titles_and_summaries(
+    chunks: list[str], url: str, batch_size: int = SET_CONF.SUMMARY_BATCH_SIZE
+) -> list[dict[str, str]]:
+    """
+    Get titles & summaries for all chunks of a page.
+
+    Sends `batch_size` chunk excerpts per LLM call (batch_size=1: one call
+    per chunk). Results are returned in chunk order.
+    """
+    if batch_size <= 1:
+        return await asyncio.gather(
+            *[get_title_and_summary(chunk, url) for chunk in chunks]
+        )
+
+    batches = [chunks[i : i + batch_size] for i in range(0, len(chunks), batch_size)]
+    results = await asyncio.gather(
+        *[_get_titles_and_summaries_batch(batch, url) for batch in batches]
+    )
+    return [title_summary for batch in results for title_summary in batch]
+
+
+async def _get_titles_and_summaries_batch(
+    chunks: list[str], url: str
+) -> list[dict[str, str]]:
+    """
+    Extract titles/summaries of several chunks in one call (JSON array).
+
+    Entries are mapped back by their index. Chunks the model dropped or
+    garbled get the fallback title/summary.
+    """
+
+    system_prompt = """Extract title and summary from each documentation chunk.
+Return exactly one entry per chunk with the chunk's index."""
+
+    json_schema = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "index": {"type": "integer", "description": "Index of the chunk"},
+                "title": {"type": "string", "description": "Short descriptive title"},
+                "summary": {
+                    "type": "string",
+                    "description": "Brief summary of content",
+                },
+            },
+            "required": ["index", "title", "summary"],
+        },
+    }
+
+    excerpts = "\n\n".join(
+        f"### Chunk {i}\n{chunk[:800]}" for i, chunk in enumerate(chunks)
+    )
+
+    try:
+        response_text = await gemini_response(
+            system_prompt=system_prompt,
+            prompt=f"URL: {url}\n\nChunks:\n\n{excerpts}",
+            response_mime_type="application/json",
+            response_schema=json_schema,
+            temperature=0.3,
+            max_output_tokens=min(250 * len(chunks) + 250, 8192),
+        )
+        parsed = json.loads(response_text)
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        parsed = []
+
+    by_index = {}
+    for item in parsed if isinstance(parsed, list) else []:
+        if (
+            isinstance(item, dict)
+            and isinstance(item.get("index"), int)
+            and isinstance(item.get("title"), str)
+            and isinstance(item.get("summary"), str)
+            and item["title"].strip()
+        ):
+            by_index.setdefault(item["index"], item)
+
+    results = []
+    for i, chunk in enumerate(chunks):
+        item = by_index.get(i)
+        if item is None:
+            results.append(_fallback_title_summary(chunk, url))
+        else:
+            results.append({"title": item["title"], "summary": item["summary"]})
+
+    missing = sum(1 for i in range(len(chunks)) if i not in by_index)
+    print(f"📝 {len(chunks)} titles/summaries in one call ({missing} fallbacks)")
+    return results
+
+
+def page_title(chunks: list[str], titles_summaries: list[dict[str, str]]) -> str | None:
+    """Title of a page: first heading of its first chunk, else that chunk's title."""
+    if chunks:
+        heading = PAGE_HEADING_PATTERN.search(chunks[0])
+        if heading:
+            return heading.group(1)[:300]
+    if titles_summaries:
+        return titles_summaries[0]["title"].split(" - ")[0]
+    return None
+
+
+def _fallback_title_summary(chunk: str, url: str) -> dict[str, str]:
+    """Title from the URL path, summary from the chunk start."""
+    path_part = urlparse(url).path.strip("/").split("/")[-1] or "Doc"
+    return {
+        "title": f"{path_part}",
+        "summary": chunk[:200].replace("\n", " ") + "...",
+    }
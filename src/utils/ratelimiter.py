@@ -1,65 +1,180 @@
 import asyncio
 import time
-from collections import deque
 from functools import wraps
+from typing import Callable
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """429 / RESOURCE_EXHAUSTED from the API."""
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return code == 429 or "RESOURCE_EXHAUSTED" in str(e)
+
+
+class _TokenBucket:
+    """Bucket with `capacity` units, refilled completely once per `period`."""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period  # units per second
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float, rate_factor: float) -> float:
+        """Take `amount` (level may go negative), return seconds to wait."""
+        rate = self.rate * rate_factor
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / rate
+
+    def penalize(self, seconds: float, rate_factor: float):
+        """Empty the bucket, so the next reservation waits at least `seconds`."""
+        self.level = min(self.level, 0.0) - seconds * self.rate * rate_factor
 
 
 class AsyncRateLimiter:
+    """
+    Token-bucket rate limiter for requests/period and (optional) tokens/period.
+
+    - Fair FIFO: every caller reserves its slot immediately (synchronously, no
+      lock is held while sleeping) and then sleeps until the slot is due.
+    - 429-aware: RESOURCE_EXHAUSTED errors halve the effective rate and pause
+      new reservations (exponential backoff), successes slowly restore it.
+    """
+
     _instances = {}  # Dictionary für mehrere Instanzen mit verschiedenen Namen
 
     @classmethod
-    def get_instance(cls, name="default", max_calls=15, period=60):
+    def get_instance(
+        cls, name="default", max_calls=15, period=60, max_tokens=None, **kwargs
+    ):
         """Holt eine benannte Instanz des Rate Limiters oder erstellt eine neue"""
         if name not in cls._instances:
-            cls._instances[name] = AsyncRateLimiter(max_calls, period)
+            cls._instances[name] = AsyncRateLimiter(
+                max_calls, period, max_tokens, **kwargs
+            )
         return cls._instances[name]
 
-    def __init__(self, max_calls=15, period=60):
+    def __init__(
+        self,
+        max_calls=15,
+        period=60,
+        max_tokens: int | None = None,
+        max_retries: int = 3,
+        backoff: float = 2.0,
+        min_rate_factor: float = 0.1,
+        recovery_step: float = 0.05,
+    ):
         self.max_calls = max_calls
         self.period = period
-        self.calls = deque()
-        self.lock = asyncio.Lock()
-
-    async def acquire(self):
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+
+        self._requests = _TokenBucket(max_calls, period)
+        self._tokens = _TokenBucket(max_tokens, period) if max_tokens else None
+        self.rate_factor = 1.0  # < 1.0 after 429 responses
+        self._consecutive_429 = 0
+        self.waiting = 0
+        self.rate_limited = 0
+
+    async def acquire(self, tokens: int = 0):
         """Wartet, bis eine Anfrage innerhalb des Rate Limits möglich ist"""
-        async with self.lock:
-            current_time = time.time()
-
-            # Entferne abgelaufene Zeitstempel
-            while self.calls and current_time - self.calls[0] > self.period:
-                self.calls.popleft()
-
-            if len(self.calls) >= self.max_calls:
-                # Berechne Wartezeit bis der älteste Aufruf abläuft
-                sleep_time = self.period - (current_time - self.calls[0])
-                print(f"Rate limit erreicht. Warte {sleep_time:.2f} Sekunden...")
-                await asyncio.sleep(sleep_time)
-
-                # Nach dem Warten aktualisieren wir die Zeit und die Liste
-                current_time = time.time()
-                while self.calls and current_time - self.calls[0] > self.period:
-                    self.calls.popleft()
-
-            # Füge aktuellen Zeitstempel hinzu
-            self.calls.append(current_time)
+        now = time.monotonic()
+        wait = self._requests.reserve(1, now, self.rate_factor)
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens, now, self.rate_factor))
+
+        if wait > 0:
+            print(f"Rate limit erreicht. Warte {wait:.2f} Sekunden...")
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+
+    def report_rate_limited(self):
+        """API answered 429: slow down and pause new reservations."""
+        self.rate_limited += 1
+        self._consecutive_429 += 1
+        self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+
+        pause = min(self.backoff * 2 ** (self._consecutive_429 - 1), self.period)
+        self._requests.penalize(pause, self.rate_factor)
+        if self._tokens is not None:
+            self._tokens.penalize(pause, self.rate_factor)
+        print(
+            f"429 RESOURCE_EXHAUSTED: Pause {pause:.1f}s, "
+            f"rate {self.rate_factor:.0%} of {self.max_calls}/{self.period}s"
+        )
+
+    def report_success(self):
+        """Successful call: recover the rate step by step."""
+        self._consecutive_429 = 0
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor + self.recovery_step)
+
+    def limit(self, tokens: Callable[..., int] = None):
+        """
+        Decorator with token weights.
+
+        Args:
+            tokens: Estimates the tokens of a call from the call's arguments
+        """
+
+        def decorator(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                amount = tokens(*args, **kwargs) if tokens else 0
+
+                for attempt in range(self.max_retries + 1):
+                    await self.acquire(tokens=amount)
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        if not is_rate_limit_error(e) or attempt == self.max_retries:
+                            raise
+                        self.report_rate_limited()
+                        continue
+
+                    self.report_success()
+                    return result
+
+            return wrapper
+
+        return decorator
 
     def __call__(self, func):
         """Ermöglicht die Verwendung als Decorator"""
+        return self.limit()(func)
 
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            await self.acquire()
-            return await func(*args, **kwargs)
-
-        return wrapper
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "max_calls": self.max_calls,
+            "max_tokens": self.max_tokens,
+            "period": self.period,
+            "rate_factor": round(self.rate_factor, 3),
+            "waiting": self.waiting,
+            "rate_limited": self.rate_limited,
+        }
 
 
 # Hilfsfunktion für einfacheren Zugriff
-def get_rate_limiter(name="default", max_calls=15, period=60):
-    return AsyncRateLimiter.get_instance(name, max_calls, period)
+def get_rate_limiter(name="default", max_calls=15, period=60, max_tokens=None):
+    return AsyncRateLimiter.get_instance(name, max_calls, period, max_tokens)
 
 
-rate_limiter_gemini = get_rate_limiter("gemini rate-limiter", max_calls=30, period=60)
+rate_limiter_gemini = get_rate_limiter(
+    "gemini rate-limiter", max_calls=30, period=60, max_tokens=1_000_000
+)
 rate_limiter_gemini_embeddings = get_rate_limiter(
-    "gemini rate-limiter_embeddings", max_calls=100, period=60
+    "gemini rate-limiter_embeddings", max_calls=100, period=60, max_tokens=1_000_000
 )
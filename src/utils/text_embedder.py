@@ -1,63 +1,146 @@
 import asyncio
-from src.utils.llm.gemini_cl import gemini_client
-from src.utils.ratelimiter import rate_limiter_gemini_embeddings
+from src.utils.llm.gemini_cl import gemini_client, model_name_embed
+from src.utils.ratelimiter import rate_limiter_gemini_embeddings, estimate_tokens
+from src.utils.embedding_cache import embedding_cache, content_hash
+from src.utils.ttl_cache import TTLCache
+from src.utils.embedding_batcher import EmbeddingBatcher
+from src.config import SET_CONF
+
+# in-process cache for query embeddings (user questions, agent retries)
+query_embedding_cache = TTLCache(
+    max_entries=SET_CONF.QUERY_EMBED_CACHE_MAX_ENTRIES,
+    ttl=SET_CONF.QUERY_EMBED_CACHE_TTL,
+)
+_pending_queries: dict[tuple, asyncio.Future] = {}
 
 
 async def get_embeddings_batch(
     texts: list[str],
     task_type: str = "RETRIEVAL_DOCUMENT",
     dimensions: int = 768,
-    batch_size: int = 100,
-) -> list[list[float]]:
-    """Get embeddings in batches with automatic rate limiting."""
-    all_embeddings = []
+) -> list[list[float] | None]:
+    """
+    Get embeddings with automatic rate limiting.
+
+    Texts already in the embedding cache are not sent to the API - only
+    cache misses (deduplicated by content hash) go to the shared
+    `embedding_batcher`, which packs them together with the texts of other
+    concurrently processed documents into full API calls. Results are merged
+    back in the original order.
+
+    Texts whose batch failed come back as None, so callers can skip them
+    instead of storing placeholder vectors.
+    """
+    hashes = [content_hash(text) for text in texts]
+    embeddings = await embedding_cache.get_many(
+        set(hashes), model_name_embed, task_type, dimensions
+    )
 
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
+    # unique misses: identical texts within this call are embedded once
+    misses: dict[str, str] = {}
+    for h, text in zip(hashes, texts):
+        if h not in embeddings and h not in misses:
+            misses[h] = text
 
-        try:
-            embedding_batch = await _get_batch_internal(batch, task_type, dimensions)
-            all_embeddings.extend(embedding_batch)
+    print(f"🗃️ Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
 
-            print(
-                f"✅ Batch {i // batch_size + 1}/{(len(texts) - 1) // batch_size + 1}"
-            )
+    results = await embedding_batcher.embed(
+        list(misses.values()), task_type, dimensions
+    )
 
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            all_embeddings.extend([[0.0] * dimensions] * len(batch))
+    # failed batches (None) are not cached and stay None
+    fresh_embeddings = {
+        h: embedding for h, embedding in zip(misses, results) if embedding is not None
+    }
+    await embedding_cache.put_many(
+        fresh_embeddings, model_name_embed, task_type, dimensions
+    )
+    embeddings.update(fresh_embeddings)
 
-    return all_embeddings
+    return [embeddings.get(h) for h in hashes]
 
 
-@rate_limiter_gemini_embeddings
+@rate_limiter_gemini_embeddings.limit(
+    tokens=lambda batch, *_, **__: estimate_tokens(*batch)
+)
 async def _get_batch_internal(batch, task_type, dimensions):
     """Rate-limited API call."""
-    result = await asyncio.to_thread(
-        gemini_client.models.embed_content,
-        model="gemini-embedding-001",
+    result = await gemini_client.aio.models.embed_content(
+        model=model_name_embed,
         contents=batch,
         config={"task_type": task_type, "output_dimensionality": dimensions},
     )
     return [emb.values for emb in result.embeddings]
 
 
-@rate_limiter_gemini_embeddings
+# shared across all concurrently processed documents
+embedding_batcher = EmbeddingBatcher(
+    _get_batch_internal,
+    batch_size=SET_CONF.EMBED_BATCH_SIZE,
+    max_wait=SET_CONF.EMBED_BATCH_MAX_WAIT,
+    max_concurrent_batches=SET_CONF.EMBED_MAX_CONCURRENT_BATCHES,
+)
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace, so near-identical questions share one embedding."""
+    return " ".join(text.split())
+
+
 async def get_embedding_single(
     text: str,
     task_type: str = "QUESTION_ANSWERING",
     dimensions: int = 768,
 ) -> list[float]:
-    """Get single embedding (for user queries)."""
+    """
+    Get single embedding (for user queries).
+
+    Results are kept in an in-process LRU/TTL cache (keyed by the
+    whitespace-normalized query; case is kept, "Path" and "path" can mean
+    different things in docs) and concurrent requests for the same query share
+    one API call. Error fallbacks (zero vectors) are never cached.
+    """
+    query = normalize_query(text)
+    key = (query, task_type, dimensions)
+
+    embedding = query_embedding_cache.get(key)
+    if embedding is not None:
+        return embedding
+
+    pending = _pending_queries.get(key)
+    if pending is not None:
+        embedding = await asyncio.shield(pending)
+        if embedding is not None:
+            return embedding
+
+    future = asyncio.get_running_loop().create_future()
+    _pending_queries[key] = future
+
     try:
-        result = await asyncio.to_thread(
-            gemini_client.models.embed_content,
-            model="gemini-embedding-001",
-            contents=text,
-            config={"task_type": task_type, "output_dimensionality": dimensions},
-        )
-        return result.embeddings[0].values
+        embedding = await _get_single_internal(query, task_type, dimensions)
+        query_embedding_cache.set(key, embedding)
 
     except Exception as e:
         print(f"Error getting embedding: {e}")
+        embedding = None
         return [0.0] * dimensions
+
+    finally:
+        # waiters get None (and retry on their own) if this call failed
+        future.set_result(embedding)
+        _pending_queries.pop(key, None)
+
+    return embedding
+
+
+@rate_limiter_gemini_embeddings.limit(
+    tokens=lambda text, *_, **__: estimate_tokens(text)
+)
+async def _get_single_internal(text: str, task_type: str, dimensions: int):
+    """Rate-limited API call."""
+    result = await gemini_client.aio.models.embed_content(
+        model=model_name_embed,
+        contents=text,
+        config={"task_type": task_type, "output_dimensionality": dimensions},
+    )
+    return result.embeddings[0].values
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Bounded in-memory LRU cache with per-entry TTL and hit/miss counters.
+
+    Thread-safe, so one instance can be shared by concurrent requests.
+
+    Args:
+        max_entries: Least recently used entries are evicted above this size
+        ttl: Seconds until an entry expires (None = no expiry)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value (and mark it as recently used) or default."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, value = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Store value, evicting the least recently used entries if full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Key is cached and not expired (doesn't count as hit/miss)."""
+        with self._lock:
+            item = self._data.get(key)
+        return item is not None and (item[0] is None or item[0] > time.monotonic())
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value."""
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches predicate."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
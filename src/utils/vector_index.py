@@ -0,0 +1,343 @@
+import asyncio
+import math
+import re
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import SET_CONF
+from src.database import sessionmanager_pgvector
+
+TABLE_NAME = "site_pages"
+
+# Indexed representations of site_pages.embedding:
+# (index suffix, build suffix, swapped-out suffix, operator class expression)
+# suffixes have the same length, "<partition>_embedding_idx" fits 63 chars;
+# site_pages_embedding_idx is the default name of
+# "create index on site_pages using ivfflat (embedding ...)"
+INDEX_KINDS = {
+    "full": (
+        "_embedding_idx",
+        "_embedding_tmp",
+        "_embedding_old",
+        "embedding vector_cosine_ops",
+    ),
+    "halfvec": (
+        "_emb_half_idx",
+        "_emb_half_tmp",
+        "_emb_half_old",
+        "(embedding::halfvec(768)) halfvec_cosine_ops",
+    ),
+    "bit": (
+        "_emb_bit_idx",
+        "_emb_bit_tmp",
+        "_emb_bit_old",
+        "(binary_quantize(embedding)::bit(768)) bit_hamming_ops",
+    ),
+}
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector recommendation: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if rows <= 1_000_000:
+        return max(10, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def ivfflat_probes(lists: int) -> int:
+    """pgvector recommendation: sqrt(lists)."""
+    return max(1, int(math.sqrt(lists)))
+
+
+class VectorIndexManager:
+    """
+    Manages the ANN indexes on site_pages.embedding.
+
+    site_pages is list-partitioned by source: every partition (library) has
+    its own index, sized for its own rows. An unpartitioned site_pages (old
+    schema) is handled as a single table.
+
+    - VECTOR_INDEX_TYPE "hnsw" or "ivfflat" - indexes of a different type are
+      replaced on startup.
+    - VECTOR_QUANTIZATION "halfvec"/"bit" adds a compact expression index
+      (first pass, re-ranked on the full vectors). VECTOR_FULL_INDEX=False
+      drops the full-precision index, only the compact one stays in memory.
+    - IVFFlat centroids are computed at build time, so an index built on an
+      empty/small table has bad recall later: after an ingest the index is
+      rebuilt when the ideal list count (from the row count) drifted by
+      IVFFLAT_REBUILD_RATIO.
+    - Rebuilds use CREATE INDEX CONCURRENTLY, then swap the names of the old
+      and the new index in one transaction: reads keep using the old index
+      until the new one is ready, there is always exactly one index of a kind.
+      The old index is dropped afterwards; leftovers of an interrupted
+      build/drop are removed on the next check.
+    - Every worker checks the indexes on startup: check-and-rebuild of a table
+      holds a Postgres advisory lock, workers that don't get it skip the table
+      (another one is building its index).
+    - Search settings (ivfflat.probes / hnsw.ef_search) are set per
+      transaction with set_config(..., true).
+    """
+
+    def __init__(
+        self,
+        index_type: str = SET_CONF.VECTOR_INDEX_TYPE,
+        quantization: str = SET_CONF.VECTOR_QUANTIZATION,
+        full_index: bool = SET_CONF.VECTOR_FULL_INDEX,
+    ):
+        self.index_type = index_type.lower()
+        self.quantization = quantization.lower()
+        if self.quantization not in ("none", *INDEX_KINDS):
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION: {quantization}")
+
+        # index kinds to maintain (without quantization the full one is needed)
+        self.kinds = [
+            kind
+            for kind in INDEX_KINDS
+            if kind == self.quantization
+            or (kind == "full" and (full_index or self.quantization == "none"))
+        ]
+        self.lists: dict[str, int] = {}  # of the current IVFFlat index per table
+        self.rebuilds = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def get_tables(self) -> list[str]:
+        """Partitions of site_pages, or site_pages itself if not partitioned."""
+        async with sessionmanager_pgvector.session() as db:
+            result = await db.execute(
+                text("SELECT relkind FROM pg_class WHERE relname = :table"),
+                {"table": TABLE_NAME},
+            )
+            if result.scalar_one_or_none() != "p":
+                return [TABLE_NAME]
+
+            result = await db.execute(
+                text("""
+                    SELECT child.relname
+                    FROM pg_inherits
+                    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                    WHERE pg_inherits.inhparent = CAST(:table AS regclass)
+                    ORDER BY child.relname
+                """),
+                {"table": TABLE_NAME},
+            )
+            return list(result.scalars().all())
+
+    async def get_index_info(self, table: str, kind: str = "full") -> dict | None:
+        """Method and list count of an index of a table (None = no index)."""
+        async with sessionmanager_pgvector.session() as db:
+            result = await db.execute(
+                text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+                {"name": table + INDEX_KINDS[kind][0]},
+            )
+            indexdef = result.scalar_one_or_none()
+
+        if indexdef is None:
+            return None
+
+        method = re.search(r"USING (\w+)", indexdef)
+        lists = re.search(r"lists\s*=\s*'?(\d+)", indexdef)
+        return {
+            "type": method.group(1).lower() if method else None,
+            "lists": int(lists.group(1)) if lists else None,
+        }
+
+    async def count_rows(self, table: str) -> int:
+        async with sessionmanager_pgvector.session() as db:
+            result = await db.execute(text(f'SELECT count(*) FROM "{table}"'))
+            return result.scalar_one()
+
+    def start(self):
+        """Check the indexes in the background (a rebuild can take a while)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.ensure_index())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def ensure_index(self):
+        """Create/replace the index of every table to match the config."""
+        try:
+            for table in await self.get_tables():
+                await self.ensure_table_index(table)
+
+        except Exception as e:
+            print(f"Error checking vector index: {e}")
+
+    def table_lock(self, table: str):
+        """Advisory lock of a table's indexes across processes."""
+        return sessionmanager_pgvector.try_advisory_lock(f"vector_index:{table}")
+
+    async def ensure_table_index(self, table: str, check_lists: bool = True):
+        """Create the indexes of a table or replace them, if the type is different."""
+        async with self.table_lock(table) as acquired:
+            if not acquired:
+                print(f"🧭 Vector index {table}: checked by another worker")
+                return
+            await self._ensure_table_index(table, check_lists)
+
+    async def _ensure_table_index(self, table: str, check_lists: bool):
+        # leftovers of interrupted rebuilds (we hold the lock: nobody builds)
+        await self._drop_indexes(
+            [
+                table + suffix
+                for kind in INDEX_KINDS
+                for suffix in INDEX_KINDS[kind][1:3]
+            ]
+        )
+
+        for kind in INDEX_KINDS:
+            info = await self.get_index_info(table, kind)
+
+            if kind not in self.kinds:
+                if info is not None:
+                    await self.drop(table, kind)
+                continue
+
+            if info is None or info["type"] != self.index_type:
+                print(f"🧭 Vector index {table} ({kind}): {info} -> {self.index_type}")
+                await self.rebuild(table, kind=kind)
+            elif self.index_type == "ivfflat":
+                self.lists[table] = info["lists"]
+
+        if self.index_type == "ivfflat" and check_lists:
+            await self._maybe_rebuild_table(table)
+
+    async def maybe_rebuild(self, tables: list[str] = None) -> int:
+        """Rebuild IVFFlat indexes whose row count outgrew their lists."""
+        if self.index_type != "ivfflat":
+            return 0
+
+        rebuilt = 0
+        for table in tables or await self.get_tables():
+            async with self.table_lock(table) as acquired:
+                if acquired and await self._maybe_rebuild_table(table):
+                    rebuilt += 1
+
+        return rebuilt
+
+    async def _maybe_rebuild_table(self, table: str) -> bool:
+        # the list count of the index (another worker may have rebuilt it)
+        info = await self.get_index_info(table, self.kinds[0])
+        self.lists[table] = info["lists"] if info else None
+
+        rows = await self.count_rows(table)
+        target = ivfflat_lists(rows)
+        current = self.lists[table] or 1
+        ratio = max(target, current) / min(target, current)
+
+        if ratio < SET_CONF.IVFFLAT_REBUILD_RATIO:
+            return False
+
+        print(f"🧭 IVFFlat {table}: {rows} rows, lists {current} -> {target}")
+        for kind in self.kinds:
+            await self.rebuild(table, lists=target, kind=kind)
+        return True
+
+    async def rebuild(self, table: str, lists: int = None, kind: str = "full"):
+        """
+        Build a new index concurrently, then swap it in for the old one
+        (the caller holds table_lock: the build name is the same in all workers).
+        """
+        index_suffix, build_suffix, old_suffix, column = INDEX_KINDS[kind]
+
+        async with self._lock:
+            if self.index_type == "hnsw":
+                using = (
+                    f"hnsw ({column}) "
+                    f"WITH (m = {SET_CONF.HNSW_M}, "
+                    f"ef_construction = {SET_CONF.HNSW_EF_CONSTRUCTION})"
+                )
+            elif self.index_type == "ivfflat":
+                lists = lists or ivfflat_lists(await self.count_rows(table))
+                using = f"ivfflat ({column}) WITH (lists = {lists})"
+            else:
+                raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {self.index_type}")
+
+            index_name = table + index_suffix
+            build_name = table + build_suffix
+            old_name = table + old_suffix
+            engine = sessionmanager_pgvector.get_engine()
+
+            # leftovers of an interrupted build (invalid index) or drop
+            await self._drop_indexes([build_name, old_name])
+
+            # CONCURRENTLY can't run inside a transaction block
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                for statement in (
+                    f"SET maintenance_work_mem = '{SET_CONF.INDEX_MAINTENANCE_WORK_MEM}'",
+                    f'CREATE INDEX CONCURRENTLY "{build_name}" ON "{table}" USING {using}',
+                ):
+                    await conn.execute(text(statement))
+
+            # both renames in one transaction: never both or no index in place
+            async with engine.begin() as conn:
+                for statement in (
+                    f'ALTER INDEX IF EXISTS "{index_name}" RENAME TO "{old_name}"',
+                    f'ALTER INDEX "{build_name}" RENAME TO "{index_name}"',
+                ):
+                    await conn.execute(text(statement))
+
+            await self._drop_indexes([old_name])
+
+            if self.index_type == "ivfflat":
+                self.lists[table] = lists
+            self.rebuilds += 1
+            print(f"✅ Vector index rebuilt: {table} {using}")
+
+    async def drop(self, table: str, kind: str):
+        """Drop an index that isn't configured anymore."""
+        index_name = table + INDEX_KINDS[kind][0]
+        await self._drop_indexes([index_name])
+        print(f"🗑️ Vector index dropped: {index_name}")
+
+    async def _drop_indexes(self, names: list[str]):
+        engine = sessionmanager_pgvector.get_engine()
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for name in names:
+                await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+    def search_settings(
+        self, probes: int = None, ef_search: int = None, match_count: int = 10
+    ) -> dict[str, int]:
+        """Per-request search settings (explicit values win over config/defaults)."""
+        if self.index_type == "ivfflat":
+            # sized for the largest partition: enough recall for all of them
+            lists = max(filter(None, self.lists.values()), default=100)
+            default = SET_CONF.IVFFLAT_PROBES or ivfflat_probes(lists)
+            return {"ivfflat.probes": probes or default}
+
+        # ef_search below the number of requested rows cuts results short
+        ef_search = ef_search or SET_CONF.HNSW_EF_SEARCH
+        return {"hnsw.ef_search": max(ef_search, match_count)}
+
+    async def apply_search_settings(
+        self,
+        session: AsyncSession,
+        probes: int = None,
+        ef_search: int = None,
+        match_count: int = 10,
+    ):
+        """Set probes/ef_search for the current transaction of the session only."""
+        settings = self.search_settings(probes, ef_search, match_count)
+        for name, value in settings.items():
+            await session.execute(
+                text("SELECT set_config(:name, :value, true)"),
+                {"name": name, "value": str(value)},
+            )
+
+    def stats(self) -> dict:
+        return {
+            "type": self.index_type,
+            "indexes": self.kinds,
+            "lists": self.lists,
+            "rebuilds": self.rebuilds,
+            "search": self.search_settings(),
+        }
+
+
+vector_index = VectorIndexManager()
@@ -0,0 +1,395 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import time
+import numpy as np
+from sqlalchemy import text
+from src.config import SET_CONF
+from src.database import sessionmanager_pgvector
+
+DIMENSIONS = 768
+EXPORT_BATCH_SIZE = 1000  # rows per thread hand-off while exporting
+
+EXPORT_QUERY = text("""
+    SELECT
+        id, url, chunk_number, title, summary, content, meta_details,
+        CAST(embedding AS text) AS embedding
+    FROM site_pages
+    WHERE source = :source AND embedding IS NOT NULL
+    ORDER BY url, chunk_number
+""")
+
+
+def source_slug(source: str) -> str:
+    """Readable + unique file name of a source."""
+    name = re.sub(r"[^a-z0-9]+", "_", source.lower()).strip("_")[:40]
+    return f"{name}_{hashlib.md5(source.encode()).hexdigest()[:8]}"
+
+
+class SourceMatrix:
+    """
+    Read-only, memory-mapped export of one source:
+    - vectors.npy  (rows, 768) float32, L2-normalized -> cosine = dot product
+    - offsets.npy  (rows + 1,) int64 byte offsets of the rows in payload.jsonl
+    - payload.jsonl  one JSON object per row (the columns of match_site_pages)
+    Rows are sorted by (url, chunk_number): the chunks around a hit are its
+    neighboring rows.
+    The pages live in the OS page cache, every worker process maps the same.
+
+    Searches hold a reference (acquire/release, on the event loop): a matrix
+    replaced by a newer export is unmapped once its last search finished.
+    """
+
+    def __init__(self, path: str, version: str):
+        self.version = version
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "payload.jsonl"), "rb") as f:
+            self.payload = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._users = 0
+        self._retired = False
+
+    @property
+    def rows(self) -> int:
+        return self.vectors.shape[0]
+
+    def _row(self, i: int) -> dict:
+        return json.loads(self.payload[self.offsets[i] : self.offsets[i + 1]])
+
+    def window(self, i: int, row: dict, neighbor_chunks: int) -> dict[int, str]:
+        """Chunk number -> content of the chunks within +-neighbor_chunks."""
+        window = {row["chunk_number"]: row["content"]}
+        first = max(0, i - neighbor_chunks)
+        last = min(self.rows, i + neighbor_chunks + 1)
+        for j in range(first, last):
+            if j == i:
+                continue
+            neighbor = self._row(j)
+            distance = abs(neighbor["chunk_number"] - row["chunk_number"])
+            if neighbor["url"] == row["url"] and distance <= neighbor_chunks:
+                window[neighbor["chunk_number"]] = neighbor["content"]
+        return dict(sorted(window.items()))
+
+    def search(
+        self, query_embedding: list[float], match_count: int, neighbor_chunks: int = 0
+    ) -> list[dict]:
+        """Exact top-k by cosine similarity (blocking, run it in a thread)."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        scores = self.vectors @ query
+        k = min(match_count, len(scores))
+        if k == 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        rows = []
+        for i in top:
+            row = self._row(i)
+            row["similarity"] = float(scores[i])
+            # normalized (context packing), a copy: the mapping gets closed
+            row["embedding"] = np.array(self.vectors[i])
+            if neighbor_chunks:
+                row["window"] = self.window(i, row, neighbor_chunks)
+            rows.append(row)
+        return rows
+
+    def acquire(self):
+        self._users += 1
+
+    def release(self):
+        self._users -= 1
+        if self._retired and self._users == 0:
+            self.close()
+
+    def retire(self):
+        """Replaced by a newer export: close when no search uses it anymore."""
+        self._retired = True
+        if self._users == 0:
+            self.close()
+
+    def close(self):
+        """Unmap the files (the memmaps are closed with their last reference)."""
+        self.payload.close()
+        self.vectors = self.offsets = None
+
+
+class ExportWriter:
+    """
+    Writes the files of a SourceMatrix export (blocking: NumPy and file I/O,
+    call it in a thread).
+    """
+
+    def __init__(self, path: str, count: int):
+        self.path = path
+        self.vectors = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=(count, DIMENSIONS),
+        )
+        self.offsets = np.zeros(count + 1, dtype=np.int64)
+        self.payload = open(os.path.join(path, "payload.jsonl"), "wb")
+        self.rows = 0
+
+    def write(self, batch: list[dict]):
+        for row in batch:
+            vector = np.asarray(json.loads(row["embedding"]), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            self.vectors[self.rows] = vector / norm if norm else vector
+
+            line = json.dumps(
+                {
+                    "id": row["id"],
+                    "url": row["url"],
+                    "chunk_number": row["chunk_number"],
+                    "title": row["title"],
+                    "summary": row["summary"],
+                    "content": row["content"],
+                    "meta_details": row["meta_details"],
+                },
+                ensure_ascii=False,
+            ).encode("utf-8")
+            self.payload.write(line + b"\n")
+            self.rows += 1
+            self.offsets[self.rows] = self.offsets[self.rows - 1] + len(line) + 1
+
+    def close(self):
+        self.payload.close()
+        self.vectors.flush()
+        del self.vectors
+        np.save(os.path.join(self.path, "offsets.npy"), self.offsets)
+
+
+class VectorMmapIndex:
+    """
+    In-process vector search for the hot sources (VECTOR_MMAP_SOURCES),
+    without a SQL round trip.
+
+    - Each source is exported from site_pages into VECTOR_MMAP_DIR/<slug>/<version>/,
+      then <slug>.json (manifest) is replaced atomically. Workers notice the new
+      manifest on their next search and map the new version.
+    - Exports run on startup (sources without one) and after each crawl of
+      the source, in one worker at a time (advisory lock). Sources without an
+      export fall back to Postgres.
+    - Exact search over all rows of the source (no ANN approximation, no
+      full-text part of the hybrid search).
+    """
+
+    def __init__(
+        self,
+        directory: str = SET_CONF.VECTOR_MMAP_DIR,
+        sources: list[str] = SET_CONF.VECTOR_MMAP_SOURCES,
+    ):
+        self.directory = directory
+        self.sources = set(sources)
+        self._open: dict[str, tuple[int, SourceMatrix]] = {}  # manifest mtime
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.fallbacks = 0
+        self.exports = 0
+
+    def enabled(self, source: str) -> bool:
+        return source in self.sources
+
+    def _manifest_path(self, source: str) -> str:
+        return os.path.join(self.directory, source_slug(source) + ".json")
+
+    def get(self, source: str) -> SourceMatrix | None:
+        """Mapped export of a source, re-mapped when a new version was exported."""
+        manifest = self._manifest_path(source)
+        try:
+            mtime = os.stat(manifest).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        current = self._open.get(source)
+        if current is not None and current[0] == mtime:
+            return current[1]
+
+        matrix = None
+        if mtime is not None:
+            with open(manifest, encoding="utf-8") as f:
+                version = json.load(f)["version"]
+            path = os.path.join(self.directory, source_slug(source), version)
+            matrix = SourceMatrix(path, version)
+            self._open[source] = (mtime, matrix)
+        else:
+            self._open.pop(source, None)
+
+        # searches still running on the old version keep it mapped until done
+        if current is not None:
+            current[1].retire()
+        return matrix
+
+    async def search(
+        self,
+        source: str,
+        query_embedding: list[float],
+        match_count: int,
+        neighbor_chunks: int = 0,
+    ) -> list[dict] | None:
+        """Top chunks of a hot source, None = not exported (use Postgres)."""
+        if not self.enabled(source):
+            return None
+
+        try:
+            matrix = self.get(source)
+        except Exception as e:
+            print(f"Error mapping vectors of '{source}': {e}")
+            matrix = None
+
+        if matrix is None:
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        matrix.acquire()
+        try:
+            # NumPy releases the GIL: the matrix product doesn't block the loop
+            return await asyncio.to_thread(
+                matrix.search, query_embedding, match_count, neighbor_chunks
+            )
+        finally:
+            matrix.release()
+
+    def start(self):
+        """Export hot sources that have no export yet (background)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._export_missing())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _export_missing(self):
+        for source in sorted(self.sources):
+            if await asyncio.to_thread(os.path.exists, self._manifest_path(source)):
+                continue
+            try:
+                await self.refresh(source, only_missing=True)
+            except Exception as e:
+                print(f"Error exporting vectors of '{source}': {e}")
+
+    async def refresh(self, source: str, only_missing: bool = False) -> int:
+        """
+        Export the chunks of a hot source again. Returns the row count.
+
+        One export per source at a time across all workers (advisory lock): a
+        worker that doesn't get the lock skips it, the new manifest reaches it
+        on its next search. only_missing: skip sources exported meanwhile.
+        """
+        if not self.enabled(source):
+            return 0
+
+        lock = self._locks.setdefault(source, asyncio.Lock())
+        shared_lock = sessionmanager_pgvector.try_advisory_lock(f"vector_mmap:{source}")
+        async with lock, shared_lock as acquired:
+            if not acquired:
+                print(f"🧊 Vectors of '{source}' are exported by another worker")
+                return 0
+            manifest = self._manifest_path(source)
+            if only_missing and await asyncio.to_thread(os.path.exists, manifest):
+                return 0
+
+            started = time.perf_counter()
+            version = f"{int(time.time() * 1000)}-{os.getpid()}"
+            path = os.path.join(self.directory, source_slug(source), version)
+            await asyncio.to_thread(os.makedirs, path, exist_ok=True)
+
+            try:
+                rows = await self._export(source, path)
+            except BaseException:
+                await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+                raise
+
+            await asyncio.to_thread(self._publish, source, version, rows)
+
+            self.exports += 1
+            seconds = time.perf_counter() - started
+            print(f"🧊 Vectors of '{source}' exported: {rows} rows in {seconds:.1f}s")
+            return rows
+
+    def _publish(self, source: str, version: str, rows: int):
+        """Replace the manifest atomically, remove the previous export (blocking)."""
+        slug = source_slug(source)
+        manifest = self._manifest_path(source)
+        previous = None
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as f:
+                previous = json.load(f)["version"]
+
+        if rows == 0:
+            # nothing to search: fall back to Postgres
+            shutil.rmtree(
+                os.path.join(self.directory, slug, version), ignore_errors=True
+            )
+            if previous is not None:
+                os.remove(manifest)
+        else:
+            tmp = f"{manifest}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"source": source, "version": version, "rows": rows}, f)
+            os.replace(tmp, manifest)
+
+        # mapped files stay readable for workers that still use them
+        if previous is not None and previous != version:
+            shutil.rmtree(
+                os.path.join(self.directory, slug, previous), ignore_errors=True
+            )
+
+    async def _export(self, source: str, path: str) -> int:
+        """
+        Stream the rows of a source into an export. Decoding, normalizing and
+        writing run in a thread, batch by batch, so the event loop keeps
+        serving requests.
+        """
+        async with sessionmanager_pgvector.session() as db:
+            # one snapshot for the count and the rows (crawls may be running)
+            await db.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+            result = await db.execute(
+                text("""
+                    SELECT count(*) FROM site_pages
+                    WHERE source = :source AND embedding IS NOT NULL
+                """),
+                {"source": source},
+            )
+            count = result.scalar_one()
+            if count == 0:
+                return 0
+
+            writer = await asyncio.to_thread(ExportWriter, path, count)
+            try:
+                result = await db.stream(EXPORT_QUERY, {"source": source})
+                async for batch in result.mappings().partitions(EXPORT_BATCH_SIZE):
+                    await asyncio.to_thread(writer.write, [dict(row) for row in batch])
+            finally:
+                await asyncio.to_thread(writer.close)
+
+            return writer.rows
+
+    def stats(self) -> dict:
+        return {
+            "sources": {
+                source: matrix.rows for source, (_, matrix) in self._open.items()
+            },
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "exports": self.exports,
+        }
+
+
+vector_mmap = VectorMmapIndex()
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from src.utils import crawl_site
+
+
+@pytest.fixture
+def job_statuses(monkeypatch) -> list[tuple[int, str]]:
+    """Job status writes of init_crawling (instead of the database)."""
+    statuses = []
+
+    async def set_job_status(job_id, status):
+        statuses.append((job_id, status))
+
+    async def save_source(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(crawl_site, "_set_job_status", set_job_status)
+    monkeypatch.setattr(crawl_site, "_save_source", save_source)
+    return statuses
+
+
+def test_no_sitemap_fails_job(monkeypatch, job_statuses):
+    async def find_sitemap(url):
+        return None
+
+    monkeypatch.setattr(crawl_site, "find_sitemap", find_sitemap)
+
+    asyncio.run(
+        crawl_site.init_crawling("https://example.com", source_name="ex", job_id=7)
+    )
+
+    assert job_statuses == [(7, "failed")]
+
+
+def test_empty_sitemap_fails_job(monkeypatch, job_statuses):
+    async def get_sitemap_entries(sitemap_url, failed=None):
+        return []
+
+    monkeypatch.setattr(crawl_site, "get_sitemap_entries", get_sitemap_entries)
+
+    asyncio.run(
+        crawl_site.init_crawling(
+            "https://example.com/sitemap.xml", source_name="ex", job_id=7
+        )
+    )
+
+    assert job_statuses == [(7, "failed")]
+
+
+def test_error_before_crawl_fails_job(monkeypatch, job_statuses):
+    async def get_sitemap_entries(sitemap_url, failed=None):
+        return [("https://example.com/a", None)]
+
+    async def crawl_urls(*args):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(crawl_site, "get_sitemap_entries", get_sitemap_entries)
+    monkeypatch.setattr(crawl_site, "_crawl_urls", crawl_urls)
+
+    asyncio.run(
+        crawl_site.init_crawling(
+            "https://example.com/sitemap.xml", source_name="ex", job_id=7
+        )
+    )
+
+    assert job_statuses == [(7, "failed")]
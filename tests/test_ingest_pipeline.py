@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from src.utils import ingest_pipeline, text_embedder
+from src.utils.ingest_pipeline import IngestPipeline, PageJob
+
+
+@pytest.fixture
+def failing_batch(monkeypatch):
+    """Embedding API where every batch containing "broken" fails."""
+
+    async def get_many(hashes, *args):
+        return {}
+
+    async def put_many(embeddings, *args):
+        pass
+
+    async def embed(texts, task_type, dimensions):
+        if "broken" in texts:
+            return [None] * len(texts)
+        return [[1.0] * dimensions for _ in texts]
+
+    monkeypatch.setattr(text_embedder.embedding_cache, "get_many", get_many)
+    monkeypatch.setattr(text_embedder.embedding_cache, "put_many", put_many)
+    monkeypatch.setattr(text_embedder.embedding_batcher, "embed", embed)
+
+
+def test_failed_batch_returns_none(failing_batch):
+    embeddings = asyncio.run(
+        text_embedder.get_embeddings_batch(["ok", "broken"], dimensions=3)
+    )
+
+    assert embeddings == [None, None]
+
+
+def test_failed_embedding_does_not_save_page(monkeypatch, failing_batch):
+    pipeline = IngestPipeline(crawler=None, source_name="ex", job_id=7)
+    finished = []
+    saved = []
+
+    async def finish_page(url, success=True, skipped=False, error=None):
+        finished.append((url, success, error))
+
+    async def save_job_state(job, chunk_count, title=None):
+        saved.append(job.url)
+
+    async def insert_chunks(chunks):
+        raise AssertionError("chunks of a failed page must not be stored")
+
+    monkeypatch.setattr(pipeline, "_finish_page", finish_page)
+    monkeypatch.setattr(pipeline, "_save_job_state", save_job_state)
+    monkeypatch.setattr(ingest_pipeline, "insert_chunks", insert_chunks)
+
+    job = PageJob(url="https://example.com/a", chunks=["broken"])
+    result = asyncio.run(pipeline._embed(job))
+
+    assert result is None
+    assert finished == [("https://example.com/a", False, "embedding failed")]
+    assert saved == []
@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from src.utils import text_embedder
+
+
+@pytest.fixture
+def api_calls(monkeypatch) -> list[str]:
+    """Queries sent to the embedding API (empty query cache)."""
+    calls = []
+
+    async def get_single_internal(text, task_type, dimensions):
+        calls.append(text)
+        return [float(len(calls))] * dimensions
+
+    monkeypatch.setattr(text_embedder, "_get_single_internal", get_single_internal)
+    text_embedder.query_embedding_cache.clear()
+    yield calls
+    text_embedder.query_embedding_cache.clear()
+
+
+def test_query_cache_keeps_case(api_calls):
+    async def embed_all():
+        return [
+            await text_embedder.get_embedding_single(query, dimensions=3)
+            for query in ("Path", "path", "  Path ")
+        ]
+
+    upper, lower, upper_again = asyncio.run(embed_all())
+
+    assert api_calls == ["Path", "path"]
+    assert upper != lower
+    assert upper_again == upper
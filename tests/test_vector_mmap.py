@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import numpy as np
+import pytest
+from src.utils.vector_mmap import (
+    DIMENSIONS,
+    ExportWriter,
+    SourceMatrix,
+    VectorMmapIndex,
+    source_slug,
+)
+
+SOURCE = "example"
+ROWS = 300
+
+
+def fixture_rows(seed: int = 0) -> list[dict]:
+    """Rows as EXPORT_QUERY returns them, sorted by (url, chunk_number)."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((ROWS, DIMENSIONS)).astype(np.float32)
+    return [
+        {
+            "id": i,
+            "url": f"https://example.com/page-{i // 10:03d}",
+            "chunk_number": i % 10,
+            "title": f"Title {i}",
+            "summary": f"Summary {i}",
+            "content": f"Content {i} – ünïcode",
+            "meta_details": {"source": SOURCE},
+            "embedding": json.dumps(vector.tolist()),
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def export(index: VectorMmapIndex, version: str, rows: list[dict]):
+    path = os.path.join(index.directory, source_slug(SOURCE), version)
+    os.makedirs(path)
+    writer = ExportWriter(path, len(rows))
+    writer.write(rows[:100])
+    writer.write(rows[100:])
+    writer.close()
+    index._publish(SOURCE, version, len(rows))
+
+
+@pytest.fixture
+def index(tmp_path) -> VectorMmapIndex:
+    index = VectorMmapIndex(directory=str(tmp_path), sources=[SOURCE])
+    export(index, "v1", fixture_rows())
+    return index
+
+
+def brute_force_top_k(rows: list[dict], queries: np.ndarray, k: int) -> list[list]:
+    vectors = np.array([json.loads(row["embedding"]) for row in rows])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ vectors.T
+    return [[rows[i]["id"] for i in np.argsort(-row)[:k]] for row in scores]
+
+
+def test_search_matches_brute_force(index):
+    queries = np.random.default_rng(1).standard_normal((20, DIMENSIONS))
+
+    found = [
+        [row["id"] for row in asyncio.run(index.search(SOURCE, query.tolist(), 5))]
+        for query in queries
+    ]
+
+    assert found == brute_force_top_k(fixture_rows(), queries, 5)
+
+
+def test_search_returns_payload_and_window(index):
+    query = json.loads(fixture_rows()[42]["embedding"])
+
+    (row,) = asyncio.run(index.search(SOURCE, query, 1, neighbor_chunks=1))
+
+    assert row["id"] == 42
+    assert row["similarity"] == pytest.approx(1.0, abs=1e-5)
+    assert row["content"] == "Content 42 – ünïcode"
+    assert row["window"] == {n: f"Content {40 + n} – ünïcode" for n in (1, 2, 3)}
+
+
+def test_replaced_matrix_closed_after_last_search(index):
+    old = index.get(SOURCE)
+    old.acquire()  # a search still running on the old export
+
+    export(index, "v2", fixture_rows(seed=2))
+    stat = os.stat(index._manifest_path(SOURCE))
+    os.utime(index._manifest_path(SOURCE), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    new = index.get(SOURCE)
+
+    assert new is not old and new.version == "v2"
+    assert not old.payload.closed
+
+    old.release()
+    assert old.payload.closed and old.vectors is None
+    assert not new.payload.closed
+
+
+def test_removed_export_is_closed(index):
+    matrix = index.get(SOURCE)
+    assert isinstance(matrix, SourceMatrix)
+
+    os.remove(index._manifest_path(SOURCE))
+
+    assert index.get(SOURCE) is None
+    assert matrix.payload.closed